@@ -0,0 +1,297 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from littlelemon.models import (
+    CustomerOrder,
+    DailyCourierDeliveries,
+    DailyItemSales,
+    DailySales,
+    OrderStatusChange,
+    Transaction,
+)
+
+from .exports import parse_date_range
+
+BATCH_SIZE = 2000
+TOP_ITEMS_BY = ['revenue', 'quantity']
+
+
+def order_day(order):
+    return timezone.localdate(order.order_date)
+
+
+def increment(model, keys, rows):
+    """
+    Add each row's counters to the rollup row with the same keys, creating
+    it when missing. rows are dicts of key and counter values. Uses one
+    INSERT ... ON CONFLICT DO UPDATE where the database supports it.
+
+    The updated rows stay locked until the surrounding transaction ends,
+    so callers write late in their transaction to keep the lock short.
+    """
+    if not rows:
+        return
+    fields = list(rows[0])
+    if connection.features.supports_update_conflicts_with_target:
+        increment_with_upsert(model, keys, fields, rows)
+        return
+    for row in rows:
+        lookup = {key: row[key] for key in keys}
+        deltas = {field: F(field) + row[field] for field in fields if field not in keys}
+        if model.objects.filter(**lookup).update(**deltas):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(**row)
+        except IntegrityError:
+            # created concurrently since the UPDATE
+            model.objects.filter(**lookup).update(**deltas)
+
+
+def increment_with_upsert(model, keys, fields, rows):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    model_fields = [model._meta.get_field(name) for name in fields]
+    columns = [quote(field.column) for field in model_fields]
+    updates = [
+        f'{column} = {table}.{column} + EXCLUDED.{column}'
+        for name, column in zip(fields, columns)
+        if name not in keys
+    ]
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join([placeholders] * len(rows))} '
+        f'ON CONFLICT ({", ".join(quote(model._meta.get_field(key).column) for key in keys)}) '
+        f'DO UPDATE SET {", ".join(updates)}'
+    )
+    params = [
+        field.get_db_prep_save(row[name], connection)
+        for row in rows
+        for name, field in zip(fields, model_fields)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def apply_order(order, sign=1):
+    day = order_day(order)
+    lines = list(
+        order.transaction.transaction_items.values('food_item_id')
+        .annotate(quantity=Sum('item_quantity'), revenue=Sum('item_total_price'))
+        .order_by('food_item_id')
+    )
+    with transaction.atomic(savepoint=False):
+        increment(DailySales, ['day'], [{
+            'day': day,
+            'order_count': sign,
+            'item_count': sign * sum(line['quantity'] for line in lines),
+            'revenue': sign * order.order_total,
+        }])
+        increment(DailyItemSales, ['day', 'food_item_id'], [
+            {
+                'day': day,
+                'food_item_id': line['food_item_id'],
+                'quantity': sign * line['quantity'],
+                'revenue': sign * line['revenue'],
+            }
+            for line in lines
+        ])
+
+
+def record_order(order):
+    """
+    Add a newly placed order to the daily rollups in the transaction
+    placing it, so the rollups commit or roll back with the order. Call it
+    late in the transaction: the day's DailySales row stays locked until
+    the transaction ends.
+    """
+    apply_order(order)
+
+
+def remove_order(order):
+    """Take an order about to be deleted out of the daily rollups."""
+    apply_order(order, sign=-1)
+    if order.is_delivered and order.assigned_delivery_person_id:
+        increment_deliveries(delivered_day(order), order.assigned_delivery_person_id, -1)
+
+
+def delivered_at():
+    """
+    Expression for when an order was last marked delivered: its latest
+    change to delivered, or its order date when its history has none,
+    as for orders delivered before the history was kept.
+    """
+    last_delivery = (
+        OrderStatusChange.objects.filter(order=OuterRef('pk'), to_status=CustomerOrder.Status.DELIVERED)
+        .order_by('-version').values('changed_at')[:1]
+    )
+    return Coalesce(Subquery(last_delivery), 'order_date')
+
+
+def delivered_day(order, before_version=None):
+    """The day the order was last marked delivered, by changes before before_version if given."""
+    changes = order.status_changes.filter(to_status=CustomerOrder.Status.DELIVERED)
+    if before_version is not None:
+        changes = changes.filter(version__lt=before_version)
+    changed_at = changes.order_by('-version').values_list('changed_at', flat=True).first()
+    return timezone.localdate(changed_at or order.order_date)
+
+
+def increment_deliveries(day, courier_id, delta):
+    increment(DailyCourierDeliveries, ['day', 'courier_id'], [
+        {'day': day, 'courier_id': courier_id, 'delivered_count': delta},
+    ])
+
+
+def record_delivery_change(order, was_delivered, previous_courier_id):
+    """
+    Move an order's delivery between courier counters after its delivered
+    flag or courier changed. Deliveries are counted on the day they were
+    made: today for one made by this change, otherwise the day of the
+    earlier delivery. Call it after the change is in the order's history.
+    """
+    before = previous_courier_id if was_delivered else None
+    after = order.assigned_delivery_person_id if order.is_delivered else None
+    if before == after:
+        return
+    day = delivered_day(order, before_version=order.version) if was_delivered else timezone.localdate()
+    rows = []
+    if before is not None:
+        rows.append({'day': day, 'courier_id': before, 'delivered_count': -1})
+    if after is not None:
+        rows.append({'day': day, 'courier_id': after, 'delivered_count': 1})
+    increment(DailyCourierDeliveries, ['day', 'courier_id'], rows)
+
+
+def day_bounds(start, end):
+    """Aware datetimes for the inclusive start and end dates; either may be None."""
+    bounds = []
+    for day in [start, end + timedelta(days=1) if end is not None else None]:
+        bounds.append(None if day is None else timezone.make_aware(datetime.combine(day, time.min)))
+    return bounds
+
+
+def filter_days(queryset, start=None, end=None):
+    if start is not None:
+        queryset = queryset.filter(day__gte=start)
+    if end is not None:
+        queryset = queryset.filter(day__lte=end)
+    return queryset
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Recompute the rollups for the inclusive date range (all days when
+    unbounded) from the order, transaction item and delivery rows.
+    Returns the number of days rebuilt.
+    """
+    lower, upper = day_bounds(start, end)
+    orders = CustomerOrder.objects.all()
+    if lower is not None:
+        orders = orders.filter(order_date__gte=lower)
+    if upper is not None:
+        orders = orders.filter(order_date__lt=upper)
+    lines = Transaction.transaction_items.through.objects.filter(transaction__order__in=orders)
+
+    item_rows = [
+        DailyItemSales(**row)
+        for row in lines.annotate(day=TruncDate('transaction__order__order_date'))
+        .values('day', food_item_id=F('transactionitem__food_item_id'))
+        .annotate(quantity=Sum('transactionitem__item_quantity'), revenue=Sum('transactionitem__item_total_price'))
+        .order_by()
+    ]
+    item_counts = defaultdict(int)
+    for row in item_rows:
+        item_counts[row.day] += row.quantity
+    sales_rows = [
+        DailySales(item_count=item_counts[row['day']], **row)
+        for row in orders.annotate(day=TruncDate('order_date'))
+        .values('day')
+        .annotate(order_count=Count('id'), revenue=Sum('order_total'))
+        .order_by()
+    ]
+    # deliveries are counted on the day they were made, not the order's day
+    delivery_rows = [
+        DailyCourierDeliveries(**row)
+        for row in filter_days(
+            CustomerOrder.objects.filter(is_delivered=True, assigned_delivery_person__isnull=False)
+            .annotate(day=TruncDate(delivered_at())),
+            start, end,
+        )
+        .values('day', courier_id=F('assigned_delivery_person_id'))
+        .annotate(delivered_count=Count('id'))
+        .order_by()
+    ]
+
+    with transaction.atomic():
+        for model in [DailySales, DailyItemSales, DailyCourierDeliveries]:
+            filter_days(model.objects.all(), start, end).delete()
+        DailySales.objects.bulk_create(sales_rows, batch_size=BATCH_SIZE)
+        DailyItemSales.objects.bulk_create(item_rows, batch_size=BATCH_SIZE)
+        DailyCourierDeliveries.objects.bulk_create(delivery_rows, batch_size=BATCH_SIZE)
+    return len(sales_rows)
+
+
+def parse_day_range(params):
+    """Inclusive (start, end) dates from ?start= and ?end=; either may be None."""
+    start, end = parse_date_range(params)
+    return (
+        None if start is None else timezone.localdate(start),
+        None if end is None else timezone.localdate(end) - timedelta(days=1),
+    )
+
+
+def revenue_by_day(start=None, end=None):
+    return list(
+        filter_days(DailySales.objects.all(), start, end)
+        .values('day', 'order_count', 'item_count', 'revenue')
+    )
+
+
+def revenue_by_category(start=None, end=None):
+    return list(
+        filter_days(DailyItemSales.objects.all(), start, end)
+        .values(category_id=F('food_item__food_category_id'), category=F('food_item__food_category__name'))
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'category_id')
+    )
+
+
+def revenue_by_item(start=None, end=None, order_by='revenue', limit=None):
+    queryset = (
+        filter_days(DailyItemSales.objects.all(), start, end)
+        .values('food_item_id', name=F('food_item__name'))
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by(f'-{order_by}', 'food_item_id')
+    )
+    if limit is not None:
+        queryset = queryset[:limit]
+    return list(queryset)
+
+
+def courier_deliveries(start=None, end=None):
+    return list(
+        filter_days(DailyCourierDeliveries.objects.all(), start, end)
+        .values('courier_id', username=F('courier__username'))
+        .annotate(delivered=Sum('delivered_count'))
+        .order_by('-delivered', 'courier_id')
+    )
+
+
+def basket_size(start=None, end=None):
+    totals = filter_days(DailySales.objects.all(), start, end).aggregate(
+        orders=Sum('order_count'), items=Sum('item_count'), revenue=Sum('revenue'),
+    )
+    orders = totals['orders'] or 0
+    return {
+        'orders': orders,
+        'items': totals['items'] or 0,
+        'revenue': totals['revenue'] or 0,
+        'average_items': round(totals['items'] / orders, 2) if orders else None,
+        'average_revenue': round(totals['revenue'] / orders, 2) if orders else None,
+    }
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ApiConfig(AppConfig):
@@ -6,4 +7,9 @@ class ApiConfig(AppConfig):
     name = 'api'
     
     def ready(self):
-        import api.signals  # noqa
\ No newline at end of file
+        import api.signals  # noqa
+        import api.slowqueries  # noqa
+        from api.roles import ensure_role_groups
+        post_migrate.connect(ensure_role_groups, sender=self)
+        from api.hashing import warm_password_validators
+        warm_password_validators()
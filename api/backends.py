@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+
+UserModel = get_user_model()
+
+
+class FailedLoginCacheBackend(ModelBackend):
+    """
+    ModelBackend that remembers recently rejected credentials.
+
+    A repeated username/password pair that already failed is rejected from
+    the 'throttle' cache without running the password hasher again. The key
+    includes the stored password hash, so changing the password invalidates
+    it immediately.
+    """
+    key_salt = 'api.backends.FailedLoginCacheBackend'
+
+    def get_failure_key(self, username, password, user=None):
+        stored_hash = user.password if user is not None else ''
+        digest = salted_hmac(self.key_salt, f'{username}\0{stored_hash}\0{password}').hexdigest()
+        return f'login_failure_{digest}'
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+
+        cache = caches['throttle']
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            user = None
+
+        failure_key = self.get_failure_key(username, password, user)
+        if cache.get(failure_key):
+            return
+
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user (#20760).
+            UserModel().set_password(password)
+        elif user.check_password(password):
+            # right password: not cached as a failure even if the account is
+            # inactive, so it works as soon as the account is reactivated
+            if self.user_can_authenticate(user):
+                return user
+            return
+        cache.set(failure_key, True, settings.LOGIN_FAILURE_CACHE_TIMEOUT)
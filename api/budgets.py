@@ -0,0 +1,113 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.dispatch import Signal
+
+logger = logging.getLogger('api.budgets')
+
+# Sent when a request goes over its view's budget.
+# Args: view_name, method, path, budget, queries, elapsed_ms, fingerprints.
+query_budget_exceeded = Signal()
+
+_QUOTED = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint_sql(sql):
+    """
+    Reduce a SQL statement to its shape: literals and placeholders become
+    '?', IN lists collapse to '(...)', so repeated statements compare equal.
+    """
+    sql = _QUOTED.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    """
+    Upper bound on the database queries (and optionally the wall time in
+    milliseconds) one request to a view may use.
+    """
+
+    def __init__(self, queries, time_ms=None):
+        self.queries = queries
+        self.time_ms = time_ms
+
+    def __repr__(self):
+        return f'QueryBudget(queries={self.queries}, time_ms={self.time_ms})'
+
+    def is_exceeded(self, queries, elapsed_ms):
+        return self.queries_exceeded(queries) or self.time_exceeded(elapsed_ms)
+
+    def queries_exceeded(self, queries):
+        return queries > self.queries
+
+    def time_exceeded(self, elapsed_ms):
+        return self.time_ms is not None and elapsed_ms > self.time_ms
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper hook that counts queries, their total time
+    and their fingerprints for one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements.append(sql)
+
+    def fingerprints(self, limit=10):
+        return Counter(fingerprint_sql(sql) for sql in self.statements).most_common(limit)
+
+
+def get_view_budget(view_class, method):
+    budgets = getattr(view_class, 'query_budgets', None)
+    if not budgets:
+        return None
+    return budgets.get(method, budgets.get('*'))
+
+
+def check_budget(view_name, method, path, budget, recorder, elapsed_ms):
+    if not budget.is_exceeded(recorder.count, elapsed_ms):
+        return
+    fingerprints = recorder.fingerprints()
+    query_budget_exceeded.send(
+        sender=QueryBudget,
+        view_name=view_name,
+        method=method,
+        path=path,
+        budget=budget,
+        queries=recorder.count,
+        elapsed_ms=elapsed_ms,
+        fingerprints=fingerprints,
+    )
+    message = (
+        f'{method} {path} ({view_name}) used {recorder.count} queries in {elapsed_ms:.1f}ms, '
+        f'over its {budget!r}'
+    )
+    details = '\n'.join(f'  {count}x {sql}' for sql, count in fingerprints)
+    # wall time depends on the machine, so going over time_ms is only logged
+    if settings.QUERY_BUDGETS['MODE'] == 'raise' and budget.queries_exceeded(recorder.count):
+        raise QueryBudgetExceeded(f'{message}\n{details}')
+    logger.warning('%s\n%s', message, details)
@@ -0,0 +1,23 @@
+from django.core.cache.backends import locmem
+
+from .metrics import record_cache_access
+
+_missing = object()
+
+
+class CountingCacheMixin:
+    """
+    Counts every get() as a hit or a miss of the request being served, for
+    the littlelemon_cache_requests_total metric. get_many() and
+    get_or_set() go through get() in Django's local-memory and file-based
+    backends, so each key is counted once.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        record_cache_access(value is not _missing)
+        return default if value is _missing else value
+
+
+class LocMemCache(CountingCacheMixin, locmem.LocMemCache):
+    pass
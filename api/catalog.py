@@ -0,0 +1,191 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.text import slugify
+
+from littlelemon.models import CatalogVersion, FoodCategory, FoodItem
+
+from .records import iter_batches
+
+CATALOG_VERSION_ID = 1
+MENU_FIELDS = ['name', 'cost', 'is_featured', 'category', 'category_name']
+CATEGORY_FIELDS = ['id', 'name', 'category_slug']
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+def get_catalog_version():
+    """
+    Counter bumped on every menu change; use it to key caches of menu data.
+    It is a database row, so every worker sees the same version.
+    """
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_catalog_version():
+    versions = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID)
+    with transaction.atomic():
+        if not versions.update(version=F('version') + 1):
+            # the row is created by the migrations; recreate it if it was deleted
+            CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID)
+            versions.update(version=F('version') + 1)
+        return versions.values_list('version', flat=True).get()
+
+
+class MenuImportResult:
+    def __init__(self, max_errors=100):
+        self.processed = 0
+        self.upserted = 0
+        self.categories_created = 0
+        self.skipped = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.catalog_version = None
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'upserted': self.upserted,
+            'categories_created': self.categories_created,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'catalog_version': self.catalog_version,
+        }
+
+
+class MenuImporter:
+    """
+    Upserts menu items by (name, category) in batches. Categories are given
+    by slug and resolved through one slug -> id map loaded up front; unknown
+    slugs create the category (named by category_name, or after the slug).
+    Each batch is one INSERT ... ON CONFLICT DO UPDATE where the database
+    supports it, otherwise one lookup, one bulk INSERT and one bulk UPDATE.
+    The catalog version is bumped once, at the end.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.result = MenuImportResult()
+        self.category_ids = None
+
+    def run(self, records):
+        self.category_ids = dict(FoodCategory.objects.values_list('category_slug', 'pk'))
+        with transaction.atomic():
+            for batch in iter_batches(records, self.batch_size):
+                self.import_batch(batch)
+        if self.result.upserted or self.result.categories_created:
+            self.result.catalog_version = bump_catalog_version()
+        else:
+            self.result.catalog_version = get_catalog_version()
+        return self.result
+
+    def clean(self, line, record):
+        if not isinstance(record, dict):
+            self.result.add_error(line, 'not a valid record')
+            return None
+        name = (record.get('name') or '').strip()
+        slug = slugify(record.get('category') or '')
+        if not name or not slug:
+            self.result.add_error(line, 'name and category are required')
+            return None
+        try:
+            cost = Decimal(str(record.get('cost'))).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            self.result.add_error(line, 'cost must be a number')
+            return None
+        if not cost.is_finite() or not 0 <= cost < 10000:
+            self.result.add_error(line, 'cost must be between 0 and 9999.99')
+            return None
+        is_featured = record.get('is_featured')
+        if not isinstance(is_featured, bool):
+            is_featured = str(is_featured or '').strip().lower() in TRUE_VALUES
+        return {
+            'name': name,
+            'cost': cost,
+            'is_featured': is_featured,
+            'slug': slug,
+            'category_name': (record.get('category_name') or '').strip(),
+        }
+
+    def create_missing_categories(self, rows):
+        missing = {}
+        for row in rows:
+            if row['slug'] not in self.category_ids:
+                missing.setdefault(row['slug'], row['category_name'] or row['slug'].replace('-', ' ').title())
+        if not missing:
+            return
+        categories = FoodCategory.objects.filter(category_slug__in=list(missing))
+        # created by another import since the slug map was loaded
+        existing = set(categories.values_list('category_slug', flat=True))
+        FoodCategory.objects.bulk_create(
+            [FoodCategory(name=name, category_slug=slug) for slug, name in missing.items() if slug not in existing],
+            ignore_conflicts=True,
+        )
+        self.category_ids.update(categories.values_list('category_slug', 'pk'))
+        self.result.categories_created += len(missing) - len(existing)
+
+    def import_batch(self, batch):
+        self.result.processed += len(batch)
+        rows = {}
+        for line, record in batch:
+            row = self.clean(line, record)
+            if row is not None:
+                # the last row for an item wins, as a second upsert would
+                rows[(row['name'], row['slug'])] = row
+        if not rows:
+            return
+        self.create_missing_categories(rows.values())
+
+        items = [
+            FoodItem(
+                name=row['name'],
+                cost=row['cost'],
+                is_featured=row['is_featured'],
+                food_category_id=self.category_ids[row['slug']],
+            )
+            for row in rows.values()
+        ]
+        if connection.features.supports_update_conflicts_with_target:
+            FoodItem.objects.bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=['name', 'food_category'],
+                update_fields=['cost', 'is_featured'],
+            )
+        else:
+            self.upsert_with_lookup(items)
+        self.result.upserted += len(items)
+
+    def upsert_with_lookup(self, items):
+        existing = {
+            (name, category_id): pk
+            for pk, name, category_id in FoodItem.objects.filter(
+                name__in={item.name for item in items},
+                food_category_id__in={item.food_category_id for item in items},
+            ).values_list('pk', 'name', 'food_category_id')
+        }
+        updates = []
+        for item in items:
+            item.pk = existing.get((item.name, item.food_category_id))
+            if item.pk is not None:
+                updates.append(item)
+        FoodItem.objects.bulk_create([item for item in items if item.pk is None])
+        FoodItem.objects.bulk_update(updates, ['cost', 'is_featured'])
+
+
+def export_menu_rows():
+    return (
+        FoodItem.objects.order_by('food_category__category_slug', 'name')
+        .values_list('name', 'cost', 'is_featured', 'food_category__category_slug', 'food_category__name')
+        .iterator(chunk_size=2000)
+    )
+
+
+def export_category_rows():
+    return FoodCategory.objects.order_by('pk').values_list(*CATEGORY_FIELDS).iterator(chunk_size=2000)
@@ -0,0 +1,132 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from littlelemon.models import CustomerOrder, Transaction
+
+from .analytics import day_bounds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ReportEngineUnavailable(RuntimeError):
+    pass
+
+
+def require_numpy():
+    if np is None:
+        raise ReportEngineUnavailable('historical reports require numpy')
+
+
+def filter_bounds(queryset, field, lower, upper):
+    if lower is not None:
+        queryset = queryset.filter(**{f'{field}__gte': lower})
+    if upper is not None:
+        queryset = queryset.filter(**{f'{field}__lt': upper})
+    return queryset
+
+
+class Columns:
+    """
+    Rows of a table as parallel NumPy arrays, one per field. Subclasses
+    name the fields, their dtypes and the query producing the rows; the
+    last field is a price, stored in cents.
+    """
+    table = ''
+    fields = []
+    dtypes = []
+
+    def __init__(self, columns):
+        for name, column in zip(self.fields, columns):
+            setattr(self, name, column)
+
+    def __len__(self):
+        return len(getattr(self, self.fields[0]))
+
+    def arrays(self):
+        return [getattr(self, name) for name in self.fields]
+
+    @classmethod
+    def empty(cls):
+        return cls([np.empty(0, dtype=dtype) for dtype in cls.dtypes])
+
+    @classmethod
+    def concatenate(cls, parts):
+        if not parts:
+            return cls.empty()
+        return cls([np.concatenate([getattr(part, name) for part in parts]) for name in cls.fields])
+
+    @classmethod
+    def from_rows(cls, rows):
+        columns = list(zip(*rows))
+        columns[-1] = [int(price * 100) for price in columns[-1]]
+        return cls([np.array(column, dtype=dtype) for column, dtype in zip(columns, cls.dtypes)])
+
+    @classmethod
+    def rows(cls, lower, upper):
+        raise NotImplementedError
+
+    @classmethod
+    def query(cls, start=None, end=None):
+        """Read the live rows of the inclusive date range, a chunk at a time."""
+        require_numpy()
+        chunk_size = settings.HISTORICAL_REPORTS['CHUNK_SIZE']
+        rows = cls.rows(*day_bounds(start, end)).iterator(chunk_size=chunk_size)
+        parts = []
+        while chunk := list(islice(rows, chunk_size)):
+            parts.append(cls.from_rows(chunk))
+        return cls.concatenate(parts)
+
+
+class LineColumns(Columns):
+    """
+    Transaction item lines sorted by transaction: transaction id, ISO
+    weekday (0 = Monday) and hour of the transaction, food item id,
+    quantity and total price in cents.
+    """
+    table = 'lines'
+    fields = ['transaction', 'weekday', 'hour', 'food_item', 'quantity', 'cents']
+    dtypes = [np.int64, np.int8, np.int8, np.int64, np.int32, np.int64] if np else []
+
+    @classmethod
+    def rows(cls, lower, upper):
+        lines = Transaction.transaction_items.through.objects.all()
+        return (
+            filter_bounds(lines, 'transaction__transaction_date', lower, upper)
+            .annotate(
+                weekday=ExtractIsoWeekDay('transaction__transaction_date') - 1,
+                hour=ExtractHour('transaction__transaction_date'),
+            )
+            .order_by('transaction_id', 'transactionitem_id')
+            .values_list(
+                'transaction_id', 'weekday', 'hour', 'transactionitem__food_item_id',
+                'transactionitem__item_quantity', 'transactionitem__item_total_price',
+            )
+        )
+
+
+class OrderColumns(Columns):
+    """
+    Customer orders sorted by id: order, transaction and customer ids,
+    ISO weekday (0 = Monday) and hour of the order and its total in cents.
+    Delivery fields change after the order is placed and are not kept.
+    """
+    table = 'orders'
+    fields = ['order', 'transaction', 'customer', 'weekday', 'hour', 'cents']
+    dtypes = [np.int64, np.int64, np.int64, np.int8, np.int8, np.int64] if np else []
+
+    @classmethod
+    def rows(cls, lower, upper):
+        return (
+            filter_bounds(CustomerOrder.objects.all(), 'order_date', lower, upper)
+            .annotate(weekday=ExtractIsoWeekDay('order_date') - 1, hour=ExtractHour('order_date'))
+            .order_by('id')
+            .values_list('id', 'transaction_id', 'customer_id', 'weekday', 'hour', 'order_total')
+        )
+
+
+COLUMN_SETS = {columns.table: columns for columns in [LineColumns, OrderColumns]}
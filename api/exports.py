@@ -0,0 +1,87 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from littlelemon.models import CustomerOrder, Transaction
+
+CHUNK_SIZE = 2000
+
+ORDER_FIELDS = [
+    'id', 'order_date', 'customer_id', 'customer', 'transaction_id',
+    'assigned_delivery_person_id', 'is_delivered', 'order_total',
+]
+TRANSACTION_FIELDS = ['id', 'transaction_date', 'customer_id', 'customer', 'total']
+TRANSACTION_ITEM_FIELDS = [
+    'transaction_id', 'transaction_date', 'id', 'customer_id', 'food_item_id', 'food_item',
+    'item_quantity', 'item_unit_price', 'item_total_price',
+]
+
+
+def parse_date_range(params):
+    """
+    Return (start, end) aware datetimes for the inclusive ?start= and ?end=
+    dates (YYYY-MM-DD); either may be None.
+    """
+    bounds = []
+    for name in ['start', 'end']:
+        value = params.get(name)
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: 'a date in YYYY-MM-DD format is required'})
+        if name == 'end':
+            day += timedelta(days=1)
+        bounds.append(timezone.make_aware(datetime.combine(day, time.min)))
+    return bounds
+
+
+def filter_date_range(queryset, field, start, end):
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
+
+
+def order_rows(start=None, end=None):
+    queryset = filter_date_range(CustomerOrder.objects.all(), 'order_date', start, end)
+    return (
+        queryset.order_by('order_date', 'id')
+        .values_list(
+            'id', 'order_date', 'customer_id', 'customer__username', 'transaction_id',
+            'assigned_delivery_person_id', 'is_delivered', 'order_total',
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def transaction_rows(start=None, end=None):
+    queryset = filter_date_range(Transaction.objects.all(), 'transaction_date', start, end)
+    return (
+        queryset.order_by('transaction_date', 'id')
+        .values_list('id', 'transaction_date', 'customer_id', 'customer__username', 'total')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def transaction_item_rows(start=None, end=None):
+    # one row per item of each transaction, read through the m2m table
+    through = Transaction.transaction_items.through
+    queryset = filter_date_range(through.objects.all(), 'transaction__transaction_date', start, end)
+    return (
+        queryset.order_by('transaction__transaction_date', 'transaction_id', 'transactionitem_id')
+        .values_list(
+            'transaction_id', 'transaction__transaction_date', 'transactionitem_id',
+            'transactionitem__customer_id', 'transactionitem__food_item_id', 'transactionitem__food_item__name',
+            'transactionitem__item_quantity', 'transactionitem__item_unit_price',
+            'transactionitem__item_total_price',
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
@@ -0,0 +1,133 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import get_default_password_validators
+from django.test.signals import setting_changed
+
+
+DEFAULT_POOL_SETTINGS = {
+    'ENABLED': True,
+    'KIND': 'thread',
+    'WORKERS': os.cpu_count() or 1,
+    'QUEUE_SIZE': 64,
+    'TIMEOUT': 10,
+}
+
+
+class HashingPoolBusy(Exception):
+    pass
+
+
+def _init_worker_process():
+    django.setup()
+
+
+class PasswordHashingPool:
+    """
+    Bounded pool that runs password hashing off the request thread.
+
+    At most WORKERS hashes run at once and at most QUEUE_SIZE more may wait;
+    callers beyond that wait up to TIMEOUT seconds for a slot and then get
+    HashingPoolBusy, so a sign-up burst cannot pile up unbounded CPU work.
+    """
+
+    def __init__(self, pool_settings):
+        self.settings = dict(DEFAULT_POOL_SETTINGS, **pool_settings)
+        self.slots = threading.BoundedSemaphore(self.settings['WORKERS'] + self.settings['QUEUE_SIZE'])
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                if self.settings['KIND'] == 'process':
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.settings['WORKERS'],
+                        initializer=_init_worker_process,
+                    )
+                else:
+                    self.executor = ThreadPoolExecutor(
+                        max_workers=self.settings['WORKERS'],
+                        thread_name_prefix='password-hashing',
+                    )
+            return self.executor
+
+    def hash(self, raw_password):
+        if not self.settings['ENABLED']:
+            return make_password(raw_password)
+        if not self.slots.acquire(timeout=self.settings['TIMEOUT']):
+            raise HashingPoolBusy()
+        try:
+            future = self.get_executor().submit(make_password, raw_password)
+            return future.result()
+        finally:
+            self.slots.release()
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PasswordHashingPool(getattr(settings, 'PASSWORD_HASHING_POOL', {}))
+        return _pool
+
+
+def hash_password(raw_password):
+    return get_hashing_pool().hash(raw_password)
+
+
+_bulk_executors = {}
+_bulk_executors_lock = threading.Lock()
+
+
+def get_bulk_hashing_executor(workers=None, kind='thread'):
+    """
+    The pool for hashing large batches of passwords, e.g. user imports:
+    threads for imports run by a web worker, where forking processes
+    would copy the worker, or processes for manage.py import_users. One
+    pool per kind and number of workers (default USER_IMPORT['WORKERS'])
+    is started on first use and shared by every import in the process;
+    do not shut it down after an import.
+    """
+    workers = workers or settings.USER_IMPORT['WORKERS']
+    with _bulk_executors_lock:
+        executor = _bulk_executors.get((kind, workers))
+        if executor is None:
+            if kind == 'process':
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_process)
+            else:
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-password-hashing')
+            _bulk_executors[kind, workers] = executor
+        return executor
+
+
+def warm_password_validators():
+    # CommonPasswordValidator reads its gzip'd list into a set when it is
+    # instantiated; do that once at startup instead of on the first sign-up.
+    return get_default_password_validators()
+
+
+def reset_hashing_pool(*args, **kwargs):
+    global _pool
+    if kwargs['setting'] == 'PASSWORD_HASHING_POOL':
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = None
+
+
+setting_changed.connect(reset_hashing_pool)
@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from littlelemon.models import FoodItem
+
+from .columns import LineColumns, np
+from .snapshots import iter_columns
+
+CACHE_PREFIX = 'historical_report'
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def load_columns(start=None, end=None):
+    """
+    LineColumns parts of the inclusive date range, from the snapshot where
+    it has them. A transaction's lines are always in a single part.
+    """
+    return iter_columns(LineColumns, start, end)
+
+
+def merge_counts(keys, counts):
+    """Sum the counts of equal keys, values of a 1-D array or rows of a 2-D one."""
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return unique, np.bincount(inverse.ravel(), weights=counts, minlength=len(unique)).astype(np.int64)
+
+
+def transaction_starts(columns):
+    """Index of the first line of each transaction; lines are grouped by transaction."""
+    if not len(columns):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.diff(columns.transaction, prepend=columns.transaction[0] - 1))
+
+
+def demand_heatmap(parts):
+    """Orders, items and revenue per weekday and hour, as 7 x 24 grids."""
+    orders = np.zeros(7 * 24, dtype=np.int64)
+    items = np.zeros(7 * 24)
+    cents = np.zeros(7 * 24)
+    for columns in parts:
+        cells = columns.weekday.astype(np.int64) * 24 + columns.hour
+        orders += np.bincount(cells[transaction_starts(columns)], minlength=7 * 24)
+        items += np.bincount(cells, weights=columns.quantity, minlength=7 * 24)
+        cents += np.bincount(cells, weights=columns.cents, minlength=7 * 24)
+    return {
+        'weekdays': WEEKDAYS,
+        'hours': list(range(24)),
+        'orders': orders.reshape(7, 24).tolist(),
+        'items': items.astype(np.int64).reshape(7, 24).tolist(),
+        'revenue': (cents.reshape(7, 24) / 100).round(2).tolist(),
+    }
+
+
+def co_purchase_pairs(columns):
+    """
+    (first, second, item ids) for every pair of distinct items bought in
+    the same transaction, with first < second. Once the lines are sorted
+    by transaction, pairs are found by comparing each line with the one
+    k places later, for k up to the largest basket.
+    """
+    codes = np.unique(np.stack([columns.transaction, columns.food_item], axis=1), axis=0)
+    transactions, items = codes[:, 0], codes[:, 1]
+    firsts, seconds = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    if len(codes):
+        starts = np.flatnonzero(np.diff(transactions, prepend=transactions[0] - 1))
+        largest = int(np.diff(np.append(starts, len(codes))).max())
+        for offset in range(1, largest):
+            same = transactions[:-offset] == transactions[offset:]
+            firsts.append(items[:-offset][same])
+            seconds.append(items[offset:][same])
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    return np.minimum(first, second), np.maximum(first, second), items
+
+
+def co_purchase_counts(parts):
+    """
+    (item ids, transactions per item, pairs, transactions per pair), the
+    pairs as rows of (first, second) with first < second, all sorted.
+    Each part is reduced on its own and its counts merged into the totals.
+    """
+    item_ids, basket_counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs, pair_counts = np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+    for columns in parts:
+        first, second, items = co_purchase_pairs(columns)
+        part_items, part_counts = np.unique(items, return_counts=True)
+        item_ids, basket_counts = merge_counts(
+            np.concatenate([item_ids, part_items]), np.concatenate([basket_counts, part_counts]),
+        )
+        if len(first):
+            part_pairs, part_counts = np.unique(np.stack([first, second], axis=1), axis=0, return_counts=True)
+            pairs, pair_counts = merge_counts(
+                np.concatenate([pairs, part_pairs]), np.concatenate([pair_counts, part_counts]),
+            )
+    return item_ids, basket_counts, pairs, pair_counts
+
+
+def co_purchase_matrix(parts, limit=20):
+    """
+    Co-purchase counts between the limit most bought items (by number of
+    transactions) as a symmetric matrix, plus the most frequent pairs.
+    """
+    item_ids, basket_counts, pair_ids, pair_counts = co_purchase_counts(parts)
+    top = item_ids[np.argsort(-basket_counts, kind='stable')[:limit]]
+
+    matrix = np.zeros((len(top), len(top)), dtype=np.int64)
+    if len(pair_ids):
+        # position in the sorted item_ids -> row of the matrix, -1 outside
+        # the top items; sized by the items bought, not by the largest id
+        index = np.full(len(item_ids), -1)
+        index[np.searchsorted(item_ids, top)] = np.arange(len(top))
+        rows, cols = index[np.searchsorted(item_ids, pair_ids)].T
+        kept = (rows >= 0) & (cols >= 0)
+        np.add.at(matrix, (rows[kept], cols[kept]), pair_counts[kept])
+        matrix += matrix.T
+
+    best = np.argsort(-pair_counts, kind='stable')[:limit]
+    pair_ids, pair_counts = pair_ids[best], pair_counts[best]
+    names = dict(
+        FoodItem.objects.filter(pk__in={*top.tolist(), *pair_ids.ravel().tolist()}).values_list('pk', 'name')
+    )
+    return {
+        'items': [{'food_item_id': pk, 'name': names.get(pk)} for pk in top.tolist()],
+        'matrix': matrix.tolist(),
+        'pairs': [
+            {
+                'items': [{'food_item_id': pk, 'name': names.get(pk)} for pk in pair],
+                'transactions': count,
+            }
+            for pair, count in zip(pair_ids.tolist(), pair_counts.tolist())
+        ],
+    }
+
+
+REPORTS = {
+    'demand-heatmap': demand_heatmap,
+    'co-purchases': co_purchase_matrix,
+}
+
+
+def cache_key(report, start, end, **options):
+    parts = [CACHE_PREFIX, report, str(start or ''), str(end or '')]
+    parts.extend(f'{name}={value}' for name, value in sorted(options.items()))
+    return ':'.join(parts)
+
+
+def get_report(report, start=None, end=None, **options):
+    """
+    Compute a report over the inclusive date range, cached by range and
+    options. Ranges ending before today are cached for CACHE_TIMEOUT,
+    ranges that still receive orders for LIVE_CACHE_TIMEOUT.
+    """
+    config = settings.HISTORICAL_REPORTS
+    key = cache_key(report, start, end, **options)
+    result = cache.get(key)
+    if result is None:
+        result = REPORTS[report](load_columns(start, end), **options)
+        closed = end is not None and end < timezone.localdate()
+        cache.set(key, result, config['CACHE_TIMEOUT'] if closed else config['LIVE_CACHE_TIMEOUT'])
+    return result
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.roles import backfill_user_roles
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the role membership table from auth groups for every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        synced = backfill_user_roles(batch_size=options['batch_size'])
+        self.stdout.write(f'Synced roles for {synced} users')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog import MenuImporter
+from api.records import FORMATS, RecordFormatError, detect_format, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Upserts menu items by name and category slug from a CSV, JSON lines or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            fmt = options['format'] or detect_format(options['path'])
+            with open(options['path'], 'rb') as stream:
+                result = MenuImporter(batch_size=options['batch_size']).run(iter_records(stream, fmt))
+        except (OSError, RecordFormatError) as exc:
+            raise CommandError(exc)
+
+        for error in result.errors:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        self.stdout.write(
+            f'Upserted {result.upserted} menu items, created {result.categories_created} categories, '
+            f'skipped {result.skipped}; catalog version {result.catalog_version}'
+        )
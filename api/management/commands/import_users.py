@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.roles import ROLES
+from api.records import FORMATS, RecordFormatError, detect_format, iter_records
+from api.userimport import UserImporter, UserImportError
+
+
+class Command(BaseCommand):
+    help = 'Creates users in batches from a CSV (with a header row), JSON lines or JSON array file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--role', choices=ROLES, default='Customer')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--workers', type=int, help='Password hashing processes')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(result):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{result.processed} rows, {result.created} created, {result.skipped} skipped '
+                f'({result.processed / elapsed:.0f} rows/s)'
+            )
+
+        importer = UserImporter(
+            role=options['role'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            executor_kind='process',
+            progress=progress,
+        )
+        try:
+            fmt = options['format'] or detect_format(options['path'])
+            with open(options['path'], 'rb') as stream:
+                result = importer.run(iter_records(stream, fmt))
+        except (OSError, RecordFormatError, UserImportError) as exc:
+            raise CommandError(exc)
+
+        for error in result.errors:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        self.stdout.write(f'Imported {result.created} users, skipped {result.skipped}')
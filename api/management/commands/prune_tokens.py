@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.tokens import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired outstanding and blacklisted JWT tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and prune every INTERVAL seconds (for use as a scheduled worker)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            removed = prune_expired_tokens(batch_size=options['batch_size'])
+            self.stdout.write(f'Pruned {removed} expired tokens')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.workload import rebuild_load
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the open order count of every courier from the orders'
+
+    def handle(self, *args, **options):
+        couriers = rebuild_load()
+        self.stdout.write(f'Rebuilt courier open counts; {couriers} couriers have open orders')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily sales, item and courier rollups from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='first day to rebuild (YYYY-MM-DD), default the first order')
+        parser.add_argument('--end', help='last day to rebuild (YYYY-MM-DD), default the last order')
+
+    def handle(self, *args, **options):
+        bounds = []
+        for name in ['start', 'end']:
+            value = options[name]
+            day = None
+            if value:
+                try:
+                    day = parse_date(value)
+                except ValueError:
+                    pass
+                if day is None:
+                    raise CommandError(f'--{name} must be a date in YYYY-MM-DD format')
+            bounds.append(day)
+        days = rebuild_rollups(*bounds)
+        self.stdout.write(f'Rebuilt sales rollups for {days} days')
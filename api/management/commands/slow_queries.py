@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.slowqueries import clear_slow_queries, get_slow_queries
+
+
+class Command(BaseCommand):
+    help = 'Prints the slow-query log, newest first, with the EXPLAIN plan of each statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--json', action='store_true', help='Print the entries as JSON lines')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after printing it')
+
+    def handle(self, *args, **options):
+        entries = get_slow_queries(limit=options['limit'])
+        for entry in entries:
+            if options['json']:
+                self.stdout.write(json.dumps(entry))
+                continue
+            self.stdout.write(
+                f'{entry["time"]}  {entry["duration_ms"]:.1f}ms  '
+                f'{entry["view"] or "-"}  {entry["origin"] or "-"}'
+            )
+            self.stdout.write(f'  {entry["sql"]}')
+            for line in (entry['plan'] or 'plan pending').splitlines():
+                self.stdout.write(f'    {line}')
+        if not options['json']:
+            self.stdout.write(f'{len(entries)} slow queries')
+        if options['clear']:
+            clear_slow_queries()
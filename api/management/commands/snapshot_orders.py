@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.columns import COLUMN_SETS, ReportEngineUnavailable
+from api.snapshots import get_snapshot_store, mark_stale
+
+
+class Command(BaseCommand):
+    help = 'Appends closed days of order history to the columnar snapshot read by the historical reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='export days before this one (YYYY-MM-DD), default every closed day')
+        parser.add_argument(
+            '--since', help='export again the exported days from this one (YYYY-MM-DD) on, e.g. after a bulk edit',
+        )
+        parser.add_argument('--full', action='store_true', help='Drop the snapshot and export all history again')
+        parser.add_argument('--info', action='store_true', help='Print the watermark and partitions, export nothing')
+
+    def handle(self, *args, **options):
+        store = get_snapshot_store()
+        if options['info']:
+            self.print_info(store)
+            return
+        until, since = [self.parse_day(options, name) for name in ['until', 'since']]
+        if options['full']:
+            store.clear()
+        elif since is not None and store.watermark() is not None:
+            watermark = store.watermark()
+            mark_stale(since + timedelta(days=offset) for offset in range((watermark - since).days))
+        progress = self.report_progress if options['verbosity'] > 1 else None
+        try:
+            days = store.export(until=until, progress=progress)
+            refreshed = store.refresh(progress=progress)
+        except ReportEngineUnavailable as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f'Exported {days} days, {refreshed} changed days again; watermark {store.watermark() or "-"}')
+
+    def parse_day(self, options, name):
+        if not options[name]:
+            return None
+        day = None
+        try:
+            day = parse_date(options[name])
+        except ValueError:
+            pass
+        if day is None:
+            raise CommandError(f'--{name} must be a date in YYYY-MM-DD format')
+        return day
+
+    def report_progress(self, day, exported):
+        self.stdout.write(f'  exported up to {day}')
+
+    def print_info(self, store):
+        manifest = store.read_manifest()
+        self.stdout.write(f'watermark {manifest["watermark"] or "-"}')
+        for table, column_set in COLUMN_SETS.items():
+            days = manifest['tables'][table]
+            rows = sum(len(store.read_partition(column_set, day)) for day in days)
+            self.stdout.write(f'{table}: {len(days)} partitions, {rows} rows')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.totals import ITEM_RELATIONS, find_drift, repair_drift
+
+
+class Command(BaseCommand):
+    help = 'Checks the stored totals and item counts of transactions and carts against their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Recompute the totals of the rows that drifted')
+        parser.add_argument('--limit', type=int, default=20, help='How many drifted rows to print per model')
+
+    def handle(self, *args, **options):
+        drifted_total = 0
+        for model in ITEM_RELATIONS:
+            name = model._meta.verbose_name_plural
+            drifted = []
+            for pk, total, item_count, actual_total, actual_item_count in find_drift(model):
+                if len(drifted) < options['limit']:
+                    self.stdout.write(
+                        f'{model._meta.verbose_name} #{pk}: stored {total} / {item_count} items, '
+                        f'actual {actual_total:.2f} / {actual_item_count} items'
+                    )
+                drifted.append(pk)
+            drifted_total += len(drifted)
+            if options['repair'] and drifted:
+                repaired = repair_drift(model, drifted)
+                self.stdout.write(f'{name}: repaired {repaired} of {len(drifted)} drifted')
+            else:
+                self.stdout.write(f'{name}: {len(drifted)} drifted')
+        if drifted_total and not options['repair']:
+            self.stdout.write('Run with --repair to fix them')
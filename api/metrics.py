@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .sharedstate import ProcessSnapshots
+
+logger = logging.getLogger('api.metrics')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_current_request = ContextVar('api_request_metrics', default=None)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout. Observing a value
+    is one bisect and two additions.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+    def state(self):
+        return list(self.counts), self.sum, self.count
+
+    def merge(self, state):
+        counts, total, count = state
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.serialization_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class MetricsRegistry:
+    """
+    In-process aggregation of per-request metrics, keyed by view and method.
+
+    Each worker publishes its series to the shared METRICS['CACHE'] at most
+    every PUBLISH_INTERVAL seconds, and render() sums what every worker
+    published, so a scrape sees the same counters whichever worker serves it.
+    """
+
+    HISTOGRAMS = {
+        'request_duration_seconds': DURATION_BUCKETS,
+        'request_db_seconds': DURATION_BUCKETS,
+        'request_serialization_seconds': DURATION_BUCKETS,
+        'request_queries': QUERY_BUCKETS,
+        'response_size_bytes': SIZE_BUCKETS,
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shared = None
+        self.published = None
+        self.reset()
+
+    def reset(self):
+        self.series = {}
+        self.responses = {}
+        self.cache = {}
+
+    def get_series(self, labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = {
+                name: Histogram(buckets) for name, buckets in self.HISTOGRAMS.items()
+            }
+        return series
+
+    def record_request(self, view, method, status_code, duration, db_time, queries,
+                       serialization_time, response_size, cache_hits, cache_misses):
+        labels = (view, method)
+        with self.lock:
+            series = self.get_series(labels)
+            series['request_duration_seconds'].observe(duration)
+            series['request_db_seconds'].observe(db_time)
+            series['request_serialization_seconds'].observe(serialization_time)
+            series['request_queries'].observe(queries)
+            series['response_size_bytes'].observe(response_size)
+            status_key = labels + (str(status_code),)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+            hits, misses = self.cache.get(labels, (0, 0))
+            self.cache[labels] = (hits + cache_hits, misses + cache_misses)
+            now = time.monotonic()
+            if self.published is not None and now - self.published < settings.METRICS['PUBLISH_INTERVAL']:
+                return
+            self.published = now
+            snapshot = self.snapshot()
+        self.publish(snapshot)
+
+    def snapshot(self):
+        """This process's series as plain values; call it holding the lock."""
+        return {
+            'series': {
+                labels: {name: histogram.state() for name, histogram in series.items()}
+                for labels, series in self.series.items()
+            },
+            'responses': dict(self.responses),
+            'cache': dict(self.cache),
+        }
+
+    def get_shared(self):
+        alias = settings.METRICS['CACHE']
+        if self.shared is None or self.shared.cache_alias != alias:
+            self.shared = ProcessSnapshots(alias, 'metrics')
+        return self.shared
+
+    def publish(self, snapshot):
+        try:
+            self.get_shared().publish(snapshot)
+        except Exception:
+            logger.exception('Could not publish the request metrics')
+
+    def collect(self):
+        """
+        Publish this process's series and return the sum of every process's
+        snapshot; only this process's series when the cache cannot be read.
+        """
+        with self.lock:
+            self.published = time.monotonic()
+            snapshot = self.snapshot()
+        self.publish(snapshot)
+        try:
+            snapshots = [value for value, _ in self.get_shared().collect()]
+        except Exception:
+            logger.exception('Could not read the request metrics of the other processes')
+            snapshots = [snapshot]
+        series, responses, cache = {}, {}, {}
+        for value in snapshots:
+            for labels, states in value['series'].items():
+                if labels not in series:
+                    series[labels] = {name: Histogram(buckets) for name, buckets in self.HISTOGRAMS.items()}
+                for name, state in states.items():
+                    series[labels][name].merge(state)
+            for key, count in value['responses'].items():
+                responses[key] = responses.get(key, 0) + count
+            for labels, (hits, misses) in value['cache'].items():
+                total_hits, total_misses = cache.get(labels, (0, 0))
+                cache[labels] = (total_hits + hits, total_misses + misses)
+        return series, responses, cache
+
+    def render(self):
+        """Return every process's series summed, in the Prometheus text exposition format."""
+        series_by_labels, responses, cache = self.collect()
+        lines = []
+        for name in self.HISTOGRAMS:
+            metric = f'littlelemon_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+            for (view, method), series in sorted(series_by_labels.items()):
+                histogram = series[name]
+                labels = f'view="{view}",method="{method}"'
+                for bound, total in histogram.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+
+        lines.append('# TYPE littlelemon_responses_total counter')
+        for (view, method, status_code), count in sorted(responses.items()):
+            lines.append(
+                f'littlelemon_responses_total{{view="{view}",method="{method}",status="{status_code}"}} {count}'
+            )
+
+        lines.append('# TYPE littlelemon_cache_requests_total counter')
+        for (view, method), (hits, misses) in sorted(cache.items()):
+            labels = f'view="{view}",method="{method}"'
+            lines.append(f'littlelemon_cache_requests_total{{{labels},result="hit"}} {hits}')
+            lines.append(f'littlelemon_cache_requests_total{{{labels},result="miss"}} {misses}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current_request.set(metrics)
+
+
+def finish_request(token):
+    _current_request.reset(token)
+
+
+def get_current_request_metrics():
+    return _current_request.get()
+
+
+def add_serialization_time(seconds):
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.serialization_time += seconds
+
+
+def record_cache_access(hit):
+    """Count a cache lookup made while serving the current request."""
+    metrics = _current_request.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+class timed_serialization:
+    """Context manager adding the elapsed time to the request's serialization time."""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_serialization_time(time.perf_counter() - self.started)
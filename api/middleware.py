@@ -0,0 +1,126 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .budgets import QueryRecorder, check_budget, get_view_budget
+from .metrics import finish_request, registry, start_request
+from .profiling import sampler
+
+
+def get_view_class(view_func):
+    return getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+
+
+def get_response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records view, duration, DB time, query count, serialization time, cache
+    hits and response size for every request into the in-process metrics
+    registry served by MetricsView. The query recorder it installs is shared
+    with QueryBudgetMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            view_class = get_view_class(view_func)
+            metrics.view = view_class.__name__ if view_class is not None else view_func.__name__
+
+    def __call__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        metrics, token = start_request()
+        recorder = QueryRecorder()
+        request.metrics = metrics
+        request.query_recorder = recorder
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+            registry.record_request(
+                view=metrics.view or 'unresolved',
+                method=request.method,
+                status_code=response.status_code,
+                duration=time.perf_counter() - metrics.started,
+                db_time=recorder.duration,
+                queries=recorder.count,
+                serialization_time=metrics.serialization_time,
+                response_size=get_response_size(response),
+                cache_hits=metrics.cache_hits,
+                cache_misses=metrics.cache_misses,
+            )
+        finally:
+            finish_request(token)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Samples the stacks of a configurable fraction of requests per route
+    ('<ViewClass>.<METHOD>'); the rates are set through /api/profiling.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not sampler.get_rates():
+            return
+        view_class = get_view_class(view_func)
+        route = f'{view_class.__name__ if view_class is not None else view_func.__name__}.{request.method}'
+        if sampler.should_sample(route):
+            request.profiling_ident = sampler.start(route)
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            ident = getattr(request, 'profiling_ident', None)
+            if ident is not None:
+                sampler.stop(ident)
+
+
+class QueryBudgetMiddleware:
+    """
+    Enforces the query_budgets declared on views. In 'raise' mode (the test
+    suite) a request over its query count raises QueryBudgetExceeded; in
+    'log' mode, and for time_ms in either mode, it is logged with the
+    offending SQL fingerprints.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = get_view_class(view_func)
+        if view_class is not None:
+            request.query_budget = get_view_budget(view_class, request.method)
+            request.query_budget_view = view_class.__name__
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGETS['ENABLED']:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is None:
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None:
+            check_budget(request.query_budget_view, request.method, request.path, budget, recorder, elapsed_ms)
+        return response
@@ -2,7 +2,8 @@ from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIV
 from rest_framework.response import Response
 from rest_framework import status
 
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
+from django.db import transaction
 
 from .permission import (
     IsSystemAdministrator,
@@ -11,6 +12,10 @@ from .permission import (
     IsRegularCustomer,
 )
 
+from .analytics import record_order
+from .totals import deferred_totals, lock_cart, refresh_cart_totals
+from .roles import role_registry, users_with_role
+
 from littlelemon.models import (
     FoodCategory,
     FoodItem,
@@ -54,6 +59,9 @@ class AccountHelperMixin:
     def is_admin(self, request):
         return self.belongs_to_group(request, group_name='SysAdmin')
 
+    def is_manager_or_admin(self, request):
+        return request.user.groups.filter(name__in=['Manager', 'SysAdmin']).exists()
+
     def target_is_customer(self, request):
         return self.target_user_belongs_to_group(request, group_name='Customer')
 
@@ -73,7 +81,7 @@ class ResponseHelperMixin:
         return Response(serializer.data, status=response_status)
 
     def get_target_customer(self, **kwargs):
-        customer_queryset = User.objects.filter(groups__name='Customer').exclude(groups__name='Manager')
+        customer_queryset = users_with_role('Customer')
         try:
             return customer_queryset.get(pk=kwargs['pk'])
         except User.DoesNotExist:
@@ -111,30 +119,93 @@ class UserFilteredDetailMixin(RetrieveUpdateDestroyAPIView):
             return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def parse_id_list(value, limit):
+    """Return value as a list of unique ints, or None if it is not one."""
+    if not isinstance(value, list) or not value or len(value) > limit:
+        return None
+    try:
+        ids = [int(item) for item in value]
+    except (TypeError, ValueError):
+        return None
+    return list(dict.fromkeys(ids))
+
+
 class GroupManagementMixin:
     target_group = ''
+    bulk_limit = 1000
 
     def post(self, request):
+        if 'ids' in request.data:
+            return self.bulk_add(request)
         try:
             user_id = int(request.data.get('id'))
             target_user = User.objects.get(pk=user_id)
-            target_group = Group.objects.get(name=self.target_group)
+            target_group = role_registry.get_group(self.target_group)
             target_group.user_set.add(target_user)
-            target_group.save()
             return Response(self.serializer_class(target_user).data, status=status.HTTP_201_CREATED)
         except ValueError:
             return Response({'id': 'a valid integer is required'}, status=status.HTTP_400_BAD_REQUEST)
         except User.DoesNotExist:
             return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
-        
+
+    def delete(self, request):
+        return self.bulk_remove(request)
+
+    def get_bulk_ids(self, request):
+        return parse_id_list(request.data.get('ids'), self.bulk_limit)
+
+    def invalid_ids_response(self):
+        return Response(
+            {'ids': f'a list of at most {self.bulk_limit} integers is required'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def bulk_add(self, request):
+        ids = self.get_bulk_ids(request)
+        if ids is None:
+            return self.invalid_ids_response()
+        target_group = role_registry.get_group(self.target_group)
+        existing = set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        members = set(target_group.user_set.filter(pk__in=existing).values_list('pk', flat=True))
+        # one through-table insert and one role sync for the whole batch
+        target_group.user_set.add(*(existing - members))
+
+        results = {}
+        for user_id in ids:
+            if user_id not in existing:
+                results[user_id] = 'not found'
+            elif user_id in members:
+                results[user_id] = 'already a member'
+            else:
+                results[user_id] = 'added'
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def bulk_remove(self, request):
+        ids = self.get_bulk_ids(request)
+        if ids is None:
+            return self.invalid_ids_response()
+        target_group = role_registry.get_group(self.target_group)
+        existing = set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        members = set(target_group.user_set.filter(pk__in=existing).values_list('pk', flat=True))
+        target_group.user_set.remove(*members)
+
+        results = {}
+        for user_id in ids:
+            if user_id not in existing:
+                results[user_id] = 'not found'
+            elif user_id in members:
+                results[user_id] = 'removed'
+            else:
+                results[user_id] = 'not a member'
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
 
 class GroupMemberRemovalMixin:
     def delete(self, request, *args, **kwargs):
         try:
             target_user = User.objects.get(pk=kwargs['pk'])
-            target_group = Group.objects.get(name=self.target_group)
+            target_group = role_registry.get_group(self.target_group)
             target_group.user_set.remove(target_user)
-            target_group.save()
             return Response({'message': 'user removed from the group'}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -150,13 +221,13 @@ class CustomerReadOnlyMixin:
 
 
 class ShoppingCartHelperMixin(ResponseHelperMixin):
-    def get_or_create_cart(self, customer):
+    def get_or_create_cart(self, customer, lock=False):
+        # lock inside a transaction, before changing the cart, see lock_cart()
+        carts = self.model.objects.select_for_update() if lock else self.model.objects
         try:
-            return self.model.objects.get(customer=customer)
+            return carts.get(customer=customer)
         except self.model.DoesNotExist:
-            cart = self.model.objects.create(customer=customer)
-            cart.save()
-            return cart
+            return self.model.objects.create(customer=customer)
 
     def create_cart_item(self, request, customer, food_item_obj):
         quantity = request.data.get('quantity', 1)
@@ -181,20 +252,21 @@ class ShoppingCartHelperMixin(ResponseHelperMixin):
         except CartItem.DoesNotExist:
             return None
 
+    # the m2m change and the refresh of the stored totals it triggers commit together
     def add_item_to_cart(self, cart_item_obj, customer):
-        cart = self.get_or_create_cart(customer)
-        cart.cart_items.add(cart_item_obj)
-        cart.save()
+        with transaction.atomic():
+            cart = self.get_or_create_cart(customer, lock=True)
+            cart.cart_items.add(cart_item_obj)
     
     def remove_item_from_cart(self, cart_item_obj, customer):
-        cart = self.get_or_create_cart(customer)
-        cart.cart_items.remove(cart_item_obj)
-        cart.save()
+        with transaction.atomic():
+            cart = self.get_or_create_cart(customer, lock=True)
+            cart.cart_items.remove(cart_item_obj)
     
     def clear_cart(self, request, customer):
-        cart = self.get_or_create_cart(customer)
-        cart.cart_items.clear()
-        cart.save()
+        with transaction.atomic():
+            cart = self.get_or_create_cart(customer, lock=True)
+            cart.cart_items.clear()
 
 
 class CartItemHelperMixin(ResponseHelperMixin):
@@ -234,27 +306,38 @@ class OrderProcessingMixin(ResponseHelperMixin):
         except ShoppingCart.DoesNotExist:
             return None
     
-    def create_transaction_item_from_cart_item(self, cart_item):
-        transaction_item = TransactionItem.objects.create(
-            customer=cart_item.customer,
-            food_item=cart_item.food_item,
+    def build_transaction_item_from_cart_item(self, cart_item):
+        return TransactionItem(
+            customer_id=cart_item.customer_id,
+            food_item_id=cart_item.food_item_id,
             item_quantity=cart_item.item_quantity,
             item_unit_price=cart_item.item_unit_price,
             item_total_price=cart_item.item_total_price,
         )
-        transaction_item.save()
-        return transaction_item
     
     def create_transaction_from_cart(self, customer, customer_cart):
-        transaction = Transaction.objects.create(customer=customer)
-        for cart_item in customer_cart.cart_items.all():
-            transaction_item = self.create_transaction_item_from_cart_item(cart_item)
-            transaction.transaction_items.add(transaction_item)
-        transaction.save()
+        """
+        A transaction holding a copy of every cart line, written in bulk so
+        checkout costs the same number of queries whatever the cart size.
+        """
+        cart_items = list(customer_cart.cart_items.all())
+        transaction = Transaction.objects.create(
+            customer=customer,
+            # stored here, as the bulk m2m insert below sends no m2m_changed
+            total=sum(cart_item.item_total_price for cart_item in cart_items),
+            item_count=sum(cart_item.item_quantity for cart_item in cart_items),
+        )
+        transaction_items = TransactionItem.objects.bulk_create([
+            self.build_transaction_item_from_cart_item(cart_item) for cart_item in cart_items
+        ])
+        through = Transaction.transaction_items.through
+        through.objects.bulk_create([
+            through(transaction_id=transaction.pk, transactionitem_id=item.pk) for item in transaction_items
+        ])
         return transaction
     
     def calculate_transaction_total(self, transaction_record):
-        return sum(item.item_total_price for item in transaction_record.transaction_items.all())
+        return transaction_record.total
     
     def create_order_from_transaction(self, customer, transaction_record):
         order = self.model.objects.create(
@@ -262,13 +345,107 @@ class OrderProcessingMixin(ResponseHelperMixin):
             transaction=transaction_record,
             order_total=self.calculate_transaction_total(transaction_record)
         )
-        order.save()
+        record_order(order)
         return order
     
     def clear_customer_cart_items(self, customer):
-        CartItem.objects.filter(customer=customer).delete()
+        with deferred_totals():
+            CartItem.objects.filter(customer=customer).delete()
         return not CartItem.objects.filter(customer=customer).exists()
 
+    def get_reorder_lines(self, order):
+        """
+        (food item, quantity, unit price) for each line of a past order, at
+        current prices; items no longer on the menu are returned apart.
+        """
+        through = Transaction.transaction_items.through
+        rows = list(through.objects.filter(transaction_id=order.transaction_id).values_list(
+            'transactionitem__food_item_id', 'transactionitem__item_quantity',
+        ))
+        # read at request time, so every worker prices a reorder at the current cost
+        prices = dict(FoodItem.objects.filter(pk__in={food_item_id for food_item_id, _ in rows}).values_list('pk', 'cost'))
+        lines, unavailable = [], []
+        for food_item_id, quantity in rows:
+            if food_item_id in prices:
+                lines.append((food_item_id, quantity, prices[food_item_id]))
+            else:
+                unavailable.append(food_item_id)
+        return lines, unavailable
+
+    def reorder_into_cart(self, customer, lines, replace=False):
+        """
+        Add the lines to the customer's cart, in bulk. An item the customer
+        already has gets the line's quantity added, at the current price.
+        With replace, the cart is emptied first.
+        """
+        cart, _ = ShoppingCart.objects.select_for_update().get_or_create(customer=customer)
+        # a customer has one cart item per food item
+        quantities, prices = {}, {}
+        for food_item_id, quantity, unit_price in lines:
+            quantities[food_item_id] = quantities.get(food_item_id, 0) + quantity
+            prices[food_item_id] = unit_price
+        with deferred_totals():
+            cart_items = CartItem.objects.filter(customer=customer)
+            if replace:
+                # also deletes their rows in the cart's m2m table
+                cart_items.delete()
+                existing = []
+            else:
+                existing = list(cart_items.filter(food_item_id__in=list(quantities)))
+            for item in existing:
+                item.item_quantity += quantities.pop(item.food_item_id)
+                item.item_unit_price = prices[item.food_item_id]
+                item.item_total_price = item.item_unit_price * item.item_quantity
+            CartItem.objects.bulk_update(existing, ['item_quantity', 'item_unit_price', 'item_total_price'])
+            created = CartItem.objects.bulk_create([
+                CartItem(
+                    customer=customer,
+                    food_item_id=food_item_id,
+                    item_quantity=quantity,
+                    item_unit_price=prices[food_item_id],
+                    item_total_price=prices[food_item_id] * quantity,
+                )
+                for food_item_id, quantity in quantities.items()
+            ])
+            through = ShoppingCart.cart_items.through
+            through.objects.bulk_create(
+                [through(shoppingcart_id=cart.pk, cartitem_id=item.pk) for item in existing + created],
+                # items already in the cart keep their row
+                ignore_conflicts=True,
+            )
+            refresh_cart_totals([cart.pk])
+        return cart
+
+    def reorder_into_order(self, customer, lines):
+        """Place a new order for the lines, in bulk, leaving the cart alone."""
+        transaction_record = Transaction.objects.create(
+            customer=customer,
+            # stored here, as the bulk m2m insert below sends no m2m_changed
+            total=sum(unit_price * quantity for _, quantity, unit_price in lines),
+            item_count=sum(quantity for _, quantity, _ in lines),
+        )
+        transaction_items = TransactionItem.objects.bulk_create([
+            TransactionItem(
+                customer=customer,
+                food_item_id=food_item_id,
+                item_quantity=quantity,
+                item_unit_price=unit_price,
+                item_total_price=unit_price * quantity,
+            )
+            for food_item_id, quantity, unit_price in lines
+        ])
+        through = Transaction.transaction_items.through
+        through.objects.bulk_create([
+            through(transaction_id=transaction_record.pk, transactionitem_id=item.pk) for item in transaction_items
+        ])
+        order = CustomerOrder.objects.create(
+            customer=customer,
+            transaction=transaction_record,
+            order_total=transaction_record.total,
+        )
+        record_order(order)
+        return order
+
 
 class TransactionDetailMixin(ResponseHelperMixin):
     pass
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
 
@@ -38,4 +39,21 @@ class IsCustomerOrDeliveryStaff(BasePermission):
         if not bool(request.user and request.user.is_authenticated):
             return False
         user_groups = request.user.groups.values_list('name', flat=True)
-        return 'Customer' in user_groups or 'Delivery Crew' in user_groups
\ No newline at end of file
+        return 'Customer' in user_groups or 'Delivery Crew' in user_groups
+
+
+class IsDeliveryStaffOrManager(BasePermission):
+    def has_permission(self, request, view):
+        if not bool(request.user and request.user.is_authenticated):
+            return False
+        user_groups = request.user.groups.values_list('name', flat=True)
+        return 'Delivery Crew' in user_groups or 'Manager' in user_groups or 'SysAdmin' in user_groups
+
+
+class IsMetricsScraper(BasePermission):
+    def has_permission(self, request, view):
+        if request.META.get('REMOTE_ADDR') in settings.METRICS['SCRAPE_IPS']:
+            return True
+        if not bool(request.user and request.user.is_authenticated):
+            return False
+        return request.user.groups.filter(name='SysAdmin').exists()
@@ -0,0 +1,220 @@
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.test.signals import setting_changed
+
+from .sharedstate import ProcessSnapshots
+
+logger = logging.getLogger('api.profiling')
+
+
+def frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{code.co_name}'
+
+
+def fold_stack(frame, max_depth):
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of the threads currently serving a profiled
+    request and aggregates them per route as folded stacks, the input format
+    of flamegraph.pl, speedscope and inferno.
+
+    One daemon thread samples every profiled thread at INTERVAL seconds and
+    sleeps while nothing is being profiled; unprofiled requests pay for a
+    single dictionary lookup and a random draw.
+
+    The rates and the samples live in the shared PROFILING['CACHE'], so
+    /api/profiling works whichever worker serves it: every worker reads
+    the rates at most every SYNC_INTERVAL seconds and publishes its own
+    stacks every PUBLISH_INTERVAL seconds while sampling.
+    """
+
+    RATES_KEY = 'profiling_rates'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.thread = None
+        self.active = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            config = settings.PROFILING
+            self.default_rates = dict(config['ROUTES'])
+            self.rates = dict(self.default_rates)
+            self.interval = config['INTERVAL']
+            self.max_depth = config['MAX_STACK_DEPTH']
+            self.sync_interval = config['SYNC_INTERVAL']
+            self.publish_interval = config['PUBLISH_INTERVAL']
+            self.shared = ProcessSnapshots(config['CACHE'], 'profiling_stacks')
+            self.synced = None
+            self.published = time.monotonic()
+            self.stacks = {}
+            self.requests = Counter()
+            self.dirty = False
+
+    @property
+    def cache(self):
+        return self.shared.cache
+
+    def get_rates(self, refresh=False):
+        """The sampling rates, read from the shared cache when SYNC_INTERVAL has passed."""
+        now = time.monotonic()
+        if refresh or self.synced is None or now - self.synced >= self.sync_interval:
+            try:
+                rates = self.cache.get(self.RATES_KEY)
+            except Exception:
+                logger.exception('Could not read the profiling rates')
+                rates = None
+            self.rates = self.default_rates if rates is None else rates
+            self.synced = now
+        return self.rates
+
+    def set_rate(self, route, rate):
+        rates = dict(self.get_rates(refresh=True))
+        if rate:
+            rates[route] = rate
+        else:
+            rates.pop(route, None)
+        self.cache.set(self.RATES_KEY, rates, None)
+        self.rates = rates
+
+    def should_sample(self, route):
+        rate = self.get_rates().get(route)
+        return bool(rate) and random.random() < rate
+
+    def start(self, route):
+        ident = threading.get_ident()
+        with self.lock:
+            self.active[ident] = route
+            self.requests[route] += 1
+            self.dirty = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='api-stack-sampler', daemon=True)
+                self.thread.start()
+            self.wakeup.notify()
+        return ident
+
+    def stop(self, ident):
+        with self.lock:
+            self.active.pop(ident, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                idle = not self.active
+            if idle:
+                # publish what the last requests collected before sleeping
+                self.publish()
+            with self.lock:
+                while not self.active:
+                    self.wakeup.wait()
+                active = dict(self.active)
+                interval = self.interval
+
+            frames = sys._current_frames()
+            samples = [
+                (route, fold_stack(frames[ident], self.max_depth))
+                for ident, route in active.items()
+                if ident in frames
+            ]
+            del frames
+            with self.lock:
+                for route, stack in samples:
+                    self.stacks.setdefault(route, Counter())[stack] += 1
+                self.dirty = True
+            if time.monotonic() - self.published >= self.publish_interval:
+                self.publish()
+            time.sleep(interval)
+
+    def publish(self):
+        """Write this process's stacks and request counts to the shared cache."""
+        self.published = time.monotonic()
+        try:
+            cleared = self.shared.cleared_since_publish()
+            with self.lock:
+                self.drop(cleared)
+                if not self.dirty:
+                    return
+                snapshot = {
+                    'stacks': {route: dict(stacks) for route, stacks in self.stacks.items()},
+                    'requests': dict(self.requests),
+                }
+                self.dirty = False
+            self.shared.publish(snapshot)
+        except Exception:
+            # the profiler must never fail the requests it observes
+            logger.exception('Could not publish the profiling samples')
+
+    def drop(self, routes):
+        if None in routes:
+            self.dirty = self.dirty or bool(self.stacks or self.requests)
+            self.stacks.clear()
+            self.requests.clear()
+            return
+        for route in routes:
+            self.dirty = self.dirty or route in self.stacks or route in self.requests
+            self.stacks.pop(route, None)
+            self.requests.pop(route, None)
+
+    def collect(self):
+        """(stacks, requests) per route, summed over every worker."""
+        self.publish()
+        stacks, requests = {}, Counter()
+        for snapshot, cleared in self.shared.collect():
+            for route, counts in snapshot['stacks'].items():
+                if route not in cleared:
+                    stacks.setdefault(route, Counter()).update(counts)
+            requests.update({route: count for route, count in snapshot['requests'].items() if route not in cleared})
+        return stacks, requests
+
+    def routes(self):
+        stacks, requests = self.collect()
+        rates = self.get_rates(refresh=True)
+        return [
+            {
+                'route': route,
+                'rate': rates.get(route, 0.0),
+                'requests': requests[route],
+                'samples': sum(stacks.get(route, Counter()).values()),
+            }
+            for route in sorted(set(rates) | set(stacks))
+        ]
+
+    def folded(self, route):
+        stacks = self.collect()[0].get(route)
+        if stacks is None:
+            return None
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+    def clear(self, route=None):
+        self.shared.clear(route)
+        with self.lock:
+            self.drop({route})
+            self.dirty = False
+
+
+sampler = StackSampler()
+
+
+def reset_sampler(*args, **kwargs):
+    if kwargs['setting'] == 'PROFILING':
+        sampler.reset()
+
+
+setting_changed.connect(reset_sampler)
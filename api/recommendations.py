@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.test.signals import setting_changed
+from django.utils import timezone
+
+from littlelemon.models import FoodItem
+
+from .catalog import get_catalog_version
+from .columns import np, require_numpy
+from .historical import co_purchase_counts, load_columns
+
+logger = logging.getLogger('api.recommendations')
+
+
+class RecommendationsNotReady(Exception):
+    pass
+
+
+class RecommendationIndex:
+    """
+    Frequently-bought-together index, held in memory by each process: for
+    every menu item, the LIMIT items most often in the same transaction
+    over the last WINDOW_DAYS, with how many transactions had both and the
+    share of the item's transactions that did. Built from the historical
+    report columns on a background thread, started with the server or by
+    the first request, and rebuilt once it is REFRESH_SECONDS old or the
+    catalog version changes, while the old index keeps answering.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            # (items, neighbours), swapped as one so readers never mix builds
+            self.index = None
+            self.built_at = 0
+            self.catalog_version = None
+            self.checked = 0
+            # not a flag: a thread started before a fork is not running in the child
+            self.refresh_thread = None
+
+    def build(self):
+        config = settings.RECOMMENDATIONS
+        catalog_version = get_catalog_version()
+        items = {
+            # cost as a string, as the menu item endpoints render it
+            pk: {'id': pk, 'name': name, 'cost': str(cost)}
+            for pk, name, cost in FoodItem.objects.values_list('pk', 'name', 'cost')
+        }
+        start = timezone.localdate() - timedelta(days=config['WINDOW_DAYS'])
+        item_ids, basket_counts, pairs, counts = co_purchase_counts(load_columns(start))
+        neighbours = {}
+        if len(pairs):
+            # both directions of each pair, grouped by item and most frequent first
+            source = np.concatenate([pairs[:, 0], pairs[:, 1]])
+            target = np.concatenate([pairs[:, 1], pairs[:, 0]])
+            counts = np.concatenate([counts, counts])
+            order = np.lexsort((target, -counts, source))
+            source, target, counts = source[order], target[order], counts[order]
+            starts = np.flatnonzero(np.diff(source, prepend=source[0] - 1))
+            rank = np.arange(len(source)) - np.repeat(starts, np.diff(np.append(starts, len(source))))
+            kept = rank < config['LIMIT']
+            totals = dict(zip(item_ids.tolist(), basket_counts.tolist()))
+            for pk, other, count in zip(source[kept].tolist(), target[kept].tolist(), counts[kept].tolist()):
+                if pk in items and other in items:
+                    neighbours.setdefault(pk, []).append((other, count, round(count / totals[pk], 4)))
+        with self.lock:
+            self.index = (items, neighbours)
+            self.built_at = self.checked = time.monotonic()
+            self.catalog_version = catalog_version
+
+    def is_stale(self):
+        """
+        Whether the index is due for a rebuild. The catalog version is read
+        at most every CHECK_SECONDS, so most requests touch no table.
+        """
+        config = settings.RECOMMENDATIONS
+        now = time.monotonic()
+        if now - self.built_at > config['REFRESH_SECONDS']:
+            return True
+        if now - self.checked < config['CHECK_SECONDS']:
+            return False
+        self.checked = now
+        return self.catalog_version != get_catalog_version()
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refresh_thread is not None and self.refresh_thread.is_alive():
+                return
+            self.refresh_thread = threading.Thread(target=self.run_refresh, name='api-recommendations', daemon=True)
+            self.refresh_thread.start()
+
+    def run_refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Could not rebuild the recommendation index')
+        finally:
+            connection.close()
+
+    def recommend(self, pk):
+        """
+        The recommendations for a menu item, or None when the index does
+        not know the item. Raises RecommendationsNotReady until the first
+        build has finished.
+        """
+        index = self.index
+        if index is None:
+            require_numpy()
+            self.refresh_in_background()
+            raise RecommendationsNotReady('the recommendations are still being built')
+        if self.is_stale():
+            self.refresh_in_background()
+        items, neighbours = index
+        if pk not in items:
+            return None
+        return [
+            dict(items[other], transactions=count, confidence=confidence)
+            for other, count, confidence in neighbours.get(pk, [])
+        ]
+
+
+recommendation_index = RecommendationIndex()
+
+
+def start_recommendations(**kwargs):
+    """
+    request_started receiver starting the first build in each server
+    process. Connected by the WSGI and ASGI modules, so the build runs in
+    the process serving requests and never in a master that forks them.
+    """
+    if recommendation_index.index is None and np is not None:
+        recommendation_index.refresh_in_background()
+
+
+def reset_recommendations(*args, **kwargs):
+    if kwargs['setting'] == 'RECOMMENDATIONS':
+        recommendation_index.reset()
+
+
+setting_changed.connect(reset_recommendations)
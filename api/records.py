@@ -0,0 +1,144 @@
+import codecs
+import csv
+import io
+import json
+from functools import partial
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = ['csv', 'jsonl', 'json']
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json'}
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+CHUNK_SIZE = 65536
+JSON_WHITESPACE = ' \t\n\r'
+
+
+class RecordFormatError(ValueError):
+    pass
+
+
+def detect_format(name):
+    for extension, fmt in EXTENSIONS.items():
+        if name.lower().endswith(extension):
+            return fmt
+    raise RecordFormatError(f'cannot tell the format of {name!r}; use one of {", ".join(FORMATS)}')
+
+
+def iter_records(stream, fmt):
+    """
+    Yield (line, record) pairs from a binary CSV (with a header row), JSON
+    lines or JSON array stream, one record at a time. The line of an item
+    of a JSON array is its index; a syntax error in the array raises
+    RecordFormatError once the records before it have been yielded.
+    """
+    if fmt == 'json':
+        chunks = codecs.iterdecode(iter(partial(stream.read, CHUNK_SIZE), b''), 'utf-8-sig')
+        yield from enumerate(iter_json_array(chunks), start=1)
+        return
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record
+    else:
+        raise RecordFormatError(f'unknown format {fmt!r}; use one of {", ".join(FORMATS)}')
+
+
+def iter_json_array(chunks):
+    """
+    Yield the items of the JSON array spread over the text chunks, keeping
+    only the unread part of the current item in memory.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer, position = '', 0
+
+    def read_more():
+        nonlocal buffer, position
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer, position = buffer[position:] + chunk, 0
+        return True
+
+    def next_char():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read_more():
+                return None
+
+    if next_char() != '[':
+        raise RecordFormatError('a JSON file must hold an array of records')
+    position += 1
+    if next_char() == ']':
+        position += 1
+    else:
+        while True:
+            if next_char() is None:
+                raise RecordFormatError('the file is not valid JSON')
+            # an item that ends the buffer may be cut short, e.g. a number
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    item, end = None, None
+                if end is not None and end < len(buffer):
+                    break
+                if not read_more():
+                    if end is None:
+                        raise RecordFormatError('the file is not valid JSON')
+                    break
+            position = end
+            yield item
+            separator = next_char()
+            position += 1
+            if separator == ']':
+                break
+            if separator != ',':
+                raise RecordFormatError('the file is not valid JSON')
+    if next_char() is not None:
+        raise RecordFormatError('the file is not valid JSON')
+
+
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def write_records(rows, fields, fmt, chunk_size=65536):
+    """
+    Yield rows (tuples in fields order) as CSV with a header row or as JSON
+    lines, in chunks of about chunk_size characters.
+    """
+    if fmt not in CONTENT_TYPES:
+        raise RecordFormatError(f'cannot export as {fmt!r}; use one of {", ".join(CONTENT_TYPES)}')
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n')
+    for row in rows:
+        write(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
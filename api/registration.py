@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from littlelemon.models import RoleMembership
+
+from .roles import role_registry
+
+DEFAULT_ROLE = 'Customer'
+
+
+def register_user(username, password=None, email='', password_hash=None, is_active=True, **extra_fields):
+    """
+    Create a user in the Customer group in one transaction: the user row,
+    the group membership and its RoleMembership, three INSERTs. Pass
+    password_hash when the password was already hashed (e.g. on the
+    hashing pool), otherwise password is hashed here.
+    """
+    user_model = get_user_model()
+    if password_hash is None:
+        password_hash = make_password(password)
+    user = user_model(
+        username=user_model.normalize_username(username),
+        email=user_model.objects.normalize_email(email or ''),
+        password=password_hash,
+        is_active=is_active,
+        **extra_fields,
+    )
+    # tells the post_save / user_registered handlers the group is handled here
+    user._default_group_assigned = True
+    group_id = role_registry.group_id(DEFAULT_ROLE)
+    with transaction.atomic():
+        user.save()
+        # written directly, so m2m_changed does not resync RoleMembership
+        user_model.groups.through.objects.create(user_id=user.pk, group_id=group_id)
+        RoleMembership.objects.create(user_id=user.pk, role=DEFAULT_ROLE)
+    return user
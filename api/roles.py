@@ -0,0 +1,139 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models import F
+
+from littlelemon.models import RoleGroupsVersion, RoleMembership
+
+ROLES = ['SysAdmin', 'Manager', 'Delivery Crew', 'Customer']
+STAFF_ROLES = ['SysAdmin', 'Manager']
+ROLE_GROUPS_VERSION_ID = 1
+
+
+def get_role_groups_version():
+    version = RoleGroupsVersion.objects.filter(pk=ROLE_GROUPS_VERSION_ID).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_role_groups_version():
+    """Tell every worker's RoleRegistry to reload the groups."""
+    versions = RoleGroupsVersion.objects.filter(pk=ROLE_GROUPS_VERSION_ID)
+    with transaction.atomic():
+        if not versions.update(version=F('version') + 1):
+            # the row is created by the migrations; recreate it if it was deleted
+            RoleGroupsVersion.objects.get_or_create(pk=ROLE_GROUPS_VERSION_ID)
+            versions.update(version=F('version') + 1)
+
+
+class RoleRegistry:
+    """
+    The role groups, read with one query on first use and creating any that
+    are missing. Group saves and deletes, and migrate/flush, invalidate it.
+    Those happen in one process, so the registry also checks the shared
+    RoleGroupsVersion row at most every ROLE_REGISTRY['SYNC_INTERVAL']
+    seconds and reloads when another process changed a group.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.groups = None
+        self.version = None
+        self.checked = 0.0
+
+    def load(self):
+        groups = self.groups
+        if groups is not None and time.monotonic() - self.checked < settings.ROLE_REGISTRY['SYNC_INTERVAL']:
+            return groups
+        with self.lock:
+            if self.groups is not None and time.monotonic() - self.checked >= settings.ROLE_REGISTRY['SYNC_INTERVAL']:
+                if get_role_groups_version() != self.version:
+                    self.groups = None
+                self.checked = time.monotonic()
+            if self.groups is None:
+                # read first: a change after it is seen by the next check
+                version = get_role_groups_version()
+                groups = {group.name: group for group in Group.objects.filter(name__in=ROLES)}
+                for role in ROLES:
+                    if role not in groups:
+                        groups[role] = Group.objects.get_or_create(name=role)[0]
+                self.version = version
+                self.checked = time.monotonic()
+                self.groups = groups
+            return self.groups
+
+    def invalidate(self):
+        self.groups = None
+
+    def get_group(self, role):
+        """The shared Group instance of a role; use it for lookups and its related managers only."""
+        return self.load()[role]
+
+    def group_id(self, role):
+        return self.load()[role].pk
+
+    def role_for_group_id(self, group_id):
+        for role, group in self.load().items():
+            if group.pk == group_id:
+                return role
+        return None
+
+
+role_registry = RoleRegistry()
+
+
+def ensure_role_groups(*args, **kwargs):
+    role_registry.invalidate()
+    role_registry.load()
+
+
+def effective_roles(group_names):
+    """
+    The roles a user is listed under: SysAdmin and Manager shadow every
+    other group, Delivery Crew and Customer can be held together.
+    """
+    for role in STAFF_ROLES:
+        if role in group_names:
+            return [role]
+    return [role for role in ROLES if role in group_names]
+
+
+def users_with_role(role):
+    return User.objects.filter(role_memberships__role=role)
+
+
+def sync_user_roles(user_ids):
+    """Recompute the RoleMembership rows of the given users from their groups."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    through = User.groups.through
+    group_names = {user_id: set() for user_id in user_ids}
+    memberships = through.objects.filter(user_id__in=user_ids, group__name__in=ROLES)
+    for user_id, name in memberships.values_list('user_id', 'group__name'):
+        group_names[user_id].add(name)
+
+    with transaction.atomic():
+        RoleMembership.objects.filter(user_id__in=user_ids).delete()
+        RoleMembership.objects.bulk_create([
+            RoleMembership(user_id=user_id, role=role)
+            for user_id, names in group_names.items()
+            for role in effective_roles(names)
+        ])
+
+
+def backfill_user_roles(batch_size=2000):
+    """Rebuild RoleMembership for every user, batch_size users at a time."""
+    synced = 0
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return synced
+        sync_user_roles(user_ids)
+        synced += len(user_ids)
+        last_id = user_ids[-1]
@@ -1,71 +1,142 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
+from djoser.conf import settings as djoser_settings
+from djoser.serializers import UserCreatePasswordRetypeSerializer, UserCreateSerializer
 
 from littlelemon.models import (
     FoodItem, FoodCategory, ShoppingCart, CustomerOrder, CartItem, Transaction, TransactionItem,
+    OrderStatusChange,
 )
 
+from .metrics import timed_serialization
+from .registration import register_user
+from .transitions import STATE_NAMES
 
-class UserGroupSerializer(serializers.ModelSerializer):
+
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class UserGroupSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = ['id', 'name']
 
 
-class AccountSerializer(serializers.HyperlinkedModelSerializer):
+class AccountSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
+
+
+class CourierLoadSerializer(AccountSerializer):
+    open_orders = serializers.IntegerField(read_only=True)
+    delivered_today = serializers.IntegerField(read_only=True)
+
+    class Meta(AccountSerializer.Meta):
+        fields = AccountSerializer.Meta.fields + ['open_orders', 'delivered_today']
     
 
-class FoodItemSerializer(serializers.HyperlinkedModelSerializer):
+class FoodItemSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     food_category_id = serializers.IntegerField(write_only=True, source='food_category')
 
     class Meta:
         model = FoodItem
         fields = ['id', 'name', 'cost', 'is_featured', 'food_category', 'food_category_id']
         read_only_fields = ['food_category']
+        extra_kwargs = {
+            'food_category': {'view_name': 'category-detail'},
+        }
 
 
-class FoodCategorySerializer(serializers.ModelSerializer):
+class FoodCategorySerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = FoodCategory
         fields = ['id', 'name', 'category_slug']
 
 
-class CartItemSerializer(serializers.HyperlinkedModelSerializer):
+class CartItemSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = CartItem
         fields = ['id', 'customer', 'food_item', 'item_quantity', 'item_unit_price', 'item_total_price']
         read_only_fields = ['customer', 'item_unit_price', 'item_total_price']
+        extra_kwargs = {
+            'customer': {'view_name': 'account-detail'},
+        }
 
 
-class ShoppingCartSerializer(serializers.HyperlinkedModelSerializer):
+class ShoppingCartSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = ShoppingCart
-        fields = ['id', 'customer', 'cart_items']
-        read_only_fields = ['customer']
+        fields = ['id', 'customer', 'cart_items', 'total', 'item_count']
+        read_only_fields = ['customer', 'total', 'item_count']
+        extra_kwargs = {
+            'customer': {'view_name': 'account-detail'},
+        }
 
 
-class TransactionSerializer(serializers.HyperlinkedModelSerializer):
+class TransactionSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Transaction
-        fields = ['id', 'customer', 'transaction_items', 'transaction_date']
-        read_only_fields = ['customer', 'transaction_date']
+        fields = ['id', 'customer', 'transaction_items', 'transaction_date', 'total', 'item_count']
+        read_only_fields = ['customer', 'transaction_date', 'total', 'item_count']
+        extra_kwargs = {
+            'customer': {'view_name': 'account-detail'},
+        }
 
 
-class TransactionItemSerializer(serializers.HyperlinkedModelSerializer):
+class TransactionItemSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = TransactionItem
         fields = ['id', 'customer', 'food_item', 'item_quantity', 'item_unit_price', 'item_total_price']
         read_only_fields = ['customer', 'item_unit_price', 'item_total_price']
+        extra_kwargs = {
+            'customer': {'view_name': 'account-detail'},
+        }
+
 
+class CustomerOrderSerializer(TimedRepresentationMixin, serializers.HyperlinkedModelSerializer):
+    state = serializers.SerializerMethodField()
 
-class CustomerOrderSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = CustomerOrder
-        fields = ['id', 'customer', 'transaction', 'assigned_delivery_person', 'is_delivered', 'order_total', 'order_date']
-        read_only_fields = ['id', 'customer', 'transaction', 'assigned_delivery_person', 'order_total', 'order_date']
+        fields = ['id', 'customer', 'transaction', 'assigned_delivery_person', 'is_delivered', 'state', 'version', 'order_total', 'order_date']
+        read_only_fields = ['id', 'customer', 'transaction', 'assigned_delivery_person', 'is_delivered', 'version', 'order_total', 'order_date']
         extra_kwargs = {
+            'customer': {'view_name': 'account-detail'},
+            'assigned_delivery_person': {'view_name': 'account-detail'},
             'assigned_delivery_person_id': {'write_only': True},
         }
+
+    def get_state(self, obj):
+        return STATE_NAMES[obj.status]
+
+
+class OrderStatusChangeSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    from_state = serializers.SerializerMethodField()
+    to_state = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderStatusChange
+        fields = ['version', 'from_state', 'to_state', 'courier', 'changed_by', 'changed_at']
+
+    def get_from_state(self, obj):
+        return STATE_NAMES[obj.from_status]
+
+    def get_to_state(self, obj):
+        return STATE_NAMES[obj.to_status]
+
+
+class RegistrationServiceMixin:
+    def perform_create(self, validated_data):
+        return register_user(is_active=not djoser_settings.SEND_ACTIVATION_EMAIL, **validated_data)
+
+
+class RegistrationSerializer(RegistrationServiceMixin, UserCreateSerializer):
+    pass
+
+
+class RegistrationPasswordRetypeSerializer(RegistrationServiceMixin, UserCreatePasswordRetypeSerializer):
+    pass
@@ -0,0 +1,70 @@
+import os
+import time
+
+from django.core.cache import caches
+
+
+class ProcessSnapshots:
+    """
+    State each worker process collects for itself and publishes to a
+    shared cache, so a view or management command running in any process
+    can read what every process collected.
+
+    A process only overwrites its own key, so no update is lost to two
+    processes reading and writing the same value. The index of publishing
+    processes is the one shared key: a process missing from it after two
+    registered at once adds itself again on its next publish.
+
+    clear() records when it ran, for everything or for one part. Snapshots
+    published before a clear are read without the cleared parts, and
+    cleared_since_publish() tells a process which parts of its local state
+    to drop before it publishes again.
+    """
+
+    def __init__(self, cache_alias, prefix):
+        self.cache_alias = cache_alias
+        self.prefix = prefix
+        self.index_key = f'{prefix}_processes'
+        self.cleared_key = f'{prefix}_cleared'
+        self.published_at = 0.0
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def key(self, pid):
+        return f'{self.prefix}_{pid}'
+
+    def publish(self, value):
+        cache = self.cache
+        pid = os.getpid()
+        self.published_at = time.time()
+        cache.set(self.key(pid), {'published_at': self.published_at, 'value': value}, None)
+        processes = cache.get(self.index_key) or set()
+        if pid not in processes:
+            cache.set(self.index_key, processes | {pid}, None)
+
+    def cleared_since_publish(self):
+        """The parts cleared since this process last published; None stands for everything."""
+        marks = self.cache.get(self.cleared_key) or {}
+        return {part for part, cleared_at in marks.items() if cleared_at > self.published_at}
+
+    def collect(self):
+        """Yield (value, cleared parts) for every published snapshot."""
+        cache = self.cache
+        processes = cache.get(self.index_key) or set()
+        marks = cache.get(self.cleared_key) or {}
+        for snapshot in cache.get_many([self.key(pid) for pid in processes]).values():
+            cleared = {part for part, cleared_at in marks.items() if cleared_at > snapshot['published_at']}
+            if None not in cleared:
+                yield snapshot['value'], cleared
+
+    def clear(self, part=None):
+        cache = self.cache
+        marks = cache.get(self.cleared_key) or {}
+        if part is None:
+            processes = cache.get(self.index_key) or set()
+            cache.delete_many([self.key(pid) for pid in processes] + [self.index_key])
+            marks = {}
+        marks[part] = time.time()
+        cache.set(self.cleared_key, marks, None)
@@ -1,21 +1,29 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User, Group
 from djoser.signals import user_registered
 
+from django.utils import timezone
+
+from littlelemon.models import CartItem, CustomerOrder, FoodCategory, FoodItem, ShoppingCart, Transaction, TransactionItem
+
+from .catalog import bump_catalog_version
+from .roles import bump_role_groups_version, role_registry, sync_user_roles
+from .snapshots import mark_stale, mark_transactions_stale
+from .totals import refresh_cart_totals, refresh_transaction_totals
+
 
 @receiver(post_save, sender=User)
 def assign_customer_group(sender, instance, created, **kwargs):
     """
     Automatically assign new users to the Customer group when they are created.
     This ensures all new registrations are assigned to the Customer group.
+    api.registration.register_user assigns the group itself.
     """
-    if created:
+    if created and not getattr(instance, '_default_group_assigned', False):
         try:
-            customer_group, _ = Group.objects.get_or_create(name='Customer')
-            # Only add if user doesn't already have other groups (like Manager, Admin, etc.)
-            if not instance.groups.exists():
-                customer_group.user_set.add(instance)
+            # A user that was just created has no groups yet
+            role_registry.get_group('Customer').user_set.add(instance)
         except Exception:
             pass  # Silently fail if group doesn't exist yet
 
@@ -25,10 +33,132 @@ def assign_customer_group_on_djoser_registration(sender, user, request, **kwargs
     """
     Assign user to Customer group when registered via djoser.
     """
+    if getattr(user, '_default_group_assigned', False):
+        return
     try:
-        customer_group, _ = Group.objects.get_or_create(name='Customer')
+        customer_group = role_registry.get_group('Customer')
         # Only add if user doesn't already have other groups
         if not user.groups.exists():
             customer_group.user_set.add(user)
     except Exception:
         pass
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def sync_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep RoleMembership in step with group membership, from either side of
+    the relation (user.groups or group.user_set).
+    """
+    if action == 'pre_clear' and reverse:
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        sync_user_roles(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        sync_user_roles(instance.__dict__.pop('_cleared_user_ids', []) if reverse else [instance.pk])
+
+
+@receiver(pre_save, sender=Group)
+def detect_group_rename(sender, instance, **kwargs):
+    if instance.pk is not None:
+        previous_name = Group.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+        instance._renamed = previous_name is not None and previous_name != instance.name
+
+
+@receiver(post_save, sender=Group)
+def sync_roles_on_group_rename(sender, instance, created, **kwargs):
+    bump_role_groups_version()
+    role_registry.invalidate()
+    if instance.__dict__.pop('_renamed', False):
+        sync_user_roles(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_deleted_group_members(sender, instance, **kwargs):
+    instance._deleted_user_ids = list(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def sync_roles_on_group_delete(sender, instance, **kwargs):
+    bump_role_groups_version()
+    role_registry.invalidate()
+    sync_user_roles(instance.__dict__.pop('_deleted_user_ids', []))
+
+
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+@receiver(post_save, sender=FoodCategory)
+@receiver(post_delete, sender=FoodCategory)
+def bump_catalog_version_on_menu_change(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Transaction.transaction_items.through)
+def refresh_totals_on_transaction_items_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_transaction_ids = list(instance.transactions.values_list('pk', flat=True))
+        return
+    if action in ('post_add', 'post_remove'):
+        transaction_ids = pk_set if reverse else [instance.pk]
+    elif action == 'post_clear':
+        transaction_ids = instance.__dict__.pop('_cleared_transaction_ids', []) if reverse else [instance.pk]
+    else:
+        return
+    refresh_transaction_totals(transaction_ids)
+    mark_transactions_stale(transaction_ids)
+
+
+@receiver(post_save, sender=TransactionItem)
+def refresh_totals_on_transaction_item_save(sender, instance, created, **kwargs):
+    # a new item is not in any transaction yet
+    if not created:
+        transaction_ids = list(instance.transactions.values_list('pk', flat=True))
+        refresh_transaction_totals(transaction_ids)
+        mark_transactions_stale(transaction_ids)
+
+
+@receiver(pre_delete, sender=TransactionItem)
+def remember_transactions_of_deleted_item(sender, instance, **kwargs):
+    instance._transaction_ids = list(instance.transactions.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=TransactionItem)
+def refresh_totals_on_transaction_item_delete(sender, instance, **kwargs):
+    transaction_ids = instance.__dict__.pop('_transaction_ids', [])
+    refresh_transaction_totals(transaction_ids)
+    mark_transactions_stale(transaction_ids)
+
+
+@receiver(post_delete, sender=Transaction)
+def mark_snapshot_stale_on_transaction_delete(sender, instance, **kwargs):
+    mark_stale([timezone.localdate(instance.transaction_date)])
+
+
+@receiver(post_save, sender=CustomerOrder)
+@receiver(post_delete, sender=CustomerOrder)
+def mark_snapshot_stale_on_order_change(sender, instance, created=False, **kwargs):
+    # orders are placed today, which the snapshot never holds
+    if not created:
+        mark_stale([timezone.localdate(instance.order_date)])
+
+
+@receiver(m2m_changed, sender=ShoppingCart.cart_items.through)
+def refresh_totals_on_cart_items_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # a cart only holds its own customer's items
+        refresh_cart_totals(customer_ids=[instance.customer_id])
+    else:
+        refresh_cart_totals([instance.pk])
+
+
+@receiver(post_save, sender=CartItem)
+def refresh_totals_on_cart_item_save(sender, instance, created, **kwargs):
+    if not created:
+        refresh_cart_totals(customer_ids=[instance.customer_id])
+
+
+@receiver(post_delete, sender=CartItem)
+def refresh_totals_on_cart_item_delete(sender, instance, **kwargs):
+    refresh_cart_totals(customer_ids=[instance.customer_id])
@@ -0,0 +1,180 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from .budgets import fingerprint_sql
+from .metrics import get_current_request_metrics
+from .sharedstate import ProcessSnapshots
+
+logger = logging.getLogger('api.slowqueries')
+
+MAX_SQL_LENGTH = 4000
+
+_background_executor = None
+_background_lock = threading.Lock()
+_explaining = threading.local()
+
+
+def find_origin(frame):
+    """Return 'path:line in function' for the first frame in one of the ORIGINS files."""
+    origins = settings.SLOW_QUERY_LOG['ORIGINS']
+    while frame is not None:
+        filename = frame.f_code.co_filename.replace(os.sep, '/')
+        for origin in origins:
+            if filename.endswith(origin):
+                return f'{origin}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def get_background_executor():
+    global _background_executor
+    with _background_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-log')
+        return _background_executor
+
+
+def explain(alias, sql, params):
+    _explaining.active = True
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as exc:
+        return f'EXPLAIN failed: {exc}'
+    finally:
+        connection.close()
+        _explaining.active = False
+
+
+class SlowQueryBuffer:
+    """
+    This process's ring buffer of slow queries and the plans of the
+    statements in it. Only the background thread touches it: it adds each
+    entry, runs the EXPLAIN of a statement it has no plan for, and, once
+    no more entries are queued, publishes the buffer to the SLOW_QUERY_LOG
+    cache for every process to read.
+    """
+
+    def __init__(self):
+        self.entries = None
+        self.plans = {}
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.shared = None
+
+    def submit(self, alias, entry, sql, params, many):
+        with self.lock:
+            self.queued += 1
+        get_background_executor().submit(self.add, alias, entry, sql, params, many)
+
+    def add(self, alias, entry, sql, params, many):
+        config = settings.SLOW_QUERY_LOG
+        try:
+            if self.shared is None or self.shared.cache_alias != config['CACHE']:
+                self.shared = ProcessSnapshots(config['CACHE'], 'slow_queries')
+            if self.entries is None or self.entries.maxlen != config['BUFFER_SIZE'] or self.shared.cleared_since_publish():
+                self.entries = deque(maxlen=config['BUFFER_SIZE'])
+                self.plans = {}
+            fingerprint = entry['fingerprint'] = fingerprint_sql(sql)
+            self.entries.append(entry)
+            is_select = sql.lstrip()[:6].upper() == 'SELECT'
+            if config['EXPLAIN'] and is_select and not many and fingerprint not in self.plans:
+                self.plans[fingerprint] = explain(alias, sql, params)
+        except Exception:
+            logger.exception('Could not record a slow query')
+        with self.lock:
+            self.queued -= 1
+            if self.queued:
+                # publish once for a burst of slow queries
+                return
+        self.publish()
+
+    def publish(self):
+        try:
+            fingerprints = {entry['fingerprint'] for entry in self.entries}
+            self.plans = {fingerprint: plan for fingerprint, plan in self.plans.items() if fingerprint in fingerprints}
+            self.shared.publish({'entries': list(self.entries), 'plans': self.plans})
+        except Exception:
+            logger.exception('Could not publish the slow-query log')
+
+
+buffer = SlowQueryBuffer()
+
+
+class SlowQueryLogger:
+    """
+    connection.execute_wrapper hook installed on every connection. Queries
+    slower than THRESHOLD_MS are recorded with the view and the line in
+    api/views.py or api/mixins.py that ran them. Everything else, the
+    ring buffer of BUFFER_SIZE entries, the EXPLAIN of each new SELECT
+    and the writes to the shared cache, happens on a background thread.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            config = settings.SLOW_QUERY_LOG
+            if duration_ms >= config['THRESHOLD_MS'] and not getattr(_explaining, 'active', False):
+                self.record(sql, params, many, duration_ms)
+
+    def record(self, sql, params, many, duration_ms):
+        try:
+            metrics = get_current_request_metrics()
+            entry = {
+                'time': timezone.now().isoformat(),
+                'duration_ms': round(duration_ms, 2),
+                'view': metrics.view if metrics is not None else None,
+                'origin': find_origin(sys._getframe(2)),
+                'sql': sql[:MAX_SQL_LENGTH],
+            }
+            buffer.submit(self.alias, entry, sql, params, many)
+        except Exception:
+            # the slow-query log must never fail the query it observed
+            logger.exception('Could not record a slow query')
+
+
+def install_slow_query_logger(sender, connection, **kwargs):
+    if not settings.SLOW_QUERY_LOG['ENABLED']:
+        return
+    if not any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryLogger(connection.alias))
+
+
+connection_created.connect(install_slow_query_logger)
+
+
+def get_shared_log():
+    return ProcessSnapshots(settings.SLOW_QUERY_LOG['CACHE'], 'slow_queries')
+
+
+def get_slow_queries(limit=None):
+    """Return the slow queries published by every process, newest first, with their plans."""
+    entries = []
+    for snapshot, _ in get_shared_log().collect():
+        for entry in snapshot['entries']:
+            entries.append(dict(entry, plan=snapshot['plans'].get(entry['fingerprint'])))
+    entries.sort(key=lambda entry: entry['time'], reverse=True)
+    return entries[:limit or settings.SLOW_QUERY_LOG['BUFFER_SIZE']]
+
+
+def clear_slow_queries():
+    get_shared_log().clear()
@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from littlelemon.models import StaleSnapshotDay, Transaction
+
+from .analytics import day_bounds, filter_days
+from .columns import COLUMN_SETS, np, require_numpy
+
+MANIFEST = 'manifest.json'
+
+
+class SnapshotStore:
+    """
+    Append-only columnar copy of order history under a directory: one
+    partition per table and day, holding one .npy file per column, read
+    back memory-mapped. manifest.json lists the partitions and the
+    watermark, the first day not in the snapshot. Every day before the
+    watermark is complete, so readers take those days from the snapshot
+    and the rest from the live tables. Only closed days are exported; a
+    day closes SETTLE_SECONDS after midnight, so that transactions still
+    committing at midnight make it in. There must be a single writer.
+
+    A day whose orders or lines change after it closed is marked stale by
+    api.signals: readers take it from the live tables until refresh()
+    exports it again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def manifest_path(self):
+        return os.path.join(self.path, MANIFEST)
+
+    def partition_path(self, table, day):
+        return os.path.join(self.path, table, day.isoformat())
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path()) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {'watermark': None, 'tables': {table: [] for table in COLUMN_SETS}}
+        manifest['watermark'] = manifest['watermark'] and date.fromisoformat(manifest['watermark'])
+        manifest['tables'] = {
+            table: [date.fromisoformat(day) for day in manifest['tables'].get(table, [])]
+            for table in COLUMN_SETS
+        }
+        return manifest
+
+    def write_manifest(self, manifest):
+        os.makedirs(self.path, exist_ok=True)
+        temporary = self.manifest_path() + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({
+                'watermark': manifest['watermark'] and manifest['watermark'].isoformat(),
+                'tables': {
+                    table: [day.isoformat() for day in days]
+                    for table, days in manifest['tables'].items()
+                },
+            }, file)
+        # readers see either the old or the new manifest, never half of one
+        os.replace(temporary, self.manifest_path())
+
+    def watermark(self):
+        return self.read_manifest()['watermark']
+
+    def write_partition(self, columns, day):
+        path = self.partition_path(columns.table, day)
+        temporary = path + '.tmp'
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        for name, array in zip(columns.fields, columns.arrays()):
+            np.save(os.path.join(temporary, f'{name}.npy'), array)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temporary, path)
+
+    def read_partition(self, column_set, day):
+        path = self.partition_path(column_set.table, day)
+        return column_set([
+            np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in column_set.fields
+        ])
+
+    def closed_until(self):
+        """The first day that is not closed yet."""
+        settled = timezone.localtime() - timedelta(seconds=settings.ORDER_SNAPSHOT['SETTLE_SECONDS'])
+        return settled.date()
+
+    def first_day(self):
+        first = Transaction.objects.aggregate(first=Min('transaction_date'))['first']
+        return first and timezone.localdate(first)
+
+    def export(self, until=None, progress=None):
+        """
+        Append a partition per table for every closed day from the
+        watermark up to, not including, until (default the first day not
+        closed), moving the watermark after each day. Returns the number
+        of days exported.
+        """
+        require_numpy()
+        manifest = self.read_manifest()
+        limit = self.closed_until()
+        until = min(until, limit) if until is not None else limit
+        day = manifest['watermark'] or self.first_day()
+        exported = 0
+        while day is not None and day < until:
+            self.export_day(manifest, day)
+            day += timedelta(days=1)
+            manifest['watermark'] = day
+            self.write_manifest(manifest)
+            exported += 1
+            if progress is not None:
+                progress(day, exported)
+        return exported
+
+    def export_day(self, manifest, day):
+        """Write the day's partition of every table, dropping those left without rows."""
+        for table, column_set in COLUMN_SETS.items():
+            columns = column_set.query(day, day)
+            days = manifest['tables'][table]
+            if len(columns):
+                self.write_partition(columns, day)
+                if day not in days:
+                    days.append(day)
+            elif day in days:
+                days.remove(day)
+                shutil.rmtree(self.partition_path(table, day), ignore_errors=True)
+
+    def refresh(self, progress=None):
+        """
+        Export again every stale day before the watermark and unmark it,
+        unless it changed again meanwhile. Returns the number of days.
+        """
+        require_numpy()
+        manifest = self.read_manifest()
+        if manifest['watermark'] is None:
+            return 0
+        marks = StaleSnapshotDay.objects.filter(day__lt=manifest['watermark']).order_by('day')
+        refreshed = 0
+        for day, marked_at in marks.values_list('day', 'marked_at'):
+            self.export_day(manifest, day)
+            self.write_manifest(manifest)
+            # a change committed after the export moved marked_at on
+            StaleSnapshotDay.objects.filter(day=day, marked_at=marked_at).delete()
+            refreshed += 1
+            if progress is not None:
+                progress(day, refreshed)
+        return refreshed
+
+    def clear(self):
+        """Drop every partition; readers fall back to the live tables."""
+        self.write_manifest({'watermark': None, 'tables': {table: [] for table in COLUMN_SETS}})
+        for table in COLUMN_SETS:
+            shutil.rmtree(os.path.join(self.path, table), ignore_errors=True)
+        StaleSnapshotDay.objects.all().delete()
+
+    def read(self, column_set, start=None, end=None):
+        """
+        Yield the rows of the inclusive date range one part at a time: a
+        memory-mapped snapshot partition for each day before the
+        watermark, the live rows of a stale day, then the live rows from
+        the watermark on. Callers reduce each part on its own, so only
+        the live rows are ever held in memory whole.
+        """
+        require_numpy()
+        manifest = self.read_manifest()
+        watermark = manifest['watermark']
+        if watermark is None:
+            yield column_set.query(start, end)
+            return
+        stale = filter_days(StaleSnapshotDay.objects.filter(day__lt=watermark), start, end)
+        stale = set(stale.values_list('day', flat=True))
+        for day in sorted(stale.union(manifest['tables'][column_set.table])):
+            if (start is None or day >= start) and (end is None or day <= end) and day < watermark:
+                yield column_set.query(day, day) if day in stale else self.read_partition(column_set, day)
+        live_start = watermark if start is None else max(start, watermark)
+        if end is None or live_start <= end:
+            yield column_set.query(live_start, end)
+
+
+def mark_stale(days):
+    """
+    Record that the days' orders or lines changed, so snapshot reads take
+    them from the live tables until they are exported again. Today is never
+    in the snapshot and is not recorded.
+    """
+    today = timezone.localdate()
+    days = {day for day in days if day < today}
+    if not days:
+        return
+    marked_at = timezone.now()
+    StaleSnapshotDay.objects.bulk_create(
+        [StaleSnapshotDay(day=day, marked_at=marked_at) for day in days],
+        update_conflicts=True, unique_fields=['day'], update_fields=['marked_at'],
+    )
+
+
+def mark_transactions_stale(transaction_ids):
+    """mark_stale() the days of the transactions placed before today."""
+    if not transaction_ids:
+        return
+    today, _ = day_bounds(timezone.localdate(), None)
+    dates = Transaction.objects.filter(pk__in=transaction_ids, transaction_date__lt=today)
+    mark_stale({timezone.localdate(value) for value in dates.values_list('transaction_date', flat=True)})
+
+
+def get_snapshot_store():
+    return SnapshotStore(settings.ORDER_SNAPSHOT['PATH'])
+
+
+def iter_columns(column_set, start=None, end=None):
+    """The rows of the inclusive date range as a sequence of column_set parts."""
+    if settings.ORDER_SNAPSHOT['ENABLED']:
+        return get_snapshot_store().read(column_set, start, end)
+    return iter([column_set.query(start, end)])
@@ -0,0 +1,1050 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from benchmarks.seed import seed
+from djoser.conf import default_settings as djoser_default_settings, settings as djoser_settings
+from djoser.serializers import UserCreateSerializer, UserSerializer
+from littlelemon.models import (
+    CartItem,
+    CustomerOrder,
+    DailyCourierDeliveries,
+    DailyItemSales,
+    DailySales,
+    FoodCategory,
+    FoodItem,
+    RoleGroupsVersion,
+    RoleMembership,
+    ShoppingCart,
+    StaleSnapshotDay,
+    Transaction,
+)
+
+from .analytics import rebuild_rollups
+from .backends import FailedLoginCacheBackend
+from .budgets import QueryBudget, QueryBudgetExceeded, QueryRecorder, check_budget
+from .catalog import MenuImporter
+from .columns import LineColumns, np
+from .hashing import get_bulk_hashing_executor, get_hashing_pool
+from .historical import co_purchase_matrix, demand_heatmap
+from .metrics import MetricsRegistry, finish_request, start_request
+from .profiling import StackSampler, sampler
+from .recommendations import RecommendationIndex, recommendation_index
+from .records import iter_records
+from .roles import role_registry
+from .serializers import RegistrationPasswordRetypeSerializer, RegistrationSerializer
+from .snapshots import get_snapshot_store, iter_columns
+from .tokens import RevocationList
+from .transitions import VersionConflict, transition_order
+from .slowqueries import (
+    buffer as slow_query_buffer,
+    clear_slow_queries,
+    get_background_executor,
+    get_shared_log,
+    get_slow_queries,
+)
+from .userimport import UserImporter
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_HASHING_POOL={'ENABLED': False},
+)
+class RegistrationTests(TestCase):
+    def setUp(self):
+        # the role groups are cached by the registry; load them outside the counted requests
+        role_registry.invalidate()
+        role_registry.load()
+
+    def assert_customer(self, username):
+        user = User.objects.get(username=username)
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['Customer'])
+        self.assertEqual(list(RoleMembership.objects.filter(user=user).values_list('role', flat=True)), ['Customer'])
+        return user
+
+    def test_register_with_password(self):
+        # uniqueness check, SAVEPOINT, user, membership, role, RELEASE SAVEPOINT
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/users', {'username': 'ada', 'password': 'c0mpl3x-pass', 'email': 'ada@example.com'})
+        self.assertEqual(response.status_code, 201)
+        user = self.assert_customer('ada')
+        self.assertTrue(user.check_password('c0mpl3x-pass'))
+
+    def test_register_through_djoser(self):
+        # uniqueness validation, SAVEPOINT, user, membership, role, RELEASE SAVEPOINT
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/users/', {'username': 'grace', 'password': 'c0mpl3x-pass'})
+        self.assertEqual(response.status_code, 201)
+        user = self.assert_customer('grace')
+        self.assertTrue(user.check_password('c0mpl3x-pass'))
+
+    def test_register_existing_username(self):
+        User.objects.create_user('ada')
+        response = self.client.post('/api/users', {'username': 'ada', 'password': 'c0mpl3x-pass'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.filter(username='ada').count(), 1)
+
+    # the competing sign-up runs inside the request and would count against its budget
+    @override_settings(QUERY_BUDGETS={'ENABLED': False, 'MODE': 'log'})
+    def test_register_username_taken_concurrently(self):
+        # another request registers the name between the uniqueness check and the INSERT
+        def hash_after_competing_signup(raw_password):
+            User.objects.create_user('ada')
+            return 'unusable'
+
+        with mock.patch('api.views.hash_password', side_effect=hash_after_competing_signup):
+            response = self.client.post('/api/users', {'username': 'ada', 'password': 'c0mpl3x-pass'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'username': 'A user with this username already exists.'})
+        self.assertEqual(User.objects.filter(username='ada').count(), 1)
+        # only the competing sign-up's rows remain
+        self.assertEqual(RoleMembership.objects.filter(user__username='ada').count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RegistrationHashingPoolTests(TestCase):
+    def setUp(self):
+        # the role groups are cached by the registry; load them outside the counted requests
+        role_registry.invalidate()
+        role_registry.load()
+
+    @override_settings(PASSWORD_HASHING_POOL={'ENABLED': True, 'KIND': 'thread', 'WORKERS': 1})
+    def test_password_is_hashed_on_the_pool(self):
+        threads = []
+
+        def make_password(password):
+            threads.append(threading.current_thread().name)
+            return hashers.make_password(password)
+
+        with mock.patch('api.hashing.make_password', make_password):
+            response = self.client.post('/api/users', {'username': 'ada', 'password': 'c0mpl3x-pass'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hashing'))
+        self.assertTrue(User.objects.get(username='ada').check_password('c0mpl3x-pass'))
+
+    @override_settings(PASSWORD_HASHING_POOL={'ENABLED': True, 'WORKERS': 1, 'QUEUE_SIZE': 0, 'TIMEOUT': 0})
+    def test_busy_pool_is_a_503(self):
+        pool = get_hashing_pool()
+        # another sign-up holds the only slot
+        pool.slots.acquire()
+        self.addCleanup(pool.slots.release)
+        response = self.client.post('/api/users', {'username': 'ada', 'password': 'c0mpl3x-pass'})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(User.objects.filter(username='ada').exists())
+
+
+class DjoserSettingsTests(SimpleTestCase):
+    def test_snapshot_is_read_only(self):
+        with self.assertRaises(AttributeError):
+            djoser_settings._wrapped.HIDE_USERS = False
+
+    def test_override_rebuilds_the_tables_and_keeps_the_defaults(self):
+        self.assertIs(djoser_settings.action_serializers['create'], RegistrationSerializer)
+        with override_settings(DJOSER={
+            **settings.DJOSER,
+            'USER_CREATE_PASSWORD_RETYPE': True,
+            'SERIALIZERS': {**settings.DJOSER['SERIALIZERS'], 'current_user': 'djoser.serializers.UserCreateSerializer'},
+        }):
+            self.assertIs(djoser_settings.action_serializers['create'], RegistrationPasswordRetypeSerializer)
+            self.assertIs(djoser_settings.action_serializers['me'], UserCreateSerializer)
+        self.assertIs(djoser_settings.action_serializers['create'], RegistrationSerializer)
+        self.assertIs(djoser_settings.action_serializers['me'], UserSerializer)
+        self.assertEqual(djoser_default_settings['SERIALIZERS']['current_user'], 'djoser.serializers.UserSerializer')
+
+
+class RoleRegistryTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+        self.addCleanup(role_registry.invalidate)
+
+    def rename_in_another_process(self, old, new):
+        # a queryset update sends no signal, as for a change made by another worker
+        Group.objects.filter(name=old).update(name=new)
+        RoleGroupsVersion.objects.update(version=F('version') + 1)
+
+    @override_settings(ROLE_REGISTRY={'SYNC_INTERVAL': 0})
+    def test_reloads_after_a_change_in_another_process(self):
+        customer_id = role_registry.group_id('Customer')
+        self.rename_in_another_process('Customer', 'Former customers')
+        self.assertNotEqual(role_registry.group_id('Customer'), customer_id)
+
+    @override_settings(ROLE_REGISTRY={'SYNC_INTERVAL': 60})
+    def test_checks_the_version_once_per_interval(self):
+        role_registry.load()
+        with self.assertNumQueries(0):
+            role_registry.group_id('Customer')
+
+
+class BulkGroupMembershipTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+        manager = User.objects.create_user('manager')
+        manager.groups.add(Group.objects.get(name='Manager'))
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(manager)}')
+        self.crew = Group.objects.get(name='Delivery Crew')
+        self.member = User.objects.create_user('member')
+        self.member.groups.add(self.crew)
+        self.users = [User.objects.create_user(name) for name in ['ada', 'grace']]
+
+    def roles(self, role):
+        return set(RoleMembership.objects.filter(role=role).values_list('user_id', flat=True))
+
+    def test_add_and_remove(self):
+        ada, grace = self.users
+        missing = grace.pk + 100
+        response = self.client.post(
+            '/api/groups/delivery-crew', {'ids': [ada.pk, self.member.pk, missing, grace.pk]}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], {
+            str(ada.pk): 'added', str(self.member.pk): 'already a member', str(missing): 'not found', str(grace.pk): 'added',
+        })
+        self.assertEqual(set(self.crew.user_set.values_list('pk', flat=True)), {ada.pk, grace.pk, self.member.pk})
+        self.assertEqual(self.roles('Delivery Crew'), {ada.pk, grace.pk, self.member.pk})
+
+        response = self.client.delete(
+            '/api/groups/delivery-crew', {'ids': [ada.pk, self.member.pk, missing]}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], {
+            str(ada.pk): 'removed', str(self.member.pk): 'removed', str(missing): 'not found',
+        })
+        self.assertEqual(set(self.crew.user_set.values_list('pk', flat=True)), {grace.pk})
+        self.assertEqual(self.roles('Delivery Crew'), {grace.pk})
+
+        response = self.client.delete('/api/groups/delivery-crew', {'ids': [ada.pk]}, content_type='application/json')
+        self.assertEqual(response.json()['results'], {str(ada.pk): 'not a member'})
+
+    def test_ids_must_be_a_list_of_integers(self):
+        for ids in ['1,2', [1, 'two'], list(range(1001))]:
+            with self.subTest(ids=ids):
+                response = self.client.post('/api/groups/delivery-crew', {'ids': ids}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.roles('Delivery Crew'), {self.member.pk})
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Requests to the budgeted views. config.test_settings sets
+    QUERY_BUDGETS['MODE'] to 'raise', so a view going over its budget
+    fails the test with the SQL it ran.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=30, categories=3, customers=4, couriers=2, managers=1, orders=40)
+
+    def setUp(self):
+        role_registry.invalidate()
+
+    def client_for(self, user):
+        return Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def fill_cart(self, client, customer, items):
+        for item in items:
+            self.assertEqual(client.post('/api/order-items', {'id': item.pk, 'quantity': 2}, content_type='application/json').status_code, 201)
+            cart_item = CartItem.objects.get(customer=customer, food_item=item)
+            self.assertEqual(client.post('/api/cart', {'id': cart_item.pk}, content_type='application/json').status_code, 200)
+
+    def test_budget_mode_is_raise(self):
+        self.assertEqual(settings.QUERY_BUDGETS['MODE'], 'raise')
+
+    def test_menu_reads(self):
+        client = self.client_for(self.dataset.customers[0])
+        item = self.dataset.items[0]
+        for path in ['/api/menu-items', f'/api/menu-items/{item.pk}', '/api/categories', f'/api/categories/{item.food_category_id}/menu-items']:
+            with self.subTest(path=path):
+                self.assertEqual(client.get(path).status_code, 200)
+
+    def test_customer_reads(self):
+        customer = self.dataset.customers[0]
+        client = self.client_for(customer)
+        self.fill_cart(client, customer, self.dataset.items[:2])
+        for path in ['/api/cart', '/api/order-items', '/api/orders', '/api/purchases', '/api/purchase-items']:
+            with self.subTest(path=path):
+                self.assertEqual(client.get(path).status_code, 200)
+
+    def test_checkout_query_count_does_not_grow_with_the_cart(self):
+        counts = []
+        for customer, size in [(self.dataset.customers[1], 1), (self.dataset.customers[2], 6)]:
+            client = self.client_for(customer)
+            self.fill_cart(client, customer, self.dataset.items[:size])
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(client.post('/api/orders').status_code, 201)
+            counts.append(len(queries))
+            order = CustomerOrder.objects.filter(customer=customer).latest('pk')
+            self.assertEqual(order.transaction.transaction_items.count(), size)
+            self.assertEqual(order.order_total, order.transaction.total)
+            self.assertFalse(CartItem.objects.filter(customer=customer).exists())
+        self.assertEqual(counts[0], counts[1])
+
+    def test_order_updates(self):
+        manager = self.client_for(self.dataset.managers[0])
+        order = CustomerOrder.objects.filter(status=CustomerOrder.Status.DELIVERED).first()
+        courier = self.client_for(order.assigned_delivery_person)
+        other = next(user for user in self.dataset.couriers if user.pk != order.assigned_delivery_person_id)
+        self.assertEqual(manager.patch(f'/api/orders/{order.pk}', {'status': 0}, content_type='application/json').status_code, 200)
+        self.assertEqual(courier.get(f'/api/orders/{order.pk}').status_code, 200)
+        self.assertEqual(courier.patch(f'/api/orders/{order.pk}', {'state': 'delivered'}, content_type='application/json').status_code, 200)
+        self.assertEqual(manager.patch(f'/api/orders/{order.pk}', {'assigned_delivery_person_id': other.pk}, content_type='application/json').status_code, 200)
+        self.assertEqual(manager.get(f'/api/orders/{order.pk}/history').status_code, 200)
+
+    def test_manager_reads(self):
+        client = self.client_for(self.dataset.managers[0])
+        for path in [
+            '/api/groups/delivery-crew', '/api/groups/delivery-crew?sort=load',
+            '/api/groups/customers', '/api/reports/revenue', '/api/reports/top-items',
+            '/api/reports/couriers', '/api/reports/basket-size',
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(client.get(path).status_code, 200)
+
+
+class CourierAssignmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=5, categories=1, customers=2, couriers=2, managers=1, orders=10)
+
+    def setUp(self):
+        role_registry.invalidate()
+        self.manager = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.dataset.managers[0])}')
+        self.order = CustomerOrder.objects.filter(status=CustomerOrder.Status.DELIVERED).first()
+
+    def test_auto_assign_false_keeps_the_courier(self):
+        courier_id = self.order.assigned_delivery_person_id
+        response = self.manager.patch(f'/api/orders/{self.order.pk}', 'auto_assign=false', content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.assigned_delivery_person_id, courier_id)
+
+    def test_auto_assign_must_be_a_boolean(self):
+        response = self.manager.patch(f'/api/orders/{self.order.pk}', {'auto_assign': 'soon'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_version_is_refused_before_writing(self):
+        path = f'/api/orders/{self.order.pk}'
+        stale = self.order.version
+        self.assertEqual(self.manager.patch(path, {'state': 'out-for-delivery'}, content_type='application/json').status_code, 200)
+        history = self.order.status_changes.count()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.manager.patch(path, {'state': 'delivered', 'version': stale}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], stale + 1)
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+        self.assertEqual(self.order.status_changes.count(), history)
+
+    def test_version_is_bumped_and_the_change_recorded(self):
+        path = f'/api/orders/{self.order.pk}'
+        version = self.order.version
+        response = self.manager.patch(path, {'state': 'out-for-delivery', 'version': version}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.version, version + 1)
+        change = self.order.status_changes.latest('version')
+        self.assertEqual(
+            (change.from_status, change.to_status, change.version, change.changed_by),
+            (CustomerOrder.Status.DELIVERED, CustomerOrder.Status.OUT_FOR_DELIVERY, version + 1, self.dataset.managers[0]),
+        )
+        # out-for-delivery cannot go back to placed
+        response = self.manager.patch(path, {'state': 'placed', 'version': version + 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_change_is_a_conflict(self):
+        # two requests that loaded the order at the same version
+        first, second = CustomerOrder.objects.get(pk=self.order.pk), CustomerOrder.objects.get(pk=self.order.pk)
+        other = next(user for user in self.dataset.couriers if user.pk != self.order.assigned_delivery_person_id)
+        transition_order(first, CustomerOrder.Status.OUT_FOR_DELIVERY)
+        with self.assertRaises(VersionConflict) as conflict:
+            transition_order(second, courier_id=other.pk)
+        self.assertEqual(conflict.exception.version, self.order.version + 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, CustomerOrder.Status.OUT_FOR_DELIVERY)
+        self.assertEqual(self.order.assigned_delivery_person_id, first.assigned_delivery_person_id)
+        self.assertEqual(self.order.status_changes.filter(version__gte=first.version).count(), 1)
+
+    def test_deliveries_count_on_the_delivery_day(self):
+        CustomerOrder.objects.filter(pk=self.order.pk).update(order_date=timezone.now() - timedelta(days=3))
+        self.order.refresh_from_db()
+        rebuild_rollups()
+        path = f'/api/orders/{self.order.pk}'
+        self.assertEqual(self.manager.patch(path, {'state': 'out-for-delivery'}, content_type='application/json').status_code, 200)
+        self.assertEqual(self.manager.patch(path, {'state': 'delivered'}, content_type='application/json').status_code, 200)
+        incremental = sorted(DailyCourierDeliveries.objects.exclude(delivered_count=0).values_list('day', 'courier_id', 'delivered_count'))
+        self.assertTrue(DailyCourierDeliveries.objects.filter(
+            day=timezone.localdate(), courier_id=self.order.assigned_delivery_person_id, delivered_count__gt=0,
+        ).exists())
+        rebuild_rollups()
+        self.assertEqual(sorted(DailyCourierDeliveries.objects.exclude(delivered_count=0).values_list('day', 'courier_id', 'delivered_count')), incremental)
+
+
+class ReorderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=6, categories=1, customers=2, couriers=1, managers=1, orders=10)
+
+    def setUp(self):
+        role_registry.invalidate()
+        self.order = CustomerOrder.objects.filter(customer=self.dataset.customers[0]).latest('pk')
+        self.customer = self.order.customer
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.customer)}')
+        self.path = f'/api/orders/{self.order.pk}'
+        self.lines = sorted(self.order.transaction.transaction_items.values_list('food_item_id', 'item_quantity'))
+        # reorders are priced at the current menu price
+        FoodItem.objects.filter(pk=self.lines[0][0]).update(cost=F('cost') + 1)
+        self.prices = dict(FoodItem.objects.values_list('pk', 'cost'))
+
+    def test_into_cart(self):
+        response = self.client.post(self.path, {'into': 'cart'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'items': len(self.lines), 'unavailable': []})
+        cart = ShoppingCart.objects.get(customer=self.customer)
+        items = cart.cart_items.all()
+        self.assertEqual(sorted(items.values_list('food_item_id', 'item_quantity')), self.lines)
+        for item in items:
+            self.assertEqual(item.item_unit_price, self.prices[item.food_item_id])
+        self.assertEqual(cart.total, sum(self.prices[pk] * quantity for pk, quantity in self.lines))
+        self.assertEqual(cart.item_count, sum(quantity for _, quantity in self.lines))
+
+    def fill_cart(self, items):
+        for item_id, quantity in items:
+            self.client.post('/api/order-items', {'id': item_id, 'quantity': quantity}, content_type='application/json')
+            cart_item = CartItem.objects.get(customer=self.customer, food_item_id=item_id)
+            self.client.post('/api/cart', {'id': cart_item.pk}, content_type='application/json')
+
+    def test_into_cart_adds_to_what_is_there(self):
+        ordered = {pk for pk, _ in self.lines}
+        other = next(item.pk for item in self.dataset.items if item.pk not in ordered)
+        self.fill_cart([(self.lines[0][0], 1), (other, 2)])
+        response = self.client.post(self.path, {'into': 'cart'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        expected = Counter(dict(self.lines)) + Counter({self.lines[0][0]: 1, other: 2})
+        cart = ShoppingCart.objects.get(customer=self.customer)
+        self.assertEqual(dict(cart.cart_items.values_list('food_item_id', 'item_quantity')), dict(expected))
+        self.assertEqual(cart.total, sum(self.prices[pk] * quantity for pk, quantity in expected.items()))
+        self.assertEqual(cart.item_count, sum(expected.values()))
+
+        response = self.client.post(self.path, {'into': 'cart', 'replace': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        cart.refresh_from_db()
+        self.assertEqual(sorted(cart.cart_items.values_list('food_item_id', 'item_quantity')), self.lines)
+        self.assertEqual(cart.item_count, sum(quantity for _, quantity in self.lines))
+
+    def test_into_order_leaves_the_cart_alone(self):
+        item = self.dataset.items[0]
+        self.client.post('/api/order-items', {'id': item.pk, 'quantity': 1}, content_type='application/json')
+        cart_items = list(CartItem.objects.filter(customer=self.customer).values_list('pk', flat=True))
+        response = self.client.post(self.path, {'into': 'order'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        order = CustomerOrder.objects.get(pk=response.json()['order'])
+        self.assertNotEqual(order.pk, self.order.pk)
+        self.assertEqual(order.customer, self.customer)
+        self.assertEqual(sorted(order.transaction.transaction_items.values_list('food_item_id', 'item_quantity')), self.lines)
+        total = sum(self.prices[pk] * quantity for pk, quantity in self.lines)
+        self.assertEqual((order.order_total, order.transaction.total), (total, total))
+        self.assertEqual(response.json()['order_total'], str(total))
+        self.assertEqual(list(CartItem.objects.filter(customer=self.customer).values_list('pk', flat=True)), cart_items)
+
+    def test_only_your_own_orders(self):
+        other = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.dataset.customers[1])}')
+        self.assertEqual(other.post(self.path, {'into': 'order'}, content_type='application/json').status_code, 404)
+        self.assertEqual(self.client.post(self.path, {'into': 'basket'}, content_type='application/json').status_code, 400)
+
+
+class StoredTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=5, categories=1, customers=2, couriers=1, managers=1, orders=6)
+
+    def setUp(self):
+        role_registry.invalidate()
+
+    def verify_totals(self, *args):
+        out = io.StringIO()
+        call_command('verify_totals', *args, stdout=out)
+        return out.getvalue()
+
+    def test_item_changes_update_the_stored_totals(self):
+        record = Transaction.objects.filter(transaction_items__isnull=False).first()
+        item = record.transaction_items.first()
+        item.item_quantity += 2
+        item.item_total_price = item.item_unit_price * item.item_quantity
+        item.save()
+        record.refresh_from_db()
+        items = record.transaction_items.all()
+        self.assertEqual(record.total, sum(line.item_total_price for line in items))
+        self.assertEqual(record.item_count, sum(line.item_quantity for line in items))
+        self.assertIn('Transactions: 0 drifted', self.verify_totals())
+
+    def test_cart_item_change_and_total_commit_together(self):
+        customer = self.dataset.customers[0]
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(customer)}')
+        item = self.dataset.items[0]
+        client.post('/api/order-items', {'id': item.pk, 'quantity': 1}, content_type='application/json')
+        cart_item = CartItem.objects.get(customer=customer, food_item=item)
+        client.post('/api/cart', {'id': cart_item.pk}, content_type='application/json')
+        path = f'/api/order-items/{cart_item.pk}'
+
+        self.assertEqual(client.patch(path, {'quantity': 3}, content_type='application/json').status_code, 200)
+        cart = ShoppingCart.objects.get(customer=customer)
+        self.assertEqual((cart.total, cart.item_count), (item.cost * 3, 3))
+
+        with mock.patch('api.signals.refresh_cart_totals', side_effect=RuntimeError('refresh failed')):
+            with self.assertRaises(RuntimeError):
+                client.patch(path, {'quantity': 5}, content_type='application/json')
+        # the item change is rolled back with the failed refresh
+        cart_item.refresh_from_db()
+        self.assertEqual(cart_item.item_quantity, 3)
+
+        self.assertEqual(client.delete(path).status_code, 200)
+        cart.refresh_from_db()
+        self.assertEqual((cart.total, cart.item_count), (0, 0))
+
+    def test_drift_is_detected_and_repaired(self):
+        record = Transaction.objects.filter(transaction_items__isnull=False).first()
+        expected = record.total, record.item_count
+        # QuerySet.update() bypasses the signal handlers
+        Transaction.objects.filter(pk=record.pk).update(total=0, item_count=0)
+        output = self.verify_totals()
+        self.assertIn(f'Transaction #{record.pk}: stored 0.00 / 0 items', output)
+        self.assertIn('Transactions: 1 drifted', output)
+        self.assertIn('Run with --repair', output)
+        record.refresh_from_db()
+        self.assertEqual(record.total, 0)
+
+        self.assertIn('Transactions: repaired 1 of 1 drifted', self.verify_totals('--repair'))
+        record.refresh_from_db()
+        self.assertEqual((record.total, record.item_count), expected)
+        self.assertIn('Transactions: 0 drifted', self.verify_totals())
+
+
+class HistoryExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=5, categories=1, customers=3, couriers=1, managers=1, orders=25)
+
+    def setUp(self):
+        role_registry.invalidate()
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.dataset.managers[0])}')
+
+    def export(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_orders_as_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('/api/orders/export'))))
+        orders = CustomerOrder.objects.order_by('order_date', 'id')
+        self.assertEqual([int(row['id']) for row in rows], list(orders.values_list('pk', flat=True)))
+        first = orders.first()
+        self.assertEqual(
+            (rows[0]['customer'], Decimal(rows[0]['order_total']), rows[0]['is_delivered']),
+            (first.customer.username, first.order_total, str(first.is_delivered)),
+        )
+
+    def test_purchase_items_as_json_lines_in_a_date_range(self):
+        day = timezone.localdate(Transaction.objects.latest('transaction_date').transaction_date)
+        path = f'/api/purchase-items/export?type=jsonl&start={day}&end={day}'
+        rows = [json.loads(line) for line in self.export(path).splitlines()]
+        through = Transaction.transaction_items.through.objects.filter(
+            transaction__transaction_date__date=day,
+        ).order_by('transaction__transaction_date', 'transaction_id', 'transactionitem_id')
+        self.assertEqual(
+            [(row['transaction_id'], row['id']) for row in rows],
+            list(through.values_list('transaction_id', 'transactionitem_id')),
+        )
+        self.assertTrue(rows)
+        for row in rows:
+            self.assertEqual(Decimal(row['item_total_price']), Decimal(row['item_unit_price']) * row['item_quantity'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/purchases/export?type=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/purchases/export?start=yesterday').status_code, 400)
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=5, categories=1, customers=1, couriers=1, managers=1, orders=5)
+
+    def setUp(self):
+        role_registry.invalidate()
+
+    def test_checkout_is_counted_with_the_order(self):
+        customer = self.dataset.customers[0]
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(customer)}')
+        item = self.dataset.items[0]
+        client.post('/api/order-items', {'id': item.pk, 'quantity': 3}, content_type='application/json')
+        client.post('/api/cart', {'id': CartItem.objects.get(customer=customer).pk}, content_type='application/json')
+        today = DailySales.objects.filter(day=timezone.localdate())
+        before = today.values_list('order_count', flat=True).first() or 0
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(client.post('/api/orders').status_code, 201)
+        # written inside the checkout transaction, not left to a callback
+        self.assertEqual(callbacks, [])
+        self.assertEqual(today.get().order_count, before + 1)
+        self.assertGreaterEqual(DailyItemSales.objects.get(day=timezone.localdate(), food_item=item).quantity, 3)
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=10, categories=2, customers=3, couriers=1, managers=1, orders=30)
+
+    def setUp(self):
+        role_registry.invalidate()
+        recommendation_index.reset()
+        self.addCleanup(recommendation_index.reset)
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.dataset.customers[0])}')
+        self.path = f'/api/menu-items/{self.dataset.items[0].pk}/recommendations'
+
+    def test_unavailable_until_built(self):
+        with mock.patch.object(RecommendationIndex, 'refresh_in_background') as refresh:
+            response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 503)
+        refresh.assert_called_once()
+        # the index is built off the request; afterwards requests only read it
+        recommendation_index.build()
+        self.assertEqual(self.client.get(self.path).status_code, 200)
+
+
+    def test_catalog_version_is_checked_at_most_every_check_seconds(self):
+        recommendation_index.build()
+        with mock.patch('api.recommendations.get_catalog_version', return_value=-1) as version:
+            self.assertFalse(recommendation_index.is_stale())
+            self.assertFalse(recommendation_index.is_stale())
+            version.assert_not_called()
+            recommendation_index.checked -= settings.RECOMMENDATIONS['CHECK_SECONDS']
+            self.assertTrue(recommendation_index.is_stale())
+            version.assert_called_once()
+
+class SnapshotReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed(items=8, categories=2, customers=3, couriers=1, managers=1, orders=40)
+
+    def setUp(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        settings_override = override_settings(ORDER_SNAPSHOT={**settings.ORDER_SNAPSHOT, 'ENABLED': True, 'PATH': path})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_reports_from_partitions_match_live_tables(self):
+        live = [LineColumns.query()]
+        expected = demand_heatmap(live), co_purchase_matrix(live, limit=5)
+        self.assertGreater(get_snapshot_store().export(), 1)
+        parts = list(iter_columns(LineColumns))
+        self.assertGreater(len(parts), 2)
+        self.assertEqual((demand_heatmap(parts), co_purchase_matrix(parts, limit=5)), expected)
+
+    def test_co_purchases_of_large_item_ids(self):
+        big = 2 ** 40
+        columns = LineColumns([
+            np.array(values, dtype=dtype)
+            for values, dtype in zip(
+                [[1, 1, 2, 2, 2], [0] * 5, [12] * 5, [big, 7, big, 7, big + 1], [1] * 5, [100] * 5],
+                LineColumns.dtypes,
+            )
+        ])
+        report = co_purchase_matrix([columns], limit=2)
+        self.assertEqual([item['food_item_id'] for item in report['items']], [7, big])
+        self.assertEqual(report['matrix'], [[0, 2], [2, 0]])
+
+    def test_changed_day_is_read_live_until_exported_again(self):
+        store = get_snapshot_store()
+        store.export()
+        watermark = store.watermark()
+        order = CustomerOrder.objects.filter(order_date__lt=timezone.now() - timedelta(days=2)).earliest('order_date')
+        day = timezone.localdate(order.transaction.transaction_date)
+        line = order.transaction.transaction_items.first()
+        line.item_quantity += 5
+        line.save()
+        self.assertTrue(StaleSnapshotDay.objects.filter(day=day).exists())
+        live = LineColumns.query(day, day)
+        parts = list(iter_columns(LineColumns, day, day))
+        self.assertEqual(parts[0].quantity.sum(), live.quantity.sum())
+
+        out = io.StringIO()
+        call_command('snapshot_orders', stdout=out)
+        self.assertIn('1 changed days again', out.getvalue())
+        self.assertFalse(StaleSnapshotDay.objects.exists())
+        self.assertEqual(store.read_partition(LineColumns, day).quantity.sum(), live.quantity.sum())
+        self.assertEqual(store.watermark(), watermark)
+        self.assertIn(day, store.read_manifest()['tables']['orders'])
+
+        out = io.StringIO()
+        call_command('snapshot_orders', since=str(watermark - timedelta(days=3)), stdout=out)
+        self.assertIn('Exported 0 days, 3 changed days again', out.getvalue())
+
+
+class UserImportTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+
+    def records(self, data):
+        return iter_records(io.BytesIO(json.dumps(data).encode()), 'json')
+
+    def test_json_array(self):
+        result = UserImporter(batch_size=2).run(self.records([{'username': 'ada'}, {'username': 'grace'}, {'username': 'alan'}]))
+        self.assertEqual(result.as_dict(), {'processed': 3, 'created': 3, 'skipped': 0, 'errors': []})
+        self.assertEqual(RoleMembership.objects.filter(user__username='alan').count(), 1)
+
+    def test_username_taken_during_the_batch(self):
+        hash_passwords = UserImporter.hash_passwords
+
+        def hash_after_competing_signup(importer, rows, executor):
+            User.objects.create_user('ada')
+            hash_passwords(importer, rows, executor)
+
+        with mock.patch.object(UserImporter, 'hash_passwords', hash_after_competing_signup):
+            result = UserImporter().run(self.records([{'username': 'ada'}, {'username': 'grace'}]))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [{'line': 1, 'error': 'username already exists'}])
+        self.assertTrue(User.objects.filter(username='grace').exists())
+
+    def test_bulk_executor_per_kind_and_workers(self):
+        executor = get_bulk_hashing_executor(2)
+        self.assertIsInstance(executor, ThreadPoolExecutor)
+        self.assertIs(get_bulk_hashing_executor(2), executor)
+        self.assertEqual(get_bulk_hashing_executor(3)._max_workers, 3)
+        self.assertIsNot(get_bulk_hashing_executor(2, 'process'), executor)
+
+    @override_settings(USER_IMPORT=dict(settings.USER_IMPORT, MAX_UPLOAD_ROWS=2))
+    def test_upload_over_the_row_limit_is_refused(self):
+        admin = User.objects.create_user('root')
+        admin.groups.add(Group.objects.get(name='SysAdmin'))
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+        upload = SimpleUploadedFile('users.jsonl', b'{"username": "ada"}\n{"username": "grace"}\n{"username": "alan"}\n')
+        self.assertEqual(client.post('/api/users/import', {'file': upload}).status_code, 413)
+        # nothing is imported, not even the rows under the limit
+        self.assertFalse(User.objects.filter(username='ada').exists())
+        upload = SimpleUploadedFile('users.jsonl', b'{"username": "ada"}\n{"username": "grace"}\n')
+        self.assertEqual(client.post('/api/users/import', {'file': upload}).json()['created'], 2)
+
+    @override_settings(USER_IMPORT=dict(settings.USER_IMPORT, MAX_UPLOAD_SIZE=10))
+    def test_large_upload_is_refused(self):
+        admin = User.objects.create_user('root')
+        admin.groups.add(Group.objects.get(name='SysAdmin'))
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+        upload = SimpleUploadedFile('users.jsonl', b'{"username": "ada"}\n')
+        self.assertEqual(client.post('/api/users/import', {'file': upload}).status_code, 413)
+        self.assertFalse(User.objects.filter(username='ada').exists())
+
+
+class MenuImportTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+        manager = User.objects.create_user('manager')
+        manager.groups.add(Group.objects.get(name='Manager'))
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(manager)}')
+
+    def upload(self, content):
+        upload = SimpleUploadedFile('menu.jsonl', content.encode())
+        return self.client.post('/api/menu-items/import', {'file': upload})
+
+    def test_upserts_items_and_creates_categories(self):
+        FoodCategory.objects.create(name='Mains', category_slug='mains')
+        response = self.upload(
+            '{"name": "Greek Salad", "cost": "12.50", "category": "starters"}\n'
+            '{"name": "Moussaka", "cost": 18, "category": "mains"}\n'
+            '{"name": "Greek Salad", "cost": 11, "category": "starters", "is_featured": true}\n'
+            '{"name": "", "cost": 1, "category": "mains"}\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('processed', 'upserted', 'categories_created', 'skipped')},
+            {'processed': 4, 'upserted': 2, 'categories_created': 1, 'skipped': 1},
+        )
+        salad = FoodItem.objects.get(name='Greek Salad')
+        self.assertEqual((salad.cost, salad.is_featured, salad.food_category.name), (Decimal('11.00'), True, 'Starters'))
+
+        self.assertEqual(self.upload('{"name": "Moussaka", "cost": 19, "category": "mains"}\n').data['upserted'], 1)
+        self.assertEqual(FoodItem.objects.get(name='Moussaka').cost, Decimal('19.00'))
+
+    def test_category_created_by_another_import_is_not_counted(self):
+        importer = MenuImporter()
+        importer.category_ids = {}
+        FoodCategory.objects.create(name='Desserts', category_slug='desserts')
+        importer.import_batch([(1, {'name': 'Baklava', 'cost': 6, 'category': 'desserts'})])
+        self.assertEqual(importer.result.categories_created, 0)
+        self.assertEqual(FoodCategory.objects.filter(category_slug='desserts').count(), 1)
+
+    @override_settings(MENU_IMPORT=dict(settings.MENU_IMPORT, MAX_UPLOAD_SIZE=10))
+    def test_large_upload_is_refused(self):
+        response = self.upload('{"name": "Moussaka", "cost": 18, "category": "mains"}\n')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(FoodItem.objects.exists())
+
+
+class ProfilingTests(TestCase):
+    """The rates and samples are shared between workers, simulated here by a second sampler and pid."""
+
+    def setUp(self):
+        role_registry.invalidate()
+        caches['profiling'].clear()
+        sampler.reset()
+        self.addCleanup(sampler.reset)
+        self.addCleanup(caches['profiling'].clear)
+        admin = User.objects.create_user('root')
+        admin.groups.add(Group.objects.get(name='SysAdmin'))
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}')
+
+    def test_set_rate_reaches_other_workers(self):
+        response = self.client.post('/api/profiling', {'route': 'FoodItemListView.GET', 'rate': 0.5}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StackSampler().get_rates(), {'FoodItemListView.GET': 0.5})
+        routes = self.client.get('/api/profiling').json()
+        self.assertEqual([(route['route'], route['rate']) for route in routes], [('FoodItemListView.GET', 0.5)])
+
+    def test_sampled_requests_are_counted(self):
+        self.client.post('/api/profiling', {'route': 'FoodItemListView.GET', 'rate': 1}, content_type='application/json')
+        self.assertEqual(self.client.get('/api/menu-items').status_code, 200)
+        routes = self.client.get('/api/profiling').json()
+        self.assertEqual([(route['route'], route['requests']) for route in routes], [('FoodItemListView.GET', 1)])
+
+    def test_download_merges_every_worker(self):
+        other = StackSampler()
+        with other.lock:
+            other.stacks['FoodItemListView.GET'] = Counter({'a;b': 2})
+            other.requests['FoodItemListView.GET'] = 1
+            other.dirty = True
+        with mock.patch('api.sharedstate.os.getpid', return_value=-1):
+            other.publish()
+        with sampler.lock:
+            sampler.stacks['FoodItemListView.GET'] = Counter({'a;b': 1, 'a;c': 1})
+            sampler.dirty = True
+        response = self.client.get('/api/profiling/FoodItemListView.GET')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), 'a;b 3\na;c 1\n')
+        self.assertEqual(self.client.get('/api/profiling/CartItemListView.GET').status_code, 404)
+
+    def test_clear_drops_every_worker(self):
+        other = StackSampler()
+        with other.lock:
+            other.stacks['FoodItemListView.GET'] = Counter({'a;b': 2})
+            other.dirty = True
+        with mock.patch('api.sharedstate.os.getpid', return_value=-1):
+            other.publish()
+        self.assertEqual(self.client.delete('/api/profiling/FoodItemListView.GET').status_code, 204)
+        self.assertEqual(self.client.get('/api/profiling/FoodItemListView.GET').status_code, 404)
+        # the other worker drops the route from its own samples before publishing again
+        with mock.patch('api.sharedstate.os.getpid', return_value=-1):
+            other.publish()
+        self.assertNotIn('FoodItemListView.GET', other.stacks)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        caches['slow_queries'].clear()
+        self.addCleanup(caches['slow_queries'].clear)
+
+    def wait_for_background_thread(self):
+        get_background_executor().submit(lambda: None).result()
+
+    def test_slow_query_is_logged_with_its_plan(self):
+        with override_settings(SLOW_QUERY_LOG=dict(settings.SLOW_QUERY_LOG, THRESHOLD_MS=0)):
+            list(User.objects.filter(username='ada'))
+        self.wait_for_background_thread()
+        entries = get_slow_queries()
+        self.assertTrue(entries)
+        self.assertIn('auth_user', entries[0]['sql'])
+        self.assertTrue(entries[0]['plan'])
+
+    def test_entries_of_every_process_are_merged_and_cleared(self):
+        with mock.patch('api.sharedstate.os.getpid', return_value=-1):
+            get_shared_log().publish({
+                'entries': [{'time': '2000-01-01T00:00:00+00:00', 'sql': 'SELECT 1', 'fingerprint': 'SELECT ?'}],
+                'plans': {'SELECT ?': 'SCAN'},
+            })
+        with override_settings(SLOW_QUERY_LOG=dict(settings.SLOW_QUERY_LOG, THRESHOLD_MS=0, EXPLAIN=False)):
+            list(User.objects.filter(username='ada'))
+        self.wait_for_background_thread()
+        entries = get_slow_queries()
+        self.assertEqual(entries[-1]['plan'], 'SCAN')
+        self.assertGreater(len(entries), 1)
+        clear_slow_queries()
+        self.assertEqual(get_slow_queries(), [])
+        # this process drops its own buffer before publishing again
+        with override_settings(SLOW_QUERY_LOG=dict(settings.SLOW_QUERY_LOG, THRESHOLD_MS=0, EXPLAIN=False)):
+            list(User.objects.filter(username='grace'))
+        self.wait_for_background_thread()
+        self.assertEqual(len(slow_query_buffer.entries), 1)
+        self.assertEqual([entry['sql'] for entry in get_slow_queries()], [slow_query_buffer.entries[0]['sql']])
+
+
+class RevocationListTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+        self.revocations = RevocationList()
+        user = User.objects.create_user('ada')
+        self.token = RefreshToken.for_user(user)
+        self.token.blacklist()
+        self.jti = self.token['jti']
+
+    def test_reads_the_database_until_loaded(self):
+        # another thread is loading the set
+        self.revocations.refreshing = True
+        with self.assertNumQueries(1):
+            self.assertTrue(self.revocations.is_revoked(self.jti))
+        self.assertEqual(self.revocations.jtis, set())
+
+    def test_token_blacklisted_during_a_reload_is_kept(self):
+        now = aware_utcnow()
+
+        def blacklist_meanwhile():
+            self.revocations.add('blacklisted-meanwhile')
+            return now
+
+        with mock.patch('api.tokens.aware_utcnow', blacklist_meanwhile):
+            self.assertTrue(self.revocations.is_revoked(self.jti))
+        self.assertEqual(self.revocations.jtis, {self.jti, 'blacklisted-meanwhile'})
+        self.assertFalse(self.revocations.refreshing)
+
+
+    def test_lower_id_committed_after_a_higher_one_is_synced(self):
+        self.assertTrue(self.revocations.is_revoked(self.jti))
+        user = User.objects.get(username='ada')
+        later, earlier = RefreshToken.for_user(user), RefreshToken.for_user(user)
+        first_id = BlacklistedToken.objects.get().pk
+
+        def commit(token, pk):
+            BlacklistedToken.objects.create(pk=pk, token=OutstandingToken.objects.get(jti=token['jti']))
+            self.revocations.synced_at -= settings.TOKEN_REVOCATION_LIST['SYNC_INTERVAL']
+
+        commit(later, first_id + 10)
+        self.assertTrue(self.revocations.is_revoked(later['jti']))
+        # its id was taken before the other's, but it commits after the sync that saw the other
+        commit(earlier, first_id + 5)
+        self.assertTrue(self.revocations.is_revoked(earlier['jti']))
+        self.assertEqual(self.revocations.last_id, first_id + 10)
+
+class CheckBudgetTests(SimpleTestCase):
+    def recorder(self, count):
+        recorder = QueryRecorder()
+        recorder.count = count
+        recorder.statements = ['SELECT 1'] * count
+        return recorder
+
+    def test_raises_on_query_count(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            check_budget('View', 'GET', '/', QueryBudget(2), self.recorder(3), 1.0)
+
+    def test_only_logs_wall_time(self):
+        with self.assertLogs('api.budgets', level='WARNING'):
+            check_budget('View', 'GET', '/', QueryBudget(2, time_ms=1), self.recorder(2), 50.0)
+
+
+class CacheMetricsTests(SimpleTestCase):
+    def test_lookups_are_counted_for_the_request(self):
+        cache = caches['default']
+        cache.set('cache_metrics_hit', 0)
+        metrics, token = start_request()
+        try:
+            self.assertEqual(cache.get('cache_metrics_hit', 1), 0)
+            self.assertEqual(cache.get('cache_metrics_miss', 1), 1)
+            self.assertEqual(cache.get_many(['cache_metrics_hit', 'cache_metrics_miss']), {'cache_metrics_hit': 0})
+        finally:
+            finish_request(token)
+            cache.delete('cache_metrics_hit')
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 2))
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def setUp(self):
+        caches['metrics'].clear()
+        self.addCleanup(caches['metrics'].clear)
+
+    def record(self, registry, status_code):
+        registry.record_request(
+            view='MenuItemsView', method='GET', status_code=status_code, duration=0.02, db_time=0.01,
+            queries=3, serialization_time=0.001, response_size=512, cache_hits=1, cache_misses=0,
+        )
+
+    def test_render_sums_the_series_of_every_process(self):
+        other, this = MetricsRegistry(), MetricsRegistry()
+        with mock.patch('api.sharedstate.os.getpid', return_value=-1):
+            self.record(other, 200)
+        self.record(this, 200)
+        self.record(this, 404)
+        rendered = this.render()
+        self.assertIn('littlelemon_request_queries_count{view="MenuItemsView",method="GET"} 3', rendered)
+        self.assertIn('littlelemon_responses_total{view="MenuItemsView",method="GET",status="200"} 2', rendered)
+        self.assertIn('littlelemon_cache_requests_total{view="MenuItemsView",method="GET",result="hit"} 3', rendered)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class FailedLoginCacheBackendTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+        caches['throttle'].clear()
+        self.user = User.objects.create_user('ada', password='c0mpl3x-pass')
+        self.backend = FailedLoginCacheBackend()
+
+    def test_wrong_password_is_cached(self):
+        self.assertIsNone(self.backend.authenticate(None, username='ada', password='wrong'))
+        with mock.patch.object(User, 'check_password') as check_password:
+            self.assertIsNone(self.backend.authenticate(None, username='ada', password='wrong'))
+        check_password.assert_not_called()
+
+    def test_inactive_user_can_log_in_once_reactivated(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.authenticate(None, username='ada', password='c0mpl3x-pass'))
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.backend.authenticate(None, username='ada', password='c0mpl3x-pass'), self.user)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        role_registry.invalidate()
+        caches['throttle'].clear()
+        self.addCleanup(caches['throttle'].clear)
+
+    def login(self, username, forwarded_for):
+        return self.client.post(
+            '/api/token/login/', {'username': username, 'password': 'wrong'},
+            HTTP_X_FORWARDED_FOR=forwarded_for,
+        )
+
+    def test_rotating_forwarded_for_does_not_reset_the_username_throttle(self):
+        statuses = [self.login('ada', f'10.0.0.{attempt}').status_code for attempt in range(6)]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_rotating_forwarded_for_does_not_reset_the_ip_throttle(self):
+        statuses = [self.login(f'user{attempt}', f'10.0.{attempt // 250}.{attempt % 250}').status_code for attempt in range(61)]
+        self.assertNotIn(429, statuses[:60])
+        self.assertEqual(statuses[-1], 429)
+
+    def test_refresh_has_its_own_window(self):
+        for attempt in range(60):
+            self.login(f'user{attempt}', '10.0.0.1')
+        refresh = str(RefreshToken.for_user(User.objects.create_user('ada')))
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,48 @@
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window throttle for the token endpoints, kept in the local
+    'throttle' cache so rejected requests never reach the database.
+    """
+    cache = caches['throttle']
+
+    def get_login_name(self, request):
+        try:
+            username = request.data.get('username')
+        except AttributeError:
+            return None
+        return str(username).lower() if username else None
+
+
+class LoginIPRateThrottle(LoginRateThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginUsernameRateThrottle(LoginRateThrottle):
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = self.get_login_name(request)
+        if username is None:
+            return None
+        ident = f'{username}:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class TokenIPRateThrottle(LoginIPRateThrottle):
+    """
+    Per-address throttle for refreshing and blacklisting tokens, which
+    carry a signed token rather than a password, so they get their own
+    window instead of spending the address's login attempts.
+    """
+    scope = 'token_ip'
+
+
+LOGIN_THROTTLE_CLASSES = [LoginIPRateThrottle, LoginUsernameRateThrottle]
+TOKEN_THROTTLE_CLASSES = [TokenIPRateThrottle]
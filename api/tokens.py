@@ -0,0 +1,154 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class RevocationList:
+    """
+    In-process set of blacklisted refresh token jtis.
+
+    New blacklist rows are pulled incrementally at most once every
+    SYNC_INTERVAL seconds: rows above the highest id seen, plus every row
+    blacklisted in the SYNC_OVERLAP seconds before the previous pull, as
+    ids can commit out of order and a lower one would otherwise be missed
+    until the next reload. The whole set is rebuilt from unexpired
+    rows every RELOAD_INTERVAL seconds so pruned tokens drop out. One thread
+    at a time reads the rows, without holding the lock, and the result is
+    swapped in; other threads keep checking the current set meanwhile, or
+    the database before the first load. Tokens blacklisted by this process
+    are added immediately. With SYNC_INTERVAL set to 0 every check falls
+    back to the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.jtis = set()
+        # jtis added during a reload, which its rows may not include
+        self.added = set()
+        self.last_id = 0
+        # wall-clock time the last pull started, for the overlap
+        self.queried_at = None
+        self.synced_at = None
+        self.reloaded_at = None
+        self.refreshing = False
+
+    @property
+    def sync_interval(self):
+        return settings.TOKEN_REVOCATION_LIST['SYNC_INTERVAL']
+
+    @property
+    def reload_interval(self):
+        return settings.TOKEN_REVOCATION_LIST['RELOAD_INTERVAL']
+
+    def reload(self, now):
+        with self.lock:
+            self.added = set()
+        queried_at = aware_utcnow()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=queried_at)
+        jtis = set()
+        last_id = 0
+        for pk, jti in rows.values_list('id', 'token__jti').iterator(chunk_size=10000):
+            jtis.add(jti)
+            last_id = max(last_id, pk)
+        with self.lock:
+            self.jtis = jtis | self.added
+            self.last_id = last_id
+            self.queried_at = queried_at
+            self.synced_at = self.reloaded_at = now
+
+    def sync(self, now):
+        queried_at = aware_utcnow()
+        overlap = timedelta(seconds=settings.TOKEN_REVOCATION_LIST['SYNC_OVERLAP'])
+        rows = BlacklistedToken.objects.filter(
+            Q(id__gt=self.last_id) | Q(blacklisted_at__gte=self.queried_at - overlap)
+        )
+        rows = list(rows.values_list('id', 'token__jti'))
+        with self.lock:
+            # rows of the overlap already in the set are deduplicated by it
+            self.jtis.update(jti for pk, jti in rows)
+            self.last_id = max([self.last_id, *(pk for pk, jti in rows)])
+            self.queried_at = queried_at
+            self.synced_at = now
+
+    def refresh(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.refreshing:
+                return
+            if self.reloaded_at is None or now - self.reloaded_at >= self.reload_interval:
+                update = self.reload
+            elif now - self.synced_at >= self.sync_interval:
+                update = self.sync
+            else:
+                return
+            self.refreshing = True
+        try:
+            update(now)
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def is_revoked(self, jti):
+        if self.sync_interval:
+            self.refresh()
+            if self.reloaded_at is not None:
+                return jti in self.jtis
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def add(self, jti):
+        with self.lock:
+            self.jtis.add(jti)
+            self.added.add(jti)
+
+
+revocation_list = RevocationList()
+
+
+class RevocationListRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if revocation_list.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        revocation_list.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+class RevocationListTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocationListRefreshToken
+
+
+class RevocationListTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = RevocationListRefreshToken
+
+
+def prune_expired_tokens(batch_size=5000):
+    """
+    Delete expired outstanding tokens (and, by cascade, their blacklist
+    rows) in primary-key batches so no single statement locks the tables
+    for long. Returns the number of outstanding tokens removed.
+    """
+    cutoff = aware_utcnow()
+    expired = OutstandingToken.objects.filter(expires_at__lte=cutoff).order_by('id')
+    removed = 0
+    while True:
+        batch = list(expired.values_list('id', flat=True)[:batch_size])
+        if not batch:
+            return removed
+        BlacklistedToken.objects.filter(token_id__in=batch).delete()
+        OutstandingToken.objects.filter(id__in=batch).delete()
+        removed += len(batch)
@@ -0,0 +1,113 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from littlelemon.models import ShoppingCart, Transaction
+
+BATCH_SIZE = 2000
+
+_deferred = threading.local()
+
+# model -> (m2m field holding its items, the through table's FK to the model)
+ITEM_RELATIONS = {
+    Transaction: ('transaction_items', 'transaction_id'),
+    ShoppingCart: ('cart_items', 'shoppingcart_id'),
+}
+
+
+def computed_totals(model):
+    """Subqueries summing the items of each row: (total, item_count)."""
+    field_name, owner = ITEM_RELATIONS[model]
+    item = getattr(model, field_name).field.m2m_reverse_field_name()
+    lines = getattr(model, field_name).through.objects.filter(**{owner: OuterRef('pk')}).order_by().values(owner)
+    total = Subquery(lines.annotate(total=Sum(f'{item}__item_total_price')).values('total'))
+    count = Subquery(lines.annotate(count=Sum(f'{item}__item_quantity')).values('count'))
+    return (
+        Coalesce(total, Value(0), output_field=DecimalField(max_digits=10, decimal_places=2)),
+        Coalesce(count, Value(0), output_field=IntegerField()),
+    )
+
+
+def refresh_totals(queryset):
+    """Recompute the stored total and item_count of every row of the queryset in one UPDATE."""
+    total, item_count = computed_totals(queryset.model)
+    return queryset.update(total=total, item_count=item_count)
+
+
+@contextmanager
+def deferred_totals():
+    """
+    Collect the refreshes asked for inside the block, e.g. by the signal
+    handlers while a queryset of cart items is deleted, and run them as
+    one UPDATE per kind when the block exits without an error.
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    pending = _deferred.pending = {'transactions': set(), 'carts': set(), 'customers': set()}
+    try:
+        yield
+    finally:
+        _deferred.pending = None
+    refresh_transaction_totals(pending['transactions'])
+    refresh_cart_totals(pending['carts'], pending['customers'])
+
+
+def refresh_transaction_totals(transaction_ids):
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending['transactions'].update(transaction_ids)
+    elif transaction_ids:
+        refresh_totals(Transaction.objects.filter(pk__in=list(transaction_ids)))
+
+
+def refresh_cart_totals(cart_ids=None, customer_ids=None):
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending['carts'].update(cart_ids or [])
+        pending['customers'].update(customer_ids or [])
+        return
+    if cart_ids:
+        refresh_totals(ShoppingCart.objects.filter(pk__in=list(cart_ids)))
+    if customer_ids:
+        refresh_totals(ShoppingCart.objects.filter(customer_id__in=list(customer_ids)))
+
+
+def lock_cart(customer_id):
+    """
+    Lock the customer's cart row until the transaction ends. Taken before
+    changing their cart items, so that the change and the refresh of the
+    stored totals it triggers run one cart change at a time. Returns the
+    cart, or None when the customer has none.
+    """
+    return ShoppingCart.objects.select_for_update().filter(customer_id=customer_id).first()
+
+
+def find_drift(model):
+    """
+    Yield (pk, stored total, stored item_count, actual total, actual
+    item_count) for every row whose stored totals disagree with its items.
+    Compared in Python, as Decimals, so that float sums on SQLite do not
+    count as drift.
+    """
+    total, item_count = computed_totals(model)
+    rows = (
+        model.objects.order_by('pk')
+        .annotate(actual_total=total, actual_item_count=item_count)
+        .values_list('pk', 'total', 'item_count', 'actual_total', 'actual_item_count')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    for row in rows:
+        if row[1] != row[3] or row[2] != row[4]:
+            yield row
+
+
+def repair_drift(model, pks):
+    """Recompute the totals of the given rows, BATCH_SIZE at a time. Returns how many were updated."""
+    pks = list(pks)
+    repaired = 0
+    for start in range(0, len(pks), BATCH_SIZE):
+        repaired += refresh_totals(model.objects.filter(pk__in=pks[start:start + BATCH_SIZE]))
+    return repaired
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils.text import slugify
+
+from littlelemon.models import CustomerOrder, OrderStatusChange
+
+from .analytics import record_delivery_change
+from .workload import record_load_change
+
+Status = CustomerOrder.Status
+
+# status <-> the name the API uses for it, e.g. 'out-for-delivery'
+STATE_NAMES = {choice: slugify(choice.label) for choice in Status}
+STATES = {name: choice for choice, name in STATE_NAMES.items()}
+
+# status -> the statuses an order may move to from it
+TRANSITIONS = {
+    Status.PLACED: {Status.PREPARING, Status.OUT_FOR_DELIVERY, Status.DELIVERED},
+    Status.PREPARING: {Status.OUT_FOR_DELIVERY, Status.DELIVERED},
+    Status.OUT_FOR_DELIVERY: {Status.DELIVERED},
+    # a delivery marked by mistake can be taken back
+    Status.DELIVERED: {Status.OUT_FOR_DELIVERY},
+}
+
+# the statuses a courier may set on the orders assigned to them
+COURIER_STATUSES = {Status.OUT_FOR_DELIVERY, Status.DELIVERED}
+
+
+class TransitionError(Exception):
+    pass
+
+
+class InvalidTransition(TransitionError):
+    pass
+
+
+class VersionConflict(TransitionError):
+    def __init__(self, version):
+        super().__init__('the order was changed by someone else')
+        self.version = version
+
+
+def transition_order(order, status=None, courier_id=None, expected_version=None, changed_by=None):
+    """
+    Move an order to status and/or hand it to courier_id with a single
+    UPDATE ... WHERE version = expected_version (default the version the
+    order was loaded with) that also bumps the version, so that of two
+    concurrent changes the second fails with VersionConflict instead of
+    overwriting the first. Appends the change to the order's history,
+    moves it in the delivery rollups and courier counters and returns the
+    updated order.
+    """
+    version = order.version if expected_version is None else expected_version
+    # the order was loaded after the change the caller based theirs on
+    if version != order.version:
+        raise VersionConflict(order.version)
+    new_status = order.status if status is None else status
+    new_courier_id = order.assigned_delivery_person_id if courier_id is None else courier_id
+    if new_status != order.status and new_status not in TRANSITIONS[order.status]:
+        raise InvalidTransition(
+            f'an order that is {STATE_NAMES[order.status]} cannot become {STATE_NAMES[new_status]}'
+        )
+    if new_status == order.status and new_courier_id == order.assigned_delivery_person_id:
+        return order
+
+    fields = {
+        'status': new_status,
+        'is_delivered': new_status == Status.DELIVERED,
+        'assigned_delivery_person_id': new_courier_id,
+    }
+    with transaction.atomic():
+        updated = CustomerOrder.objects.filter(pk=order.pk, version=version).update(
+            version=F('version') + 1, **fields,
+        )
+        if not updated:
+            current = CustomerOrder.objects.filter(pk=order.pk).values_list('version', flat=True).first()
+            raise VersionConflict(current)
+        previous_status = order.status
+        was_delivered, previous_courier_id = order.is_delivered, order.assigned_delivery_person_id
+        for name, value in fields.items():
+            setattr(order, name, value)
+        order.version = version + 1
+        OrderStatusChange.objects.create(
+            order=order,
+            from_status=previous_status,
+            to_status=new_status,
+            courier_id=new_courier_id,
+            changed_by=changed_by,
+            version=order.version,
+        )
+        record_delivery_change(order, was_delivered, previous_courier_id)
+        record_load_change(order, previous_status, previous_courier_id)
+    return order
@@ -1,19 +1,26 @@
 from django.urls import path
 
 from .views import (
-    AccountDetailView, AccountListView,
+    AccountDetailView, AccountListView, UserImportView,
     UserGroupListView, UserGroupDetailView,
     SystemAdminListView, SystemAdminDetailView,
     ManagerListView, ManagerDetailView,
     DeliveryStaffListView, DeliveryStaffDetailView,
     CustomerListView, CustomerDetailView,
     FoodItemListView, FoodItemDetailView,
+    FoodItemRecommendationsView,
+    MenuImportView, MenuExportView, CategoryExportView,
     FoodCategoryListView, FoodCategoryDetailView, CategoryFoodItemsView,
     CartItemListView, CartItemDetailView,
     ShoppingCartView,
-    CustomerOrderListView, CustomerOrderDetailView,
+    CustomerOrderListView, CustomerOrderDetailView, OrderHistoryView,
     TransactionListView, TransactionDetailView,
     TransactionItemListView, TransactionItemDetailView,
+    MetricsView,
+    ProfilingView, ProfileDetailView,
+    OrderExportView, TransactionExportView, TransactionItemExportView,
+    RevenueReportView, TopItemsReportView, CourierReportView, BasketSizeReportView,
+    DemandHeatmapView, CoPurchaseReportView,
 )
 
 LIST = {'get': 'list', 'post': 'create'}
@@ -22,6 +29,7 @@ DETAIL = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete
 
 urlpatterns = [
     path('users', AccountListView.as_view()),
+    path('users/import', UserImportView.as_view()),
     path('users/<int:pk>', AccountDetailView.as_view(), name='account-detail'),
 
     path('groups', UserGroupListView.as_view()),
@@ -37,6 +45,10 @@ urlpatterns = [
 
     path('menu-items', FoodItemListView.as_view(LIST)),
     path('menu-items/<int:pk>', FoodItemDetailView.as_view(DETAIL), name='fooditem-detail'),
+    path('menu-items/<int:pk>/recommendations', FoodItemRecommendationsView.as_view()),
+    path('menu-items/import', MenuImportView.as_view()),
+    path('menu-items/export', MenuExportView.as_view()),
+    path('categories/export', CategoryExportView.as_view()),
     path('categories', FoodCategoryListView.as_view(LIST)),
     path('categories/<int:pk>', FoodCategoryDetailView.as_view(DETAIL), name='category-detail'),
     path('categories/<int:pk>/menu-items', CategoryFoodItemsView.as_view()),
@@ -47,10 +59,25 @@ urlpatterns = [
 
     path('orders', CustomerOrderListView.as_view()),
     path('orders/<int:pk>', CustomerOrderDetailView.as_view(), name='order-detail'),
+    path('orders/<int:pk>/history', OrderHistoryView.as_view()),
+    path('orders/export', OrderExportView.as_view()),
 
     path('purchases', TransactionListView.as_view()),
     path('purchases/<int:pk>', TransactionDetailView.as_view(), name='transaction-detail'),
+    path('purchases/export', TransactionExportView.as_view()),
 
     path('purchase-items', TransactionItemListView.as_view()),
     path('purchase-items/<int:pk>', TransactionItemDetailView.as_view(), name='transactionitem-detail'),
-]
\ No newline at end of file
+    path('purchase-items/export', TransactionItemExportView.as_view()),
+
+    path('reports/revenue', RevenueReportView.as_view()),
+    path('reports/top-items', TopItemsReportView.as_view()),
+    path('reports/couriers', CourierReportView.as_view()),
+    path('reports/basket-size', BasketSizeReportView.as_view()),
+    path('reports/demand-heatmap', DemandHeatmapView.as_view()),
+    path('reports/co-purchases', CoPurchaseReportView.as_view()),
+
+    path('metrics', MetricsView.as_view()),
+    path('profiling', ProfilingView.as_view()),
+    path('profiling/<str:route>', ProfileDetailView.as_view()),
+]
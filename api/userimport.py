@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import IntegrityError, transaction
+
+from littlelemon.models import RoleMembership
+
+from .hashing import get_bulk_hashing_executor
+from .records import iter_batches
+from .roles import ROLES, role_registry
+
+FIELDS = ['username', 'email', 'first_name', 'last_name']
+
+
+class UserImportError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, max_errors):
+        self.processed = 0
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'skipped': self.skipped,
+            'errors': self.errors,
+        }
+
+
+class UserImporter:
+    """
+    Creates users from a stream of records in batches: one existence query,
+    one users INSERT, one group membership INSERT and one RoleMembership
+    INSERT per batch, with raw passwords hashed across a pool of
+    executor_kind ('thread' or 'process') with workers workers.
+    Memory use is bounded by the batch size, not the file size.
+
+    Records carry username (required), email, first_name, last_name and
+    either password (raw) or password_hash (an already hashed Django
+    password). Users without either get an unusable password. Usernames
+    that already exist are skipped.
+    """
+
+    def __init__(self, role='Customer', batch_size=None, workers=None, executor_kind='thread', progress=None):
+        config = settings.USER_IMPORT
+        self.role = role
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.workers = workers or config['WORKERS']
+        self.executor_kind = executor_kind
+        self.progress = progress
+        self.result = ImportResult(config['MAX_ERRORS'])
+        self.user_model = get_user_model()
+
+    def run(self, records):
+        if self.role not in ROLES:
+            raise UserImportError(f'unknown role {self.role!r}')
+        executor = get_bulk_hashing_executor(self.workers, self.executor_kind)
+        for batch in iter_batches(records, self.batch_size):
+            self.import_batch(batch, executor)
+            if self.progress is not None:
+                self.progress(self.result)
+        return self.result
+
+    def clean(self, line, record):
+        if not isinstance(record, dict):
+            self.result.add_error(line, 'not a valid record')
+            return None
+        username = (record.get('username') or '').strip()
+        if not username:
+            self.result.add_error(line, 'username is required')
+            return None
+        password_hash = record.get('password_hash')
+        if password_hash:
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                self.result.add_error(line, 'password_hash is not a recognised hash')
+                return None
+        cleaned = {field: (record.get(field) or '').strip() for field in FIELDS}
+        cleaned['username'] = self.user_model.normalize_username(username)
+        cleaned['email'] = self.user_model.objects.normalize_email(cleaned['email'])
+        cleaned['password_hash'] = password_hash
+        cleaned['password'] = record.get('password') or None
+        return cleaned
+
+    def hash_passwords(self, rows, executor):
+        raw = [row for row in rows if row['password_hash'] is None and row['password'] is not None]
+        chunksize = max(1, len(raw) // (self.workers * 4))
+        for row, hashed in zip(raw, executor.map(make_password, [row['password'] for row in raw], chunksize=chunksize)):
+            row['password_hash'] = hashed
+        for row in rows:
+            if row['password_hash'] is None:
+                row['password_hash'] = make_password(None)
+
+    def import_batch(self, batch, executor):
+        self.result.processed += len(batch)
+        rows = {}
+        for line, record in batch:
+            row = self.clean(line, record)
+            if row is None:
+                continue
+            if row['username'] in rows:
+                self.result.add_error(line, 'duplicate username in file')
+                continue
+            row['line'] = line
+            rows[row['username']] = row
+
+        existing = set(
+            self.user_model.objects.filter(username__in=list(rows)).values_list('username', flat=True)
+        )
+        for username in existing:
+            self.result.add_error(rows.pop(username)['line'], 'username already exists')
+        if not rows:
+            return
+
+        rows = list(rows.values())
+        self.hash_passwords(rows, executor)
+        try:
+            self.create_users(rows)
+        except IntegrityError:
+            # usernames taken since the existence check, e.g. by a sign-up
+            taken = set(
+                self.user_model.objects.filter(username__in=[row['username'] for row in rows])
+                .values_list('username', flat=True)
+            )
+            for row in rows:
+                if row['username'] in taken:
+                    self.result.add_error(row['line'], 'username already exists')
+            rows = [row for row in rows if row['username'] not in taken]
+            try:
+                self.create_users(rows)
+            except IntegrityError as exc:
+                for row in rows:
+                    self.result.add_error(row['line'], f'could not be created: {exc}')
+
+    def create_users(self, rows):
+        if not rows:
+            return
+        users = [
+            self.user_model(password=row['password_hash'], **{field: row[field] for field in FIELDS})
+            for row in rows
+        ]
+        through = self.user_model.groups.through
+        group_id = role_registry.group_id(self.role)
+        with transaction.atomic():
+            users = self.user_model.objects.bulk_create(users)
+            through.objects.bulk_create([through(user_id=user.pk, group_id=group_id) for user in users])
+            RoleMembership.objects.bulk_create([RoleMembership(user_id=user.pk, role=self.role) for user in users])
+        self.result.created += len(users)
@@ -1,8 +1,13 @@
+from itertools import islice
+
 from django.contrib.auth.models import User, Group
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 
 from rest_framework.generics import (
     RetrieveAPIView,
@@ -12,7 +17,9 @@ from rest_framework.generics import (
     DestroyAPIView,
 )
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework import serializers, status
+from django.http import HttpResponse, StreamingHttpResponse
 
 from littlelemon.models import (
     FoodItem,
@@ -20,6 +27,7 @@ from littlelemon.models import (
     CartItem,
     ShoppingCart,
     CustomerOrder,
+    OrderStatusChange,
     Transaction,
     TransactionItem,
 )
@@ -30,20 +38,72 @@ from .permission import (
     IsDeliveryStaff,
     IsRegularCustomer,
     IsCustomerOrDeliveryStaff,
+    IsDeliveryStaffOrManager,
+    IsMetricsScraper,
 )
 
 from .serializers import (
     UserGroupSerializer,
     AccountSerializer,
+    CourierLoadSerializer,
     FoodItemSerializer,
     FoodCategorySerializer,
     CartItemSerializer,
     ShoppingCartSerializer,
     CustomerOrderSerializer,
+    OrderStatusChangeSerializer,
     TransactionSerializer,
     TransactionItemSerializer,
 )
 
+from .budgets import QueryBudget
+from .hashing import hash_password, HashingPoolBusy
+from .registration import register_user
+from .catalog import (
+    CATEGORY_FIELDS,
+    MENU_FIELDS,
+    MenuImporter,
+    export_category_rows,
+    export_menu_rows,
+    get_catalog_version,
+)
+from .analytics import (
+    TOP_ITEMS_BY,
+    basket_size,
+    courier_deliveries,
+    parse_day_range,
+    remove_order,
+    revenue_by_category,
+    revenue_by_day,
+    revenue_by_item,
+)
+from .columns import ReportEngineUnavailable
+from .historical import get_report
+from .recommendations import RecommendationsNotReady, recommendation_index
+from .transitions import (
+    COURIER_STATUSES,
+    STATES,
+    InvalidTransition,
+    VersionConflict,
+    transition_order,
+)
+from .workload import crew_by_load, least_loaded_courier, remove_order_load
+from .exports import (
+    ORDER_FIELDS,
+    TRANSACTION_FIELDS,
+    TRANSACTION_ITEM_FIELDS,
+    order_rows,
+    parse_date_range,
+    transaction_item_rows,
+    transaction_rows,
+)
+from .records import CONTENT_TYPES, RecordFormatError, detect_format, iter_records, write_records
+from .userimport import UserImporter, UserImportError
+from .metrics import registry
+from .profiling import sampler
+from .roles import role_registry, users_with_role
+from .totals import lock_cart
+
 from .mixins import (
     UserFilteredDetailMixin,
     GroupManagementMixin,
@@ -63,6 +123,8 @@ class AccountListView(AccountHelperMixin, ListCreateAPIView):
     queryset = model.objects.all()
     serializer_class = AccountSerializer
     permission_classes = [IsRestaurantManager]
+    # registration: uniqueness check, BEGIN, user, membership, role, COMMIT
+    query_budgets = {'GET': QueryBudget(5), 'POST': QueryBudget(6)}
     ordering_fields = ['username', 'first_name', 'last_name']
     search_fields = ['username', 'first_name', 'last_name']
     filterset_fields = ['username', 'first_name', 'last_name']
@@ -75,13 +137,14 @@ class AccountListView(AccountHelperMixin, ListCreateAPIView):
 
     def get(self, request, *args, **kwargs):
         if not self.is_admin(request):
-            self.queryset = self.queryset.exclude(groups__name='SysAdmin')
+            self.queryset = self.queryset.exclude(role_memberships__role='SysAdmin')
         return super().get(request, *args, **kwargs)
     
     def post(self, request, *args, **kwargs):
         # Handle user registration with password
-        data = request.data.copy()
-        password = data.pop('password', None)
+        data = request.data
+        # get(), not pop() on a copy: a form-encoded QueryDict pops a list
+        password = data.get('password')
         
         if password:
             # Validate required fields
@@ -93,20 +156,15 @@ class AccountListView(AccountHelperMixin, ListCreateAPIView):
             if get_user_model().objects.filter(username=username).exists():
                 return Response({'username': 'A user with this username already exists.'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Create user with password
-            user = get_user_model().objects.create_user(
-                username=username,
-                email=data.get('email', ''),
-                password=password
-            )
-            # Signal handler will automatically add to Customer group
-            # But we ensure it's added here as well for immediate consistency
+            # Create user with a password hashed on the bounded hashing pool
             try:
-                customer_group, _ = Group.objects.get_or_create(name='Customer')
-                if not user.groups.filter(name='Customer').exists():
-                    customer_group.user_set.add(user)
-            except Exception:
-                pass  # Signal handler will handle it if this fails
+                hashed_password = hash_password(password)
+            except HashingPoolBusy:
+                return Response({'message': 'registration is busy, please retry'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            try:
+                user = register_user(username, email=data.get('email', ''), password_hash=hashed_password)
+            except IntegrityError:
+                return Response({'username': 'A user with this username already exists.'}, status=status.HTTP_400_BAD_REQUEST)
             
             serializer = self.serializer_class(user, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -119,6 +177,39 @@ class AccountListView(AccountHelperMixin, ListCreateAPIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class UserImportView(APIView):
+    permission_classes = [IsSystemAdministrator]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = settings.USER_IMPORT['MAX_UPLOAD_SIZE']
+        if upload.size > max_size:
+            # it would hold a worker for the whole import
+            return Response(
+                {'file': f'files over {max_size} bytes must be imported with manage.py import_users'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        max_rows = settings.USER_IMPORT['MAX_UPLOAD_ROWS']
+        importer = UserImporter(role=request.data.get('role', 'Customer'))
+        try:
+            fmt = request.data.get('format') or detect_format(upload.name)
+            # read before importing anything: every row costs a password hash
+            records = list(islice(iter_records(upload, fmt), max_rows + 1))
+            if len(records) > max_rows:
+                return Response(
+                    {'file': f'files over {max_rows} rows must be imported with manage.py import_users'},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            result = importer.run(records)
+        except (RecordFormatError, UserImportError) as exc:
+            # batches before a syntax error are already imported
+            return Response({'message': str(exc), **importer.result.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+
 class AccountDetailView(AccountHelperMixin, RetrieveUpdateDestroyAPIView):
     model = User
     queryset = model.objects.all()
@@ -164,14 +255,14 @@ class UserGroupDetailView(ModelViewSet):
 
     def check_permissions(self, request):
         pk = request.parser_context['kwargs']['pk']
-        target_group = Group.objects.get(pk=pk)
+        target_role = role_registry.role_for_group_id(pk)
         if request.method in ['GET']:
-            if target_group.name in ['SysAdmin']:
+            if target_role in ['SysAdmin']:
                 self.permission_classes = [IsSystemAdministrator]
             else:
                 self.permission_classes = [IsRestaurantManager]
         else:
-            if target_group.name not in ['SysAdmin', 'Manager']:
+            if target_role not in ['SysAdmin', 'Manager']:
                 self.permission_classes = [IsRestaurantManager]
             else:
                 self.permission_classes = [IsSystemAdministrator]
@@ -185,7 +276,7 @@ class UserGroupDetailView(ModelViewSet):
 
 class SystemAdminListView(GroupManagementMixin, ListAPIView):
     model = User
-    queryset = model.objects.filter(groups__name='SysAdmin')
+    queryset = users_with_role('SysAdmin')
     serializer_class = AccountSerializer
     permission_classes = [IsSystemAdministrator]
     target_group = 'SysAdmin'
@@ -196,7 +287,7 @@ class SystemAdminListView(GroupManagementMixin, ListAPIView):
 
 class SystemAdminDetailView(GroupMemberRemovalMixin, RetrieveUpdateAPIView):
     model = User
-    queryset = model.objects.filter(groups__name='SysAdmin')
+    queryset = users_with_role('SysAdmin')
     serializer_class = AccountSerializer
     permission_classes = [IsSystemAdministrator]
     target_group = 'SysAdmin'
@@ -204,7 +295,7 @@ class SystemAdminDetailView(GroupMemberRemovalMixin, RetrieveUpdateAPIView):
 
 class ManagerListView(GroupManagementMixin, ListAPIView):
     model = User
-    queryset = User.objects.filter(groups__name='Manager').exclude(groups__name='SysAdmin')
+    queryset = users_with_role('Manager')
     serializer_class = AccountSerializer
     target_group = 'Manager'
     ordering_fields = ['username', 'first_name', 'last_name']
@@ -221,7 +312,7 @@ class ManagerListView(GroupManagementMixin, ListAPIView):
 
 class ManagerDetailView(AccountHelperMixin, GroupMemberRemovalMixin, RetrieveUpdateAPIView):
     model = User
-    queryset = User.objects.filter(groups__name='Manager').exclude(groups__name='SysAdmin')
+    queryset = users_with_role('Manager')
     serializer_class = AccountSerializer
     target_group = 'Manager'
 
@@ -237,18 +328,26 @@ class ManagerDetailView(AccountHelperMixin, GroupMemberRemovalMixin, RetrieveUpd
 
 class DeliveryStaffListView(GroupManagementMixin, ListAPIView):
     model = User
-    queryset = User.objects.filter(groups__name='Delivery Crew').exclude(groups__name='SysAdmin').exclude(groups__name='Manager')
+    queryset = users_with_role('Delivery Crew')
     serializer_class = AccountSerializer
     permission_classes = [IsRestaurantManager]
+    query_budgets = {'GET': QueryBudget(4)}
     target_group = 'Delivery Crew'
     ordering_fields = ['username', 'first_name', 'last_name']
     search_fields = ['username', 'first_name', 'last_name']
     filterset_fields = ['username', 'first_name', 'last_name']
-    
+
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('sort') == 'load':
+            # the whole crew, least loaded first, read from the courier counters in one query
+            serializer = CourierLoadSerializer(crew_by_load(), many=True, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return super().get(request, *args, **kwargs)
+
 
 class DeliveryStaffDetailView(GroupMemberRemovalMixin, RetrieveUpdateAPIView):
     model = User
-    queryset = User.objects.filter(groups__name='Delivery Crew').exclude(groups__name='SysAdmin').exclude(groups__name='Manager')
+    queryset = users_with_role('Delivery Crew')
     serializer_class = AccountSerializer
     permission_classes = [IsRestaurantManager]
     target_group = 'Delivery Crew'
@@ -256,9 +355,10 @@ class DeliveryStaffDetailView(GroupMemberRemovalMixin, RetrieveUpdateAPIView):
 
 class CustomerListView(GroupManagementMixin, ListAPIView):
     model = User
-    queryset = User.objects.filter(groups__name='Customer').exclude(groups__name='SysAdmin').exclude(groups__name='Manager')
+    queryset = users_with_role('Customer')
     serializer_class = AccountSerializer
     permission_classes = [IsRestaurantManager]
+    query_budgets = {'GET': QueryBudget(4)}
     target_group = 'Customer'
     ordering_fields = ['username', 'first_name', 'last_name']
     search_fields = ['username', 'first_name', 'last_name']
@@ -267,7 +367,7 @@ class CustomerListView(GroupManagementMixin, ListAPIView):
 
 class CustomerDetailView(GroupMemberRemovalMixin, RetrieveUpdateAPIView):
     model = User
-    queryset = User.objects.filter(groups__name='Customer').exclude(groups__name='SysAdmin').exclude(groups__name='Manager')
+    queryset = users_with_role('Customer')
     serializer_class = AccountSerializer
     permission_classes = [IsRestaurantManager]
     target_group = 'Customer'
@@ -277,6 +377,7 @@ class FoodCategoryListView(ModelViewSet):
     model = FoodCategory
     queryset = model.objects.all()
     serializer_class = FoodCategorySerializer
+    query_budgets = {'GET': QueryBudget(4)}
     ordering_fields = ['name', 'category_slug']
     search_fields = ['name', 'category_slug']
     filterset_fields = ['name', 'category_slug']
@@ -326,6 +427,7 @@ class FoodItemListView(ModelViewSet):
     model = FoodItem
     queryset = model.objects.all()
     serializer_class = FoodItemSerializer
+    query_budgets = {'GET': QueryBudget(5)}
     ordering_fields = ['name', 'cost', 'is_featured']
     search_fields = ['name', 'cost', 'is_featured']
     filterset_fields = ['name', 'cost', 'is_featured']
@@ -348,10 +450,76 @@ class FoodItemListView(ModelViewSet):
         return super().get_queryset()
 
 
+class MenuImportView(APIView):
+    permission_classes = [IsRestaurantManager]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = settings.MENU_IMPORT['MAX_UPLOAD_SIZE']
+        if upload.size > max_size:
+            # it would hold a worker for the whole import
+            return Response(
+                {'file': f'files over {max_size} bytes must be imported with manage.py import_menu'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        try:
+            fmt = request.data.get('format') or detect_format(upload.name)
+            result = MenuImporter().run(iter_records(upload, fmt))
+        except RecordFormatError as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+
+class StreamingExportView(APIView):
+    permission_classes = [IsRestaurantManager]
+    filename = ''
+    fields = []
+
+    def get_rows(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        # 'format' is taken by DRF's renderer override
+        fmt = request.query_params.get('type', 'csv')
+        if fmt not in CONTENT_TYPES:
+            return Response({'type': f'one of {", ".join(CONTENT_TYPES)} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = self.get_rows(request)
+        response = StreamingHttpResponse(write_records(rows, self.fields, fmt), content_type=CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{fmt}"'
+        return response
+
+
+class CatalogExportView(StreamingExportView):
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        response['X-Catalog-Version'] = get_catalog_version()
+        return response
+
+
+class MenuExportView(CatalogExportView):
+    filename = 'menu-items'
+    fields = MENU_FIELDS
+
+    def get_rows(self, request):
+        return export_menu_rows()
+
+
+class CategoryExportView(CatalogExportView):
+    filename = 'categories'
+    fields = CATEGORY_FIELDS
+
+    def get_rows(self, request):
+        return export_category_rows()
+
+
 class FoodItemDetailView(ModelViewSet):
     model = FoodItem
     queryset = model.objects.all()
     serializer_class = FoodItemSerializer
+    query_budgets = {'GET': QueryBudget(3)}
 
     def check_permissions(self, request):
         if request.method in ['GET']:
@@ -361,11 +529,34 @@ class FoodItemDetailView(ModelViewSet):
         return super().check_permissions(request)
 
 
+class FoodItemRecommendationsView(APIView):
+    permission_classes = [IsCustomerOrDeliveryStaff]
+    # the user, their groups and the catalog version
+    query_budgets = {'GET': QueryBudget(3)}
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            recommendations = recommendation_index.recommend(pk)
+        except ReportEngineUnavailable as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except RecommendationsNotReady as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'})
+        if recommendations is None:
+            return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(recommendations, status=status.HTTP_200_OK)
+
+
 class ShoppingCartView(ShoppingCartHelperMixin, APIView):
     model = ShoppingCart
     queryset = model.objects.all()
     serializer_class = ShoppingCartSerializer
     permission_classes = [IsRegularCustomer]
+    query_budgets = {
+        'GET': QueryBudget(7, time_ms=250),
+        # with the SAVEPOINT pair of the cart change's atomic block inside a test transaction
+        'POST': QueryBudget(12, time_ms=250),
+        'DELETE': QueryBudget(12, time_ms=250),
+    }
 
     def get(self, request, *args, **kwargs):
         customer = request.user
@@ -395,8 +586,7 @@ class ShoppingCartView(ShoppingCartHelperMixin, APIView):
                 self.clear_cart(request, customer)
             else:
                 cart_item = CartItem.objects.filter(customer=customer).get(pk=cart_item_id)
-                customer_cart = self.get_or_create_cart(customer)
-                customer_cart.cart_items.remove(cart_item)
+                self.remove_item_from_cart(cart_item, customer)
             return Response({}, status=status.HTTP_200_OK)
         except ValueError:
             return Response({'id': 'a valid integer is required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -409,6 +599,7 @@ class CartItemListView(CartItemHelperMixin, ListCreateAPIView):
     queryset = model.objects.all()
     serializer_class = CartItemSerializer
     permission_classes = [IsRegularCustomer]
+    query_budgets = {'GET': QueryBudget(5), 'POST': QueryBudget(4)}
     ordering_fields = ['customer', 'food_item']
     search_fields = ['customer', 'food_item']
     filterset_fields = ['customer', 'food_item']
@@ -451,15 +642,19 @@ class CartItemDetailView(CartItemHelperMixin, APIView):
             if not customer.groups.filter(name='Manager').exists():
                 self.queryset = self.queryset.filter(customer=customer)
             if request.data.get('quantity') is not None:
-                cart_item = self.queryset.get(pk=kwargs['pk'])
-                cart_item.item_quantity = int(request.data.get('quantity'))
-                cart_item.item_total_price = cart_item.item_quantity * cart_item.food_item.cost
-                cart_item.save()
+                quantity = int(request.data.get('quantity'))
+                # the item and the stored totals of its cart change together
+                with transaction.atomic():
+                    cart_item = self.queryset.select_related('food_item').get(pk=kwargs['pk'])
+                    lock_cart(cart_item.customer_id)
+                    cart_item.item_quantity = quantity
+                    cart_item.item_total_price = cart_item.item_quantity * cart_item.food_item.cost
+                    cart_item.save()
                 return self.serialize_and_respond(request, cart_item)
             raise ValueError
         except ValueError:
             return Response({'quantity': 'field requires a valid integer'}, status=status.HTTP_400_BAD_REQUEST)
-        except User.DoesNotExist:
+        except CartItem.DoesNotExist:
             return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
     
     def delete(self, request, *args, **kwargs):
@@ -467,8 +662,10 @@ class CartItemDetailView(CartItemHelperMixin, APIView):
             customer = request.user
             if not customer.groups.filter(name='Manager').exists():
                 self.queryset = self.queryset.filter(customer=customer)
-            cart_item = self.queryset.get(pk=kwargs['pk'])
-            cart_item.delete()
+            with transaction.atomic():
+                cart_item = self.queryset.get(pk=kwargs['pk'])
+                lock_cart(cart_item.customer_id)
+                cart_item.delete()
             return Response({}, status=status.HTTP_200_OK)
         except CartItem.DoesNotExist:
             return Response({'message': 'object not found'})
@@ -478,6 +675,11 @@ class CustomerOrderListView(AccountHelperMixin, OrderProcessingMixin, ListCreate
     model = CustomerOrder
     queryset = model.objects.all()
     serializer_class = CustomerOrderSerializer
+    query_budgets = {
+        'GET': QueryBudget(8),
+        # the same whatever the cart size: the cart lines are copied in bulk
+        'POST': QueryBudget(18),
+    }
     ordering_fields = ['customer', 'assigned_delivery_person', 'is_delivered', 'order_date']
     search_fields = ['customer', 'assigned_delivery_person', 'is_delivered', 'order_date']
     filterset_fields = ['customer', 'assigned_delivery_person', 'is_delivered', 'order_date']
@@ -507,30 +709,52 @@ class CustomerOrderListView(AccountHelperMixin, OrderProcessingMixin, ListCreate
         customer_cart = self.get_customer_cart(customer=customer)
         if customer_cart is None:
             return Response({'message': 'the customer does not have a cart'}, status=status.HTTP_404_NOT_FOUND)
-        transaction_record = self.create_transaction_from_cart(customer, customer_cart)
-        self.create_order_from_transaction(customer, transaction_record)
-        customer_cart.cart_items.clear()
-        self.clear_customer_cart_items(customer)
-        customer_cart.save()
-        
+        with transaction.atomic():
+            transaction_record = self.create_transaction_from_cart(customer, customer_cart)
+            self.create_order_from_transaction(customer, transaction_record)
+            # deleting the cart items also empties the cart's m2m table
+            self.clear_customer_cart_items(customer)
+
         return Response(status=status.HTTP_201_CREATED)
 
 
-class CustomerOrderDetailView(AccountHelperMixin, ResponseHelperMixin, RetrieveUpdateDestroyAPIView):
+class CustomerOrderDetailView(AccountHelperMixin, OrderProcessingMixin, RetrieveUpdateDestroyAPIView):
     model = CustomerOrder
     queryset = model.objects.all()
     serializer_class = CustomerOrderSerializer
+    reorder_targets = ['cart', 'order']
+    query_budgets = {
+        'GET': QueryBudget(6),
+        # the conditional update, the history row, the delivery rollups and
+        # the courier counters; the day of an earlier delivery is looked up
+        # when one is taken back or moved to another courier
+        'PATCH': QueryBudget(13),
+        # the same whatever the order size; prices are read in one query per request
+        'POST': QueryBudget(16),
+    }
 
     def check_permissions(self, request):
         if request.method in ['GET']:
             self.permission_classes = [IsCustomerOrDeliveryStaff]
+        elif request.method in ['POST']:
+            self.permission_classes = [IsRegularCustomer]
         elif request.method in ['PATCH']:
-            self.permission_classes = [IsDeliveryStaff]
-            if request.data.get('assigned_delivery_person_id'):
+            self.permission_classes = [IsDeliveryStaffOrManager]
+            try:
+                auto_assign = self.auto_assign_requested(request)
+            except serializers.ValidationError:
+                # refused by patch either way; do not tell non-managers why
+                auto_assign = True
+            if request.data.get('assigned_delivery_person_id') or auto_assign:
                 self.permission_classes = [IsRestaurantManager]
         else:
             self.permission_classes = [IsRestaurantManager]
         return super().check_permissions(request)
+
+    def auto_assign_requested(self, request):
+        # form data sends 'false' as a non-empty string
+        value = request.data.get('auto_assign')
+        return value is not None and serializers.BooleanField().to_internal_value(value)
     
     def get(self, request, *args, **kwargs):
         customer = request.user
@@ -543,36 +767,109 @@ class CustomerOrderDetailView(AccountHelperMixin, ResponseHelperMixin, RetrieveU
         return super().get(request, *args, **kwargs)
 
     def patch(self, request, *args, **kwargs):
+        state = request.data.get('state')
         order_status = request.data.get('status')
         delivery_person_id = request.data.get('assigned_delivery_person_id')
+        expected_version = request.data.get('version')
+        is_manager = self.is_manager_or_admin(request)
         try:
-            if self.is_admin(request):
-                pass
-            elif self.is_manager(request):
-                pass
-            elif self.is_delivery_staff(request):
+            if not is_manager:
                 self.queryset = self.queryset.filter(assigned_delivery_person=request.user)
             order = self.queryset.get(pk=kwargs['pk'])
-            if order_status is not None:
+            new_status = None
+            if state is not None:
+                if state not in STATES:
+                    return Response({'state': f'one of {", ".join(STATES)} is required'}, status=status.HTTP_400_BAD_REQUEST)
+                new_status = STATES[state]
+            elif order_status is not None:
+                # the delivered flag of older clients: 1 delivers, 0 takes a delivery back
                 if int(order_status) < 0 or int(order_status) > 1:
                     raise ValueError
-                order.is_delivered = int(order_status)
-                order.save()
-            if delivery_person_id is not None:
-                order.assigned_delivery_person = User.objects.get(pk=delivery_person_id)
-                order.save()
+                if int(order_status):
+                    new_status = CustomerOrder.Status.DELIVERED
+                elif order.status == CustomerOrder.Status.DELIVERED:
+                    new_status = CustomerOrder.Status.OUT_FOR_DELIVERY
+            if not is_manager and new_status is not None and new_status not in COURIER_STATUSES:
+                return Response({'state': 'couriers can only set out-for-delivery or delivered'}, status=status.HTTP_403_FORBIDDEN)
+            try:
+                auto_assign = self.auto_assign_requested(request)
+            except serializers.ValidationError:
+                return Response({'auto_assign': 'must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
+            if auto_assign:
+                delivery_person_id = least_loaded_courier()
+                if delivery_person_id is None:
+                    return Response({'auto_assign': 'there is no delivery crew to assign'}, status=status.HTTP_400_BAD_REQUEST)
+            elif delivery_person_id is not None:
+                delivery_person_id = int(delivery_person_id)
+                if not users_with_role('Delivery Crew').filter(pk=delivery_person_id).exists():
+                    return Response({'assigned_delivery_person_id': 'a member of the delivery crew is required'}, status=status.HTTP_400_BAD_REQUEST)
+            if expected_version is not None:
+                expected_version = int(expected_version)
+            transition_order(order, new_status, delivery_person_id, expected_version, changed_by=request.user)
             return self.serialize_and_respond(request, order)
         except CustomerOrder.DoesNotExist:
             return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
-        except ValueError:
-            return Response({'status': 'requires a valid integer (0 or 1)', 'id': 'requires a valid integer'}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidTransition as exc:
+            return Response({'state': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except VersionConflict as exc:
+            return Response({'message': str(exc), 'version': exc.version}, status=status.HTTP_409_CONFLICT)
+        except (TypeError, ValueError):
+            return Response({'status': 'requires a valid integer (0 or 1)', 'id': 'requires a valid integer', 'version': 'requires a valid integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            remove_order(instance)
+            remove_order_load(instance)
+            instance.delete()
+
+    def post(self, request, *args, **kwargs):
+        # reorder: clone the lines of a past order into the cart or a new order
+        target = request.data.get('into', 'cart')
+        if target not in self.reorder_targets:
+            return Response({'into': f'one of {", ".join(self.reorder_targets)} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = self.queryset.filter(customer=request.user).get(pk=kwargs['pk'])
+        except CustomerOrder.DoesNotExist:
+            return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            replace = serializers.BooleanField().to_internal_value(request.data.get('replace', False))
+        except serializers.ValidationError:
+            return Response({'replace': 'must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
+        lines, unavailable = self.get_reorder_lines(order)
+        if not lines:
+            return Response({'message': 'none of the items of this order are on the menu', 'unavailable': unavailable}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            if target == 'cart':
+                self.reorder_into_cart(request.user, lines, replace)
+                return Response({'items': len(lines), 'unavailable': unavailable}, status=status.HTTP_200_OK)
+            new_order = self.reorder_into_order(request.user, lines)
+        return Response(
+            {'order': new_order.pk, 'order_total': str(new_order.order_total), 'items': len(lines), 'unavailable': unavailable},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class OrderHistoryView(AccountHelperMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    query_budgets = {'GET': QueryBudget(4)}
+
+    def get(self, request, pk, *args, **kwargs):
+        orders = CustomerOrder.objects.filter(pk=pk)
+        if not self.is_manager_or_admin(request):
+            orders = orders.filter(Q(customer=request.user) | Q(assigned_delivery_person=request.user))
+        if not orders.exists():
+            return Response({'message': 'object not found'}, status=status.HTTP_404_NOT_FOUND)
+        changes = OrderStatusChange.objects.filter(order_id=pk)
+        return Response(OrderStatusChangeSerializer(changes, many=True).data, status=status.HTTP_200_OK)
 
 
 class TransactionListView(ListAPIView):
     model = Transaction
-    queryset = model.objects.all()
+    # the serializer links every item; one query for the page instead of one per transaction
+    queryset = model.objects.prefetch_related('transaction_items')
     serializer_class = TransactionSerializer
     permission_classes = [IsRegularCustomer]
+    query_budgets = {'GET': QueryBudget(6)}
     ordering_fields = ['customer', 'transaction_date']
     search_fields = ['customer', 'transaction_date']
     filterset_fields = ['customer', 'transaction_date']
@@ -606,6 +903,7 @@ class TransactionItemListView(ListAPIView):
     queryset = model.objects.all()
     serializer_class = TransactionItemSerializer
     permission_classes = [IsRegularCustomer]
+    query_budgets = {'GET': QueryBudget(4)}
     ordering_fields = ['customer', 'food_item', 'item_total_price']
     search_fields = ['customer', 'food_item', 'item_total_price']
     filterset_fields = ['customer', 'food_item', 'item_total_price']
@@ -633,3 +931,158 @@ class TransactionItemDetailView(RetrieveUpdateDestroyAPIView):
         customer = request.user
         self.queryset = self.queryset.filter(customer=customer)
         return super().get(*args, **kwargs)
+
+
+class MetricsView(APIView):
+    permission_classes = [IsMetricsScraper]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfilingView(APIView):
+    permission_classes = [IsSystemAdministrator]
+
+    def get(self, request, *args, **kwargs):
+        return Response(sampler.routes(), status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        route = request.data.get('route')
+        if not route:
+            return Response({'route': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rate = float(request.data.get('rate', 0))
+        except (TypeError, ValueError):
+            rate = -1
+        if not 0 <= rate <= 1:
+            return Response({'rate': 'a number between 0 and 1 is required'}, status=status.HTTP_400_BAD_REQUEST)
+        sampler.set_rate(route, rate)
+        return Response({'route': route, 'rate': rate}, status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        sampler.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileDetailView(APIView):
+    permission_classes = [IsSystemAdministrator]
+
+    def get(self, request, route, *args, **kwargs):
+        folded = sampler.folded(route)
+        if folded is None:
+            return Response({'message': 'no samples for this route'}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(folded, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{route}.folded"'
+        return response
+
+    def delete(self, request, route, *args, **kwargs):
+        sampler.clear(route)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class OrderExportView(StreamingExportView):
+    filename = 'orders'
+    fields = ORDER_FIELDS
+
+    def get_rows(self, request):
+        return order_rows(*parse_date_range(request.query_params))
+
+
+class TransactionExportView(StreamingExportView):
+    filename = 'purchases'
+    fields = TRANSACTION_FIELDS
+
+    def get_rows(self, request):
+        return transaction_rows(*parse_date_range(request.query_params))
+
+
+class TransactionItemExportView(StreamingExportView):
+    filename = 'purchase-items'
+    fields = TRANSACTION_ITEM_FIELDS
+
+    def get_rows(self, request):
+        return transaction_item_rows(*parse_date_range(request.query_params))
+
+
+class SalesReportView(APIView):
+    permission_classes = [IsRestaurantManager]
+    query_budgets = {'GET': QueryBudget(4)}
+
+    def get_report(self, request, start, end):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        start, end = parse_day_range(request.query_params)
+        return self.get_report(request, start, end)
+
+
+class RevenueReportView(SalesReportView):
+    groupings = {'day': revenue_by_day, 'category': revenue_by_category, 'item': revenue_by_item}
+
+    def get_report(self, request, start, end):
+        group = request.query_params.get('group', 'day')
+        if group not in self.groupings:
+            return Response({'group': f'one of {", ".join(self.groupings)} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.groupings[group](start, end), status=status.HTTP_200_OK)
+
+
+class TopItemsReportView(SalesReportView):
+    max_limit = 100
+
+    def get_report(self, request, start, end):
+        order_by = request.query_params.get('by', 'revenue')
+        if order_by not in TOP_ITEMS_BY:
+            return Response({'by': f'one of {", ".join(TOP_ITEMS_BY)} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            return Response({'limit': f'an integer between 1 and {self.max_limit} is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(revenue_by_item(start, end, order_by=order_by, limit=limit), status=status.HTTP_200_OK)
+
+
+class CourierReportView(SalesReportView):
+    def get_report(self, request, start, end):
+        return Response(courier_deliveries(start, end), status=status.HTTP_200_OK)
+
+
+class BasketSizeReportView(SalesReportView):
+    def get_report(self, request, start, end):
+        return Response(basket_size(start, end), status=status.HTTP_200_OK)
+
+
+class HistoricalReportView(SalesReportView):
+    report = ''
+
+    def get_options(self, request):
+        return {}
+
+    def get_report(self, request, start, end):
+        try:
+            options = self.get_options(request)
+        except ValueError as exc:
+            return Response(exc.args[0], status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = get_report(self.report, start, end, **options)
+        except ReportEngineUnavailable as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class DemandHeatmapView(HistoricalReportView):
+    report = 'demand-heatmap'
+
+
+class CoPurchaseReportView(HistoricalReportView):
+    report = 'co-purchases'
+    max_limit = 100
+
+    def get_options(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            raise ValueError({'limit': f'an integer between 1 and {self.max_limit} is required'})
+        return {'limit': limit}
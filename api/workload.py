@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from littlelemon.models import CourierLoad, CustomerOrder, DailyCourierDeliveries
+
+from .analytics import BATCH_SIZE, increment
+from .roles import users_with_role
+
+Status = CustomerOrder.Status
+
+
+def open_rows(courier_id, status, sign):
+    """The CourierLoad rows an order counts for: open for its courier until delivered."""
+    if courier_id is None or status == Status.DELIVERED:
+        return []
+    return [{'courier_id': courier_id, 'open_count': sign}]
+
+
+def record_load_change(order, previous_status, previous_courier_id):
+    """
+    Move an order between courier open counts after a transition changed
+    its courier or whether it is delivered. Deliveries are counted by
+    analytics.record_delivery_change.
+    """
+    rows = (
+        open_rows(previous_courier_id, previous_status, -1)
+        + open_rows(order.assigned_delivery_person_id, order.status, 1)
+    )
+    if previous_courier_id == order.assigned_delivery_person_id and len(rows) == 2:
+        return
+    increment(CourierLoad, ['courier_id'], rows)
+
+
+def remove_order_load(order):
+    """Take an order about to be deleted off its courier's open count."""
+    increment(CourierLoad, ['courier_id'], open_rows(order.assigned_delivery_person_id, order.status, -1))
+
+
+def rebuild_load():
+    """
+    Recompute every courier's open count from the orders. Returns the
+    number of couriers with open orders.
+    """
+    rows = [
+        CourierLoad(**row)
+        for row in CustomerOrder.objects.filter(assigned_delivery_person__isnull=False)
+        .exclude(status=Status.DELIVERED)
+        .values(courier_id=F('assigned_delivery_person_id'))
+        .annotate(open_count=Count('id'))
+        .order_by()
+    ]
+    with transaction.atomic():
+        CourierLoad.objects.all().delete()
+        CourierLoad.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def crew_by_load():
+    """
+    The delivery crew annotated with open_orders and delivered_today,
+    least loaded first: fewest open orders, then fewest deliveries today.
+    """
+    delivered_today = DailyCourierDeliveries.objects.filter(
+        courier=OuterRef('pk'), day=timezone.localdate(),
+    ).values('delivered_count')
+    return (
+        users_with_role('Delivery Crew')
+        .annotate(
+            open_orders=Coalesce('courier_load__open_count', Value(0)),
+            delivered_today=Coalesce(Subquery(delivered_today), Value(0), output_field=IntegerField()),
+        )
+        .order_by('open_orders', 'delivered_today', 'pk')
+    )
+
+
+def least_loaded_courier():
+    """The id of the least loaded member of the delivery crew, or None when there is none."""
+    return crew_by_load().values_list('pk', flat=True).first()
@@ -0,0 +1,57 @@
+"""
+Shared setup for the benchmark scripts: Django bootstrap, a throwaway test
+database and a few reporting helpers.
+"""
+import contextlib
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    """
+    Create the test database (like the test runner does), yield, and tear it
+    down again so benchmarks never touch the development database.
+    """
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_latency(samples):
+    return '  '.join(
+        f'p{int(fraction * 100)}={percentile(samples, fraction) * 1000:.2f}ms'
+        for fraction in (0.5, 0.95, 0.99)
+    )
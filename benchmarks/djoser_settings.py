@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for djoser settings resolution.
+
+Reports how long it takes to build a settings snapshot (including resolving
+every serializer and permission path), and the per-request cost of
+UserViewSet.get_permissions + get_serializer_class for each action, next to
+a replica of the previous per-access ObjDict and if/elif chains.
+
+Usage:
+    python benchmarks/djoser_settings.py [iterations]
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import setup_django
+
+setup_django()
+
+from django.utils.functional import LazyObject
+from django.utils.module_loading import import_string
+from rest_framework.test import APIRequestFactory
+
+from djoser import conf
+from djoser.views import UserViewSet
+
+ACTIONS = [
+    ('create', 'post'), ('list', 'get'), ('retrieve', 'get'), ('me', 'get'), ('me', 'delete'),
+    ('activation', 'post'), ('reset_password', 'post'), ('reset_password_confirm', 'post'),
+    ('set_password', 'post'), ('set_username', 'post'), ('destroy', 'delete'),
+]
+
+
+class LegacyObjDict(dict):
+    def __getattribute__(self, item):
+        try:
+            val = self[item]
+            if isinstance(val, str):
+                val = import_string(val)
+            elif isinstance(val, (list, tuple)):
+                val = [import_string(v) if isinstance(v, str) else v for v in val]
+            self[item] = val
+        except KeyError:
+            val = super().__getattribute__(item)
+        return val
+
+
+class LegacySettings(LazyObject):
+    def _setup(self):
+        self._wrapped = SimpleNamespace(
+            PERMISSIONS=LegacyObjDict(conf.default_settings['PERMISSIONS']),
+            SERIALIZERS=LegacyObjDict(conf.default_settings['SERIALIZERS']),
+        )
+
+
+legacy_settings = LegacySettings()
+
+
+class LegacyUserViewSet(UserViewSet):
+    # every settings.X read goes through the lazy proxy, as it did before
+    def get_permissions(self):
+        permissions = legacy_settings.PERMISSIONS
+        if self.action == 'create':
+            self.permission_classes = permissions.user_create
+        elif self.action == 'activation':
+            self.permission_classes = permissions.activation
+        elif self.action == 'resend_activation':
+            self.permission_classes = permissions.password_reset
+        elif self.action == 'list':
+            self.permission_classes = permissions.user_list
+        elif self.action == 'reset_password':
+            self.permission_classes = permissions.password_reset
+        elif self.action == 'reset_password_confirm':
+            self.permission_classes = permissions.password_reset_confirm
+        elif self.action == 'set_password':
+            self.permission_classes = permissions.set_password
+        elif self.action == 'set_username':
+            self.permission_classes = permissions.set_username
+        elif self.action == 'reset_username':
+            self.permission_classes = permissions.username_reset
+        elif self.action == 'reset_username_confirm':
+            self.permission_classes = permissions.username_reset_confirm
+        elif self.action == 'destroy' or (self.action == 'me' and self.request and self.request.method == 'DELETE'):
+            self.permission_classes = permissions.user_delete
+        return [permission() for permission in self.permission_classes]
+
+    def get_serializer_class(self):
+        serializers = legacy_settings.SERIALIZERS
+        if self.action == 'create':
+            return serializers.user_create
+        elif self.action == 'destroy' or (self.action == 'me' and self.request and self.request.method == 'DELETE'):
+            return serializers.user_delete
+        elif self.action == 'activation':
+            return serializers.activation
+        elif self.action == 'resend_activation':
+            return serializers.password_reset
+        elif self.action == 'reset_password':
+            return serializers.password_reset
+        elif self.action == 'reset_password_confirm':
+            return serializers.password_reset_confirm
+        elif self.action == 'set_password':
+            return serializers.set_password
+        elif self.action == 'set_username':
+            return serializers.set_username
+        elif self.action == 'reset_username':
+            return serializers.username_reset
+        elif self.action == 'reset_username_confirm':
+            return serializers.username_reset_confirm
+        elif self.action == 'me':
+            return serializers.current_user
+        return self.serializer_class
+
+
+def build_views(view_class):
+    factory = APIRequestFactory()
+    views = []
+    for action, method in ACTIONS:
+        view = view_class()
+        view.action = action
+        view.request = getattr(factory, method)('/api/users/')
+        views.append(view)
+    return views
+
+
+def time_resolution(view_class, iterations):
+    views = build_views(view_class)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for view in views:
+            view.get_permissions()
+            view.get_serializer_class()
+    elapsed = time.perf_counter() - started
+    return elapsed / (iterations * len(views)) * 1e6
+
+
+def time_snapshot(iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        snapshot = conf.Settings(conf.default_settings)
+        snapshot.action_permissions
+        snapshot.action_serializers
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f'settings snapshot build      {time_snapshot(max(1, iterations // 100)):8.1f} us')
+    print(f'legacy per-request lookup    {time_resolution(LegacyUserViewSet, iterations):8.2f} us/action')
+    print(f'snapshot per-request lookup  {time_resolution(UserViewSet, iterations):8.2f} us/action')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for djoser email rendering and delivery.
+
+Compares sending activation emails one by one (an SMTP connection per
+message) with ActivationEmail.send_bulk, and reports
+messages per second for both. Mail goes to the locmem backend, so no SMTP
+server is needed.
+
+Usage:
+    python benchmarks/email_throughput.py [message_count]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import setup_django
+
+setup_django()
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test.utils import override_settings, setup_test_environment
+
+from djoser.email import ActivationEmail
+
+User = get_user_model()
+
+
+def build_users(count):
+    return [
+        User(pk=index, username=f'bench{index}', email=f'bench{index}@example.com', password='!')
+        for index in range(1, count + 1)
+    ]
+
+
+def run_one_by_one(users):
+    for user in users:
+        ActivationEmail(None, {'user': user}).send([user.email])
+
+
+def run_bulk(users):
+    ActivationEmail.send_bulk(None, users)
+
+
+def measure(label, func, count):
+    mail.outbox = []
+    users = build_users(count)
+    started = time.perf_counter()
+    func(users)
+    elapsed = time.perf_counter() - started
+    assert len(mail.outbox) == count
+    print(f'{label:<12} {count} messages in {elapsed:.3f}s  ({count / elapsed:,.0f} msg/s)')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    setup_test_environment()
+    with override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        DJOSER={'ACTIVATION_URL': 'activate/{uid}/{token}', 'USER_ID_FIELD': 'username'},
+    ):
+        measure('one-by-one', run_one_by_one, count)
+        measure('bulk', run_bulk, count)
+
+
+if __name__ == '__main__':
+    main()
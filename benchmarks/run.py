@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Little Lemon API load-test and benchmark suite.
+
+Seeds a throwaway test database with a realistic dataset, drives each
+scenario through the Django test client and reports, per scenario:
+throughput, p50/p95/p99 latency and database queries per request. Runs
+fully offline.
+
+Requests that go over the query budget declared on their view are listed
+after the results and make the run exit non-zero.
+
+A run can be saved as a baseline and later runs compared against it; the
+comparison exits non-zero when p95 latency or queries per request regress
+beyond the tolerance, so it can gate a deploy.
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --scenario checkout --iterations 500
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile, setup_django, test_database
+
+setup_django()
+
+from django.test.utils import override_settings
+
+from api.budgets import query_budget_exceeded
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.seed import seed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--iterations', type=int, default=200, help='iterations per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured iterations per scenario')
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--couriers', type=int, default=50)
+    parser.add_argument('--managers', type=int, default=5)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--save', metavar='FILE', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against a saved JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative p95 regression when comparing (default 0.2)')
+    return parser.parse_args()
+
+
+def summarize(scenario, elapsed):
+    samples = scenario.samples
+    latencies = [sample.elapsed for sample in samples]
+    queries = [sample.queries for sample in samples]
+    errors = sum(1 for sample in samples if sample.status_code >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': len(samples) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries_avg': sum(queries) / len(queries) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+    }
+
+
+def run_scenario(scenario_class, dataset, iterations, warmup):
+    scenario = scenario_class(dataset)
+    for iteration in range(warmup):
+        scenario.run(iteration)
+    scenario.samples = []
+
+    started = time.perf_counter()
+    for iteration in range(warmup, warmup + iterations):
+        scenario.run(iteration)
+    return summarize(scenario, time.perf_counter() - started)
+
+
+def print_results(results):
+    header = f'{"scenario":<20}{"reqs":>7}{"err":>5}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"q/req":>8}{"q max":>7}'
+    print(header)
+    print('-' * len(header))
+    for name, result in results.items():
+        print(
+            f'{name:<20}{result["requests"]:>7}{result["errors"]:>5}{result["throughput"]:>9.1f}'
+            f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+            f'{result["queries_avg"]:>8.1f}{result["queries_max"]:>7}'
+        )
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {previous["p95_ms"]:.2f}ms -> {result["p95_ms"]:.2f}ms')
+        if result['queries_max'] > previous['queries_max']:
+            regressions.append(f'{name}: queries/request {previous["queries_max"]} -> {result["queries_max"]}')
+    return regressions
+
+
+class BudgetViolations(list):
+    def record(self, sender, view_name, method, path, budget, queries, elapsed_ms, fingerprints, **kwargs):
+        self.append(f'{method} {path} ({view_name}): {queries} queries, {elapsed_ms:.1f}ms, over {budget!r}')
+
+
+def main():
+    args = parse_args()
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario]
+    violations = BudgetViolations()
+    query_budget_exceeded.connect(violations.record)
+    # violations are reported below instead of being logged per request
+    logging.getLogger('api.budgets').setLevel(logging.ERROR)
+
+    with test_database(), override_settings(QUERY_BUDGETS={'ENABLED': True, 'MODE': 'log'}):
+        started = time.perf_counter()
+        dataset = seed(
+            items=args.items,
+            categories=args.categories,
+            customers=args.customers,
+            couriers=args.couriers,
+            managers=args.managers,
+            orders=args.orders,
+        )
+        print(
+            f'seeded {len(dataset.items)} items, {len(dataset.customers)} customers, '
+            f'{len(dataset.orders)} orders in {time.perf_counter() - started:.1f}s\n'
+        )
+        results = {
+            scenario.name: run_scenario(scenario, dataset, args.iterations, args.warmup)
+            for scenario in scenarios
+        }
+
+    print_results(results)
+
+    if violations:
+        print(f'\nquery budget violations ({len(violations)}):')
+        for violation in sorted(set(violations)):
+            print(f'  {violation}')
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print('\nregressions against baseline:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print('\nno regressions against baseline')
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark scenarios. Each scenario issues one or more API requests per
+iteration through the Django test client; every measured request records
+its latency and the number of database queries it ran, counted by the
+QueryRecorder the query budgets use, so the two counts agree.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.budgets import QueryRecorder
+from littlelemon.models import CartItem, ShoppingCart
+
+
+class RequestSample:
+    def __init__(self, method, path, status_code, elapsed, queries):
+        self.method = method
+        self.path = path
+        self.status_code = status_code
+        self.elapsed = elapsed
+        self.queries = queries
+
+
+class Scenario:
+    name = ''
+    description = ''
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.samples = []
+        self.clients = {}
+
+    def client_for(self, user):
+        client = self.clients.get(user.pk)
+        if client is None:
+            token = AccessToken.for_user(user)
+            client = self.clients[user.pk] = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def call(self, user, method, path, data=None, measure=True):
+        client = self.client_for(user)
+        kwargs = {'content_type': 'application/json'} if method != 'get' else {}
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data, **kwargs)
+            elapsed = time.perf_counter() - started
+        if measure:
+            self.samples.append(RequestSample(method.upper(), path, response.status_code, elapsed, recorder.count))
+        return response
+
+    def run(self, iteration):
+        raise NotImplementedError
+
+
+class MenuBrowse(Scenario):
+    name = 'menu-browse'
+    description = 'customer pages through the menu, categories and a dish'
+
+    def run(self, iteration):
+        customer = self.dataset.customers[iteration % len(self.dataset.customers)]
+        item = self.dataset.items[iteration % len(self.dataset.items)]
+        # every page exists, whatever the seeded menu size
+        pages = max(1, -(-len(self.dataset.items) // settings.REST_FRAMEWORK['PAGE_SIZE']))
+        page = iteration % pages + 1
+        self.call(customer, 'get', f'/api/menu-items?page={page}')
+        self.call(customer, 'get', '/api/categories')
+        self.call(customer, 'get', f'/api/menu-items/{item.pk}')
+
+
+class AddToCart(Scenario):
+    name = 'add-to-cart'
+    description = 'customer creates a cart item and puts it in the cart'
+
+    def pick(self, iteration):
+        customers, items = self.dataset.customers, self.dataset.items
+        # (customer, item) pairs never repeat, as CartItem requires
+        return customers[iteration % len(customers)], items[(iteration // len(customers)) % len(items)]
+
+    def run(self, iteration):
+        customer, item = self.pick(iteration)
+        self.call(customer, 'post', '/api/order-items', {'id': item.pk, 'quantity': 2})
+        cart_item = CartItem.objects.get(customer=customer, food_item=item)
+        self.call(customer, 'post', '/api/cart', {'id': cart_item.pk})
+
+
+class Checkout(Scenario):
+    name = 'checkout'
+    description = 'customer with a three-line cart places an order'
+
+    def prepare_cart(self, customer, iteration):
+        cart, _ = ShoppingCart.objects.get_or_create(customer=customer)
+        items = self.dataset.items
+        for offset in range(3):
+            item = items[(iteration * 3 + offset) % len(items)]
+            cart_item, _ = CartItem.objects.get_or_create(
+                customer=customer,
+                food_item=item,
+                defaults={'item_quantity': 1, 'item_unit_price': item.cost, 'item_total_price': item.cost},
+            )
+            cart.cart_items.add(cart_item)
+
+    def run(self, iteration):
+        customer = self.dataset.customers[-(iteration % len(self.dataset.customers)) - 1]
+        self.prepare_cart(customer, iteration)
+        self.call(customer, 'post', '/api/orders')
+
+
+class CourierPolling(Scenario):
+    name = 'courier-polling'
+    description = 'courier polls the assigned order list and opens an order'
+
+    def run(self, iteration):
+        courier = self.dataset.couriers[iteration % len(self.dataset.couriers)]
+        self.call(courier, 'get', '/api/orders?is_delivered=false')
+        self.call(courier, 'get', '/api/orders')
+        order = self.dataset.orders[iteration % len(self.dataset.orders)]
+        if order.assigned_delivery_person_id == courier.pk:
+            self.call(courier, 'get', f'/api/orders/{order.pk}')
+
+
+class ManagerDashboard(Scenario):
+    name = 'manager-dashboard'
+    description = 'manager reviews groups, couriers, customers and users'
+
+    def run(self, iteration):
+        manager = self.dataset.managers[iteration % len(self.dataset.managers)]
+        page = iteration % 20 + 1
+        self.call(manager, 'get', '/api/groups')
+        self.call(manager, 'get', '/api/groups/delivery-crew')
+        self.call(manager, 'get', f'/api/groups/customers?page={page}')
+        self.call(manager, 'get', f'/api/users?page={page}')
+
+
+SCENARIOS = [MenuBrowse, AddToCart, Checkout, CourierPolling, ManagerDashboard]
@@ -0,0 +1,166 @@
+"""
+Seeds a realistic Little Lemon dataset with bulk inserts: role groups,
+categories and menu items, customers, couriers, managers, and a history of
+delivered and pending orders with their transactions.
+"""
+import contextlib
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from api.analytics import rebuild_rollups
+from api.roles import backfill_user_roles
+from api.totals import refresh_totals
+from api.workload import rebuild_load
+from littlelemon.models import (
+    CustomerOrder,
+    FoodCategory,
+    FoodItem,
+    Transaction,
+    TransactionItem,
+)
+
+ROLES = ['SysAdmin', 'Manager', 'Delivery Crew', 'Customer']
+BATCH_SIZE = 2000
+PASSWORD = 'Lemon-Pass-123'
+
+
+class Dataset:
+    def __init__(self):
+        self.categories = []
+        self.items = []
+        self.customers = []
+        self.couriers = []
+        self.managers = []
+        self.admins = []
+        self.orders = []
+
+
+@contextlib.contextmanager
+def explicit_dates(model, field_name):
+    """Let bulk_create keep the seeded value of an auto_now_add field."""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def bulk_create(model, objects):
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def create_users(prefix, count, password_hash):
+    return bulk_create(User, [
+        User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', password=password_hash)
+        for index in range(count)
+    ])
+
+
+def add_to_group(group, users):
+    through = User.groups.through
+    bulk_create(through, [through(user_id=user.pk, group_id=group.pk) for user in users])
+
+
+def seed_menu(dataset, categories, items, rng):
+    dataset.categories = bulk_create(FoodCategory, [
+        FoodCategory(name=f'Category {index}', category_slug=f'category-{index}')
+        for index in range(categories)
+    ])
+    dataset.items = bulk_create(FoodItem, [
+        FoodItem(
+            name=f'Dish {index}',
+            cost=Decimal(rng.randint(300, 4000)) / 100,
+            is_featured=rng.random() < 0.05,
+            food_category=dataset.categories[index % categories],
+        )
+        for index in range(items)
+    ])
+
+
+def seed_users(dataset, customers, couriers, managers):
+    # every seeded account shares one hash; hashing per user would dominate seeding
+    password_hash = make_password(PASSWORD)
+    groups = {name: Group.objects.get_or_create(name=name)[0] for name in ROLES}
+
+    dataset.admins = create_users('admin', 1, password_hash)
+    dataset.managers = create_users('manager', managers, password_hash)
+    dataset.couriers = create_users('courier', couriers, password_hash)
+    dataset.customers = create_users('customer', customers, password_hash)
+
+    add_to_group(groups['SysAdmin'], dataset.admins)
+    add_to_group(groups['Manager'], dataset.managers)
+    add_to_group(groups['Delivery Crew'], dataset.couriers)
+    add_to_group(groups['Customer'], dataset.customers)
+    # bulk_create skips m2m_changed, so the role table is rebuilt once
+    backfill_user_roles(batch_size=BATCH_SIZE)
+
+
+def seed_orders(dataset, orders, rng, days=90, max_lines=4):
+    now = timezone.now()
+    for start in range(0, orders, BATCH_SIZE):
+        count = min(BATCH_SIZE, orders - start)
+        customers = [rng.choice(dataset.customers) for _ in range(count)]
+        dates = [now - timedelta(minutes=rng.randint(0, days * 24 * 60)) for _ in range(count)]
+
+        with explicit_dates(Transaction, 'transaction_date'):
+            transactions = bulk_create(Transaction, [
+                Transaction(customer=customer, transaction_date=date)
+                for customer, date in zip(customers, dates)
+            ])
+
+        lines = []
+        for customer in customers:
+            basket = []
+            for item in rng.sample(dataset.items, rng.randint(1, max_lines)):
+                quantity = rng.randint(1, 3)
+                basket.append(TransactionItem(
+                    customer=customer,
+                    food_item=item,
+                    item_quantity=quantity,
+                    item_unit_price=item.cost,
+                    item_total_price=item.cost * quantity,
+                ))
+            lines.append(basket)
+        bulk_create(TransactionItem, [line for basket in lines for line in basket])
+
+        through = Transaction.transaction_items.through
+        bulk_create(through, [
+            through(transaction_id=record.pk, transactionitem_id=line.pk)
+            for record, basket in zip(transactions, lines)
+            for line in basket
+        ])
+
+        with explicit_dates(CustomerOrder, 'order_date'):
+            dataset.orders.extend(bulk_create(CustomerOrder, [
+                CustomerOrder(
+                    customer=customer,
+                    transaction=record,
+                    assigned_delivery_person=rng.choice(dataset.couriers),
+                    is_delivered=date < now - timedelta(hours=2),
+                    status=CustomerOrder.Status.DELIVERED if date < now - timedelta(hours=2) else CustomerOrder.Status.OUT_FOR_DELIVERY,
+                    order_total=sum(line.item_total_price for line in basket),
+                    order_date=date,
+                )
+                for customer, record, basket, date in zip(customers, transactions, lines, dates)
+            ]))
+
+
+def seed(items=2000, categories=20, customers=20000, couriers=50, managers=5, orders=20000, seed_value=0):
+    rng = random.Random(seed_value)
+    dataset = Dataset()
+    with transaction.atomic():
+        seed_menu(dataset, categories, items, rng)
+        seed_users(dataset, customers, couriers, managers)
+        seed_orders(dataset, orders, rng)
+        # orders are bulk created, so the stored totals, sales rollups and courier counters are rebuilt once
+        refresh_totals(Transaction.objects.all())
+        rebuild_rollups()
+        rebuild_load()
+    return dataset
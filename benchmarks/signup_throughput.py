@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Load-test scenario for registration bursts.
+
+Registers users through POST /api/users from several client threads at once
+and reports sign-ups per second, overall and per available core. Runs
+against a throwaway test database.
+
+Usage:
+    python benchmarks/signup_throughput.py [signups] [client_threads]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import cpu_count, setup_django, test_database
+
+setup_django()
+
+from django.db import connections
+from django.test import Client
+
+
+def sign_up(index):
+    client = Client()
+    try:
+        response = client.post('/api/users', {
+            'username': f'signup{index}',
+            'email': f'signup{index}@example.com',
+            'password': 'Lemon-Pass-123',
+        }, content_type='application/json')
+        return response.status_code
+    finally:
+        connections.close_all()
+
+
+def main():
+    signups = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else cpu_count()
+    cores = cpu_count()
+
+    with test_database():
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            statuses = list(executor.map(sign_up, range(signups)))
+        elapsed = time.perf_counter() - started
+
+    created = statuses.count(201)
+    print(f'{created}/{signups} sign-ups in {elapsed:.2f}s with {threads} client threads')
+    print(f'{created / elapsed:,.1f} sign-ups/s, {created / elapsed / cores:,.1f} sign-ups/s per core ({cores} cores)')
+    failures = {code: statuses.count(code) for code in set(statuses) if code != 201}
+    if failures:
+        print(f'non-201 responses: {failures}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Refresh-token latency over a large outstanding/blacklisted token table.
+
+Seeds OUTSTANDING tokens (a tenth of them blacklisted) and measures
+POST /api/token/refresh/ latency twice: with every revocation check going to
+the database, and through the in-process revocation list.
+
+Usage:
+    python benchmarks/token_refresh.py [outstanding] [refreshes]
+"""
+import os
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import format_latency, setup_django, test_database
+
+setup_django()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from api.tokens import revocation_list
+
+BATCH_SIZE = 10000
+
+
+def seed_tokens(user, outstanding):
+    expires_at = aware_utcnow() + timedelta(days=1)
+    for start in range(0, outstanding, BATCH_SIZE):
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=user, jti=uuid.uuid4().hex, token='', expires_at=expires_at)
+            for _ in range(start, min(start + BATCH_SIZE, outstanding))
+        ])
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=token) for token in tokens[::10]
+        ])
+
+
+def measure(label, user, refreshes, sync_interval):
+    client = Client()
+    tokens = [str(RefreshToken.for_user(user)) for _ in range(refreshes)]
+    samples = []
+    with override_settings(TOKEN_REVOCATION_LIST={'SYNC_INTERVAL': sync_interval, 'RELOAD_INTERVAL': 3600}):
+        revocation_list.reset()
+        for token in tokens:
+            started = time.perf_counter()
+            response = client.post('/api/token/refresh/', {'refresh': token}, content_type='application/json')
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.content
+    print(f'{label:<18} {format_latency(samples)}')
+
+
+def main():
+    outstanding = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    refreshes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    # benchmark traffic comes from one address; lift the login throttles
+    rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'login_ip': None, 'login_username': None})
+    with test_database(), override_settings(REST_FRAMEWORK=rest_framework):
+        user = User.objects.create_user('token-bench', password='Lemon-Pass-123')
+        started = time.perf_counter()
+        seed_tokens(user, outstanding)
+        print(f'seeded {outstanding} outstanding tokens in {time.perf_counter() - started:.1f}s')
+
+        measure('database check', user, refreshes, sync_interval=0)
+        measure('revocation list', user, refreshes, sync_interval=5)
+
+
+if __name__ == '__main__':
+    main()
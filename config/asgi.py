@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# start building the recommendation index with the first request a process
+# serves, as config/wsgi.py does, not on import in a master that may fork
+from django.core.signals import request_started  # noqa: E402
+
+from api.recommendations import start_recommendations  # noqa: E402
+
+request_started.connect(start_recommendations)
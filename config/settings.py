@@ -44,8 +44,42 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.QueryBudgetMiddleware',
 ]
 
+# Per-request metrics served at /api/metrics to SysAdmins and SCRAPE_IPS; no
+# address may scrape unless it is listed
+# Each worker publishes its series to CACHE at most every PUBLISH_INTERVAL
+# seconds; /api/metrics serves the sum over all workers
+METRICS = {
+    'ENABLED': env.bool('METRICS_ENABLED', default=True),
+    'SCRAPE_IPS': env.list('METRICS_SCRAPE_IPS', default=[]),
+    'CACHE': 'metrics',
+    'PUBLISH_INTERVAL': 1,
+}
+
+# Stack sampling per route, e.g. {'CustomerOrderListView.POST': 0.05};
+# SysAdmins can change the rates at runtime through /api/profiling. Rates
+# and samples are shared between workers through CACHE: workers read the
+# rates every SYNC_INTERVAL seconds and publish samples every PUBLISH_INTERVAL
+PROFILING = {
+    'ROUTES': {},
+    'INTERVAL': 0.005,
+    'MAX_STACK_DEPTH': 128,
+    'CACHE': 'profiling',
+    'SYNC_INTERVAL': 5,
+    'PUBLISH_INTERVAL': 1,
+}
+
+# Per-view query budgets (see api.budgets); MODE is 'log' or 'raise'.
+# config.test_settings raises so a budget regression fails the suite.
+QUERY_BUDGETS = {
+    'ENABLED': env.bool('QUERY_BUDGETS_ENABLED', default=True),
+    'MODE': env('QUERY_BUDGETS_MODE', default='log'),
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -87,6 +121,59 @@ except:
         }
     }
 
+# Lookups in the caches requests read count towards the request metrics
+CACHES = {
+    'default': {
+        'BACKEND': 'api.caches.LocMemCache',
+    },
+    # Login throttle windows and rejected-credential markers stay process-local
+    'throttle': {
+        'BACKEND': 'api.caches.LocMemCache',
+        'LOCATION': 'throttle',
+    },
+    # Shared by every worker so /api/profiling answers for all of them
+    'profiling': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('PROFILING_CACHE_DIR', default=os.path.join(BASE_DIR, '.cache', 'profiling')),
+    },
+    # Shared by every worker so /api/metrics sums the series of all of them
+    'metrics': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('METRICS_CACHE_DIR', default=os.path.join(BASE_DIR, '.cache', 'metrics')),
+    },
+    # Shared by every worker so `manage.py slow_queries` can read the log
+    'slow_queries': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('SLOW_QUERY_CACHE_DIR', default=os.path.join(BASE_DIR, '.cache', 'slow_queries')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Queries slower than THRESHOLD_MS are kept in a ring buffer of BUFFER_SIZE
+# entries per process with their origin in ORIGINS and an EXPLAIN of each new
+# statement; a background thread publishes each buffer to CACHE
+SLOW_QUERY_LOG = {
+    'ENABLED': env.bool('SLOW_QUERY_LOG_ENABLED', default=True),
+    'THRESHOLD_MS': env.float('SLOW_QUERY_THRESHOLD_MS', default=100),
+    'BUFFER_SIZE': 500,
+    'EXPLAIN': True,
+    'ORIGINS': ['api/views.py', 'api/mixins.py'],
+    'CACHE': 'slow_queries',
+}
+
+# The role groups are cached per process; other processes' group changes are
+# seen within SYNC_INTERVAL seconds (0 = check on every lookup)
+ROLE_REGISTRY = {
+    'SYNC_INTERVAL': 5,
+}
+
+AUTHENTICATION_BACKENDS = [
+    'api.backends.FailedLoginCacheBackend',
+]
+
+# Seconds a rejected username/password pair is answered from the cache
+LOGIN_FAILURE_CACHE_TIMEOUT = 300
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,6 +189,60 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Registration hashes passwords on a bounded pool ('thread' or 'process')
+PASSWORD_HASHING_POOL = {
+    'ENABLED': env.bool('PASSWORD_HASHING_POOL_ENABLED', default=True),
+    'KIND': env('PASSWORD_HASHING_POOL_KIND', default='thread'),
+    'WORKERS': env.int('PASSWORD_HASHING_POOL_WORKERS', default=os.cpu_count() or 1),
+    'QUEUE_SIZE': 64,
+    'TIMEOUT': 10,
+}
+
+# Bulk user imports (manage.py import_users, POST /api/users/import)
+USER_IMPORT = {
+    'BATCH_SIZE': 1000,
+    'WORKERS': env.int('USER_IMPORT_WORKERS', default=os.cpu_count() or 1),
+    'MAX_ERRORS': 100,
+    # larger uploads are refused; import them with manage.py import_users.
+    # Each row is a password hash, so an upload must finish within a request
+    # and leave the hashing pool to sign-ups
+    'MAX_UPLOAD_SIZE': env.int('USER_IMPORT_MAX_UPLOAD_SIZE', default=5 * 1024 * 1024),
+    'MAX_UPLOAD_ROWS': env.int('USER_IMPORT_MAX_UPLOAD_ROWS', default=500),
+}
+
+# Menu uploads to /api/menu-items/import over MAX_UPLOAD_SIZE bytes are
+# refused; import them with manage.py import_menu
+MENU_IMPORT = {
+    'MAX_UPLOAD_SIZE': env.int('MENU_IMPORT_MAX_UPLOAD_SIZE', default=5 * 1024 * 1024),
+}
+
+# Historical reports (/api/reports/demand-heatmap, co-purchases) read lines
+# CHUNK_SIZE rows at a time; results of ranges ending before today are cached
+# for CACHE_TIMEOUT seconds, others for LIVE_CACHE_TIMEOUT
+HISTORICAL_REPORTS = {
+    'CHUNK_SIZE': 20000,
+    'CACHE_TIMEOUT': 60 * 60 * 24,
+    'LIVE_CACHE_TIMEOUT': 60 * 5,
+}
+
+# Columnar copy of order history read by the historical reports, appended to
+# by manage.py snapshot_orders; a day is exported SETTLE_SECONDS after it ends
+ORDER_SNAPSHOT = {
+    'ENABLED': env.bool('ORDER_SNAPSHOT_ENABLED', default=True),
+    'PATH': env('ORDER_SNAPSHOT_DIR', default=os.path.join(BASE_DIR, '.cache', 'snapshots')),
+    'SETTLE_SECONDS': 600,
+}
+
+# Frequently-bought-together index behind /api/menu-items/<pk>/recommendations,
+# built per process from the last WINDOW_DAYS of transactions; the catalog
+# version is checked for changes at most every CHECK_SECONDS
+RECOMMENDATIONS = {
+    'WINDOW_DAYS': 90,
+    'LIMIT': 10,
+    'REFRESH_SECONDS': 60 * 60,
+    'CHECK_SECONDS': 5,
+}
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -116,7 +257,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.TimedJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -128,14 +269,40 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 5
+    'PAGE_SIZE': 5,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '60/min',
+        'login_username': '5/min',
+        # token refresh and blacklist, per address
+        'token_ip': '300/min',
+    },
+    # Reverse proxies in front of the app. Throttles take the client address
+    # from X-Forwarded-For only past this many proxies; with 0 they use
+    # REMOTE_ADDR, so a client cannot pick a fresh address per request
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_REFRESH_SERIALIZER': 'api.tokens.RevocationListTokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'api.tokens.RevocationListTokenBlacklistSerializer',
+}
+
+# Blacklisted refresh tokens are checked against an in-process set that is
+# synced from the database every SYNC_INTERVAL seconds (0 = always query);
+# each sync also re-reads the rows blacklisted in the SYNC_OVERLAP seconds
+# before the previous one, which may have committed after it
+TOKEN_REVOCATION_LIST = {
+    'SYNC_INTERVAL': 5,
+    'SYNC_OVERLAP': 60,
+    'RELOAD_INTERVAL': 3600,
 }
 
 DJOSER = {
     'USER_ID_FIELD': 'username',
+    'SERIALIZERS': {
+        'user_create': 'api.serializers.RegistrationSerializer',
+        'user_create_password_retype': 'api.serializers.RegistrationPasswordRetypeSerializer',
+    },
 }
\ No newline at end of file
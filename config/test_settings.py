@@ -0,0 +1,15 @@
+"""Settings for the test suite: python manage.py test --settings=config.test_settings"""
+from .settings import *  # noqa: F401,F403
+
+# a view going over its query budget fails the test that made the request
+QUERY_BUDGETS = {**QUERY_BUDGETS, 'ENABLED': True, 'MODE': 'raise'}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# the suite runs in one process; keep the caches shared between workers in memory
+CACHES = {
+    **CACHES,
+    'profiling': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'profiling'},
+    'metrics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'metrics'},
+    'slow_queries': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'slow_queries'},
+}
@@ -7,6 +7,8 @@ from rest_framework_simplejwt.views import (
     TokenBlacklistView,
 )
 
+from api.throttling import LOGIN_THROTTLE_CLASSES, TOKEN_THROTTLE_CLASSES
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -19,7 +21,7 @@ urlpatterns = [
     # path('api/', include('djoser.urls.authtoken')),
 
     # JWT
-    path('api/token/login/', TokenObtainPairView.as_view(),  name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/token/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),
+    path('api/token/login/', TokenObtainPairView.as_view(throttle_classes=LOGIN_THROTTLE_CLASSES),  name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(throttle_classes=TOKEN_THROTTLE_CLASSES), name='token_refresh'),
+    path('api/token/blacklist/', TokenBlacklistView.as_view(throttle_classes=TOKEN_THROTTLE_CLASSES), name='token_blacklist'),
 ]
@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# start building the recommendation index with the first request a process
+# serves, not on import: a preloading server imports this module in the
+# master before forking the workers, which would not inherit the thread
+from django.core.signals import request_started  # noqa: E402
+
+from api.recommendations import start_recommendations  # noqa: E402
+
+request_started.connect(start_recommendations)
@@ -1,7 +1,10 @@
+from functools import cached_property
+from types import MappingProxyType
+
 from django.apps import apps
 from django.conf import settings as django_settings
 from django.test.signals import setting_changed
-from django.utils.functional import LazyObject
+from django.utils.functional import LazyObject, empty
 from django.utils.module_loading import import_string
 
 DJOSER_SETTINGS_NAMESPACE = "DJOSER"
@@ -12,19 +15,34 @@ User = apps.get_model(auth_module, user_model)
 
 
 class ObjDict(dict):
-    def __getattribute__(self, item):
+    """
+    Dict whose keys are also readable as attributes. Dotted-path strings are
+    imported on first attribute access and the result is stored as a plain
+    instance attribute, so later reads never go through this code again.
+    """
+
+    def __getattr__(self, item):
         try:
             val = self[item]
-            if isinstance(val, str):
-                val = import_string(val)
-            elif isinstance(val, (list, tuple)):
-                val = [import_string(v) if isinstance(v, str) else v for v in val]
-            self[item] = val
         except KeyError:
-            val = super(ObjDict, self).__getattribute__(item)
-
+            raise AttributeError(item)
+
+        if isinstance(val, str):
+            val = import_string(val)
+        elif isinstance(val, (list, tuple)):
+            val = [import_string(v) if isinstance(v, str) else v for v in val]
+        dict.__setitem__(self, item, val)
+        self.__dict__[item] = val
         return val
 
+    def __setitem__(self, key, value):
+        self.__dict__.pop(key, None)
+        super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
 
 default_settings = {
     "USER_ID_FIELD": User._meta.pk.name,
@@ -114,17 +132,29 @@ class Settings:
         self._load_default_settings()
         self._override_settings(overriden_settings)
         self._init_settings_to_import()
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(
+                "djoser settings are read-only; override {} in Django settings "
+                "instead".format(DJOSER_SETTINGS_NAMESPACE)
+            )
+        super().__setattr__(name, value)
 
     def _load_default_settings(self):
         for setting_name, setting_value in default_settings.items():
             if setting_name.isupper():
+                # copy nested dicts so overrides never leak into the defaults
+                if isinstance(setting_value, ObjDict):
+                    setting_value = ObjDict(setting_value)
                 setattr(self, setting_name, setting_value)
 
     def _override_settings(self, overriden_settings: dict):
         for setting_name, setting_value in overriden_settings.items():
             value = setting_value
             if isinstance(setting_value, dict):
-                value = getattr(self, setting_name, {})
+                value = getattr(self, setting_name, ObjDict())
                 value.update(ObjDict(setting_value))
             setattr(self, setting_name, value)
 
@@ -134,11 +164,82 @@ class Settings:
             if isinstance(value, str):
                 setattr(self, setting_name, import_string(value))
 
+    @cached_property
+    def action_permissions(self):
+        """
+        UserViewSet action -> permission classes, resolved once per settings
+        snapshot. Deleting through "me" uses the "destroy" entry.
+        """
+        permissions = self.PERMISSIONS
+        return MappingProxyType(
+            {
+                "create": permissions.user_create,
+                "activation": permissions.activation,
+                "resend_activation": permissions.password_reset,
+                "list": permissions.user_list,
+                "reset_password": permissions.password_reset,
+                "reset_password_confirm": permissions.password_reset_confirm,
+                "set_password": permissions.set_password,
+                "set_username": permissions.set_username,
+                "reset_username": permissions.username_reset,
+                "reset_username_confirm": permissions.username_reset_confirm,
+                "destroy": permissions.user_delete,
+            }
+        )
+
+    @cached_property
+    def action_serializers(self):
+        """
+        UserViewSet action -> serializer class, with the *_RETYPE switches
+        already applied.
+        """
+        serializers = self.SERIALIZERS
+        return MappingProxyType(
+            {
+                "create": serializers.user_create_password_retype
+                if self.USER_CREATE_PASSWORD_RETYPE
+                else serializers.user_create,
+                "destroy": serializers.user_delete,
+                "activation": serializers.activation,
+                "resend_activation": serializers.password_reset,
+                "reset_password": serializers.password_reset,
+                "reset_password_confirm": serializers.password_reset_confirm_retype
+                if self.PASSWORD_RESET_CONFIRM_RETYPE
+                else serializers.password_reset_confirm,
+                "set_password": serializers.set_password_retype
+                if self.SET_PASSWORD_RETYPE
+                else serializers.set_password,
+                "set_username": serializers.set_username_retype
+                if self.SET_USERNAME_RETYPE
+                else serializers.set_username,
+                "reset_username": serializers.username_reset,
+                "reset_username_confirm": serializers.username_reset_confirm_retype
+                if self.USERNAME_RESET_CONFIRM_RETYPE
+                else serializers.username_reset_confirm,
+                "me": serializers.current_user,
+            }
+        )
+
 
 class LazySettings(LazyObject):
     def _setup(self, explicit_overriden_settings=None):
         self._wrapped = Settings(default_settings, explicit_overriden_settings)
 
+    def __getattr__(self, name):
+        """Return a value from the current snapshot and cache it in self.__dict__."""
+        if (_wrapped := self._wrapped) is empty:
+            self._setup()
+            _wrapped = self._wrapped
+        val = getattr(_wrapped, name)
+        self.__dict__[name] = val
+        return val
+
+    def __setattr__(self, name, value):
+        # a new snapshot invalidates every cached value
+        if name == "_wrapped":
+            self.__dict__.clear()
+        super().__setattr__(name, value)
+
 
 settings = LazySettings()
 
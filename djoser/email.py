@@ -1,58 +1,101 @@
+from django.conf import settings as django_settings
 from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
 from templated_mail.mail import BaseEmailMessage
 
 from djoser import utils
+from djoser.compat import get_user_email
 from djoser.conf import settings
 
 
-class ActivationEmail(BaseEmailMessage):
-    template_name = "email/activation.html"
+def make_user_token(user, tokens=None):
+    # tokens is shared by the messages of one send_bulk() call, so a user
+    # mailed twice in it costs one HMAC computation; it is dropped with the
+    # call, as the token changes with the user's password and last login
+    if tokens is None:
+        return default_token_generator.make_token(user)
+    token = tokens.get(user.pk)
+    if token is None:
+        token = tokens[user.pk] = default_token_generator.make_token(user)
+    return token
+
+
+class BulkEmailMessage(BaseEmailMessage):
+    # user pk -> token, set for the messages of one send_bulk() call
+    tokens = None
+
+    def prepare(self, to, **kwargs):
+        """
+        Render the message and fill in its headers without sending it.
+        """
+        self.render()
+
+        self.to = to
+        self.cc = kwargs.pop("cc", [])
+        self.bcc = kwargs.pop("bcc", [])
+        self.reply_to = kwargs.pop("reply_to", [])
+        self.from_email = kwargs.pop(
+            "from_email", django_settings.DEFAULT_FROM_EMAIL
+        )
+        return self
+
+    @classmethod
+    def send_bulk(cls, request, users, connection=None, fail_silently=False):
+        """
+        Render one message per user and deliver them all over a single
+        connection. Returns the number of messages sent.
+        """
+        messages = []
+        tokens = {}
+        for user in users:
+            to = [get_user_email(user)]
+            message = cls(request, {"user": user})
+            message.tokens = tokens
+            messages.append(message.prepare(to))
+        if not messages:
+            return 0
+
+        connection = connection or mail.get_connection(fail_silently=fail_silently)
+        return connection.send_messages(messages) or 0
+
+
+class UidAndTokenEmail(BulkEmailMessage):
+    url_setting = None
 
     def get_context_data(self):
-        # ActivationEmail can be deleted
         context = super().get_context_data()
 
         user = context.get("user")
         context["uid"] = utils.encode_uid(user.pk)
-        context["token"] = default_token_generator.make_token(user)
-        context["url"] = settings.ACTIVATION_URL.format(**context)
+        context["token"] = make_user_token(user, self.tokens)
+        context["url"] = getattr(settings, self.url_setting).format(**context)
         return context
 
 
-class ConfirmationEmail(BaseEmailMessage):
-    template_name = "email/confirmation.html"
+class ActivationEmail(UidAndTokenEmail):
+    # ActivationEmail can be deleted
+    template_name = "email/activation.html"
+    url_setting = "ACTIVATION_URL"
 
 
-class PasswordResetEmail(BaseEmailMessage):
-    template_name = "email/password_reset.html"
+class ConfirmationEmail(BulkEmailMessage):
+    template_name = "email/confirmation.html"
 
-    def get_context_data(self):
-        # PasswordResetEmail can be deleted
-        context = super().get_context_data()
 
-        user = context.get("user")
-        context["uid"] = utils.encode_uid(user.pk)
-        context["token"] = default_token_generator.make_token(user)
-        context["url"] = settings.PASSWORD_RESET_CONFIRM_URL.format(**context)
-        return context
+class PasswordResetEmail(UidAndTokenEmail):
+    # PasswordResetEmail can be deleted
+    template_name = "email/password_reset.html"
+    url_setting = "PASSWORD_RESET_CONFIRM_URL"
 
 
-class PasswordChangedConfirmationEmail(BaseEmailMessage):
+class PasswordChangedConfirmationEmail(BulkEmailMessage):
     template_name = "email/password_changed_confirmation.html"
 
 
-class UsernameChangedConfirmationEmail(BaseEmailMessage):
+class UsernameChangedConfirmationEmail(BulkEmailMessage):
     template_name = "email/username_changed_confirmation.html"
 
 
-class UsernameResetEmail(BaseEmailMessage):
+class UsernameResetEmail(UidAndTokenEmail):
     template_name = "email/username_reset.html"
-
-    def get_context_data(self):
-        context = super().get_context_data()
-
-        user = context.get("user")
-        context["uid"] = utils.encode_uid(user.pk)
-        context["token"] = default_token_generator.make_token(user)
-        context["url"] = settings.USERNAME_RESET_CONFIRM_URL.format(**context)
-        return context
+    url_setting = "USERNAME_RESET_CONFIRM_URL"
@@ -114,11 +114,9 @@ class TokenCreateSerializer(serializers.Serializer):
     def validate(self, attrs):
         password = attrs.get("password")
         params = {settings.LOGIN_FIELD: attrs.get(settings.LOGIN_FIELD)}
+        # every failure maps to the same error, so a rejected authenticate()
+        # is final and the password is never hashed a second time
         self.user = authenticate(request=self.context.get("request"), **params, password=password)
-        if not self.user:
-            self.user = User.objects.filter(**params).first()
-            if self.user and not self.user.check_password(password):
-                self.fail("invalid_credentials")
         if self.user and self.user.is_active:
             return attrs
         self.fail("invalid_credentials")
@@ -65,70 +65,21 @@ class UserViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(pk=user.pk)
         return queryset
 
+    def get_action_key(self):
+        if self.action == "me" and self.request and self.request.method == "DELETE":
+            return "destroy"
+        return self.action
+
     def get_permissions(self):
-        if self.action == "create":
-            self.permission_classes = settings.PERMISSIONS.user_create
-        elif self.action == "activation":
-            self.permission_classes = settings.PERMISSIONS.activation
-        elif self.action == "resend_activation":
-            self.permission_classes = settings.PERMISSIONS.password_reset
-        elif self.action == "list":
-            self.permission_classes = settings.PERMISSIONS.user_list
-        elif self.action == "reset_password":
-            self.permission_classes = settings.PERMISSIONS.password_reset
-        elif self.action == "reset_password_confirm":
-            self.permission_classes = settings.PERMISSIONS.password_reset_confirm
-        elif self.action == "set_password":
-            self.permission_classes = settings.PERMISSIONS.set_password
-        elif self.action == "set_username":
-            self.permission_classes = settings.PERMISSIONS.set_username
-        elif self.action == "reset_username":
-            self.permission_classes = settings.PERMISSIONS.username_reset
-        elif self.action == "reset_username_confirm":
-            self.permission_classes = settings.PERMISSIONS.username_reset_confirm
-        elif self.action == "destroy" or (
-            self.action == "me" and self.request and self.request.method == "DELETE"
-        ):
-            self.permission_classes = settings.PERMISSIONS.user_delete
+        permission_classes = settings.action_permissions.get(self.get_action_key())
+        if permission_classes is not None:
+            self.permission_classes = permission_classes
         return super().get_permissions()
 
     def get_serializer_class(self):
-        if self.action == "create":
-            if settings.USER_CREATE_PASSWORD_RETYPE:
-                return settings.SERIALIZERS.user_create_password_retype
-            return settings.SERIALIZERS.user_create
-        elif self.action == "destroy" or (
-            self.action == "me" and self.request and self.request.method == "DELETE"
-        ):
-            return settings.SERIALIZERS.user_delete
-        elif self.action == "activation":
-            return settings.SERIALIZERS.activation
-        elif self.action == "resend_activation":
-            return settings.SERIALIZERS.password_reset
-        elif self.action == "reset_password":
-            return settings.SERIALIZERS.password_reset
-        elif self.action == "reset_password_confirm":
-            if settings.PASSWORD_RESET_CONFIRM_RETYPE:
-                return settings.SERIALIZERS.password_reset_confirm_retype
-            return settings.SERIALIZERS.password_reset_confirm
-        elif self.action == "set_password":
-            if settings.SET_PASSWORD_RETYPE:
-                return settings.SERIALIZERS.set_password_retype
-            return settings.SERIALIZERS.set_password
-        elif self.action == "set_username":
-            if settings.SET_USERNAME_RETYPE:
-                return settings.SERIALIZERS.set_username_retype
-            return settings.SERIALIZERS.set_username
-        elif self.action == "reset_username":
-            return settings.SERIALIZERS.username_reset
-        elif self.action == "reset_username_confirm":
-            if settings.USERNAME_RESET_CONFIRM_RETYPE:
-                return settings.SERIALIZERS.username_reset_confirm_retype
-            return settings.SERIALIZERS.username_reset_confirm
-        elif self.action == "me":
-            return settings.SERIALIZERS.current_user
-
-        return self.serializer_class
+        return settings.action_serializers.get(
+            self.get_action_key(), self.serializer_class
+        )
 
     def get_instance(self):
         return self.request.user
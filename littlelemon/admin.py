@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import (
     FoodItem, FoodCategory, ShoppingCart, CustomerOrder, CartItem, Transaction, TransactionItem,
+    OrderStatusChange,
 )
 
 @admin.register(FoodItem)
@@ -25,10 +26,16 @@ class ShoppingCartAdmin(admin.ModelAdmin):
 
 @admin.register(CustomerOrder)
 class CustomerOrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'customer', 'order_total', 'is_delivered', 'order_date']
-    list_filter = ['is_delivered', 'order_date']
+    list_display = ['id', 'customer', 'order_total', 'status', 'order_date']
+    list_filter = ['status', 'order_date']
     search_fields = ['customer__username']
 
+@admin.register(OrderStatusChange)
+class OrderStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ['order', 'version', 'from_status', 'to_status', 'courier', 'changed_by', 'changed_at']
+    list_filter = ['to_status', 'changed_at']
+    search_fields = ['order__id']
+
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['customer', 'food_item', 'item_quantity', 'item_total_price']
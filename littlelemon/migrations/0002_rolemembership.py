@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+ROLES = ['SysAdmin', 'Manager', 'Delivery Crew', 'Customer']
+STAFF_ROLES = ['SysAdmin', 'Manager']
+
+
+def effective_roles(group_names):
+    for role in STAFF_ROLES:
+        if role in group_names:
+            return [role]
+    return [role for role in ROLES if role in group_names]
+
+
+def fill_role_memberships(apps, schema_editor):
+    """Give every user in a role group its effective roles, as api.roles.sync_user_roles does."""
+    RoleMembership = apps.get_model('littlelemon', 'RoleMembership')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    group_names = {}
+    memberships = User.groups.through.objects.filter(group__name__in=ROLES)
+    for user_id, name in memberships.values_list('user_id', 'group__name').iterator():
+        group_names.setdefault(user_id, set()).add(name)
+    RoleMembership.objects.bulk_create(
+        [
+            RoleMembership(user_id=user_id, role=role)
+            for user_id, names in group_names.items()
+            for role in effective_roles(names)
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('littlelemon', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('SysAdmin', 'SysAdmin'), ('Manager', 'Manager'), ('Delivery Crew', 'Delivery Crew'), ('Customer', 'Customer')], max_length=32)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='role_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Role Membership',
+                'verbose_name_plural': 'Role Memberships',
+                'unique_together': {('role', 'user')},
+            },
+        ),
+        migrations.RunPython(fill_role_memberships, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:09
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def rename_duplicate_items(apps, schema_editor):
+    """
+    Keep the first item of each (name, category) and rename the others
+    after their id, so the unique constraint can be added. Items are
+    renamed rather than merged: cart and transaction lines point at them.
+    """
+    FoodItem = apps.get_model('littlelemon', 'FoodItem')
+    max_length = FoodItem._meta.get_field('name').max_length
+    duplicates = (
+        FoodItem.objects.values('name', 'food_category')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        items = FoodItem.objects.filter(name=row['name'], food_category=row['food_category']).order_by('pk')
+        for item in items[1:]:
+            suffix = f' ({item.pk})'
+            item.name = item.name[:max_length - len(suffix)] + suffix
+            item.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0002_rolemembership'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_items, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='fooditem',
+            unique_together={('name', 'food_category')},
+        ),
+    ]
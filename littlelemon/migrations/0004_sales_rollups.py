@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Count the existing orders, as api.analytics.rebuild_rollups does.
+    Orders have no status history yet, so a delivered order counts as
+    delivered on its order's day, which is where rebuild_rollups falls
+    back to for such orders too.
+    """
+    CustomerOrder = apps.get_model('littlelemon', 'CustomerOrder')
+    Transaction = apps.get_model('littlelemon', 'Transaction')
+    DailySales = apps.get_model('littlelemon', 'DailySales')
+    DailyItemSales = apps.get_model('littlelemon', 'DailyItemSales')
+    DailyCourierDeliveries = apps.get_model('littlelemon', 'DailyCourierDeliveries')
+    lines = Transaction.transaction_items.through.objects.filter(transaction__order__isnull=False)
+
+    item_rows = [
+        DailyItemSales(**row)
+        for row in lines.annotate(day=TruncDate('transaction__order__order_date'))
+        .values('day', food_item_id=F('transactionitem__food_item_id'))
+        .annotate(quantity=Sum('transactionitem__item_quantity'), revenue=Sum('transactionitem__item_total_price'))
+        .order_by()
+    ]
+    item_counts = {}
+    for row in item_rows:
+        item_counts[row.day] = item_counts.get(row.day, 0) + row.quantity
+    sales_rows = [
+        DailySales(item_count=item_counts.get(row['day'], 0), **row)
+        for row in CustomerOrder.objects.annotate(day=TruncDate('order_date'))
+        .values('day')
+        .annotate(order_count=Count('id'), revenue=Sum('order_total'))
+        .order_by()
+    ]
+    delivery_rows = [
+        DailyCourierDeliveries(**row)
+        for row in CustomerOrder.objects.filter(is_delivered=True, assigned_delivery_person__isnull=False)
+        .annotate(day=TruncDate('order_date'))
+        .values('day', courier_id=F('assigned_delivery_person_id'))
+        .annotate(delivered_count=Count('id'))
+        .order_by()
+    ]
+    DailySales.objects.bulk_create(sales_rows, batch_size=2000)
+    DailyItemSales.objects.bulk_create(item_rows, batch_size=2000)
+    DailyCourierDeliveries.objects.bulk_create(delivery_rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0003_fooditem_unique_name_per_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('order_count', models.IntegerField(default=0)),
+                ('item_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Daily Sales',
+                'verbose_name_plural': 'Daily Sales',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCourierDeliveries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_deliveries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Courier Deliveries',
+                'verbose_name_plural': 'Daily Courier Deliveries',
+                'ordering': ['day'],
+                'unique_together': {('day', 'courier')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('food_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='littlelemon.fooditem')),
+            ],
+            options={
+                'verbose_name': 'Daily Item Sales',
+                'verbose_name_plural': 'Daily Item Sales',
+                'ordering': ['day'],
+                'unique_together': {('day', 'food_item')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
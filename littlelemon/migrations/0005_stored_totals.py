@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:19
+
+from django.db import migrations, models
+from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 2000
+
+
+def fill_totals(apps, schema_editor):
+    """Sum the items of every cart and transaction into its new columns, one UPDATE per batch."""
+    for name, field_name, owner, item in [
+        ('ShoppingCart', 'cart_items', 'shoppingcart_id', 'cartitem'),
+        ('Transaction', 'transaction_items', 'transaction_id', 'transactionitem'),
+    ]:
+        model = apps.get_model('littlelemon', name)
+        lines = getattr(model, field_name).through.objects.filter(**{owner: OuterRef('pk')}).order_by().values(owner)
+        total = Coalesce(
+            Subquery(lines.annotate(total=Sum(f'{item}__item_total_price')).values('total')),
+            Value(0), output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        item_count = Coalesce(
+            Subquery(lines.annotate(count=Sum(f'{item}__item_quantity')).values('count')),
+            Value(0), output_field=IntegerField(),
+        )
+        pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), BATCH_SIZE):
+            model.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).update(total=total, item_count=item_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0004_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def status_from_is_delivered(apps, schema_editor):
+    CustomerOrder = apps.get_model('littlelemon', 'CustomerOrder')
+    CustomerOrder.objects.filter(is_delivered=True).update(status=3)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0005_stored_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerorder',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Placed'), (1, 'Preparing'), (2, 'Out for delivery'), (3, 'Delivered')], db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='customerorder',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='OrderStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.PositiveSmallIntegerField(choices=[(0, 'Placed'), (1, 'Preparing'), (2, 'Out for delivery'), (3, 'Delivered')])),
+                ('to_status', models.PositiveSmallIntegerField(choices=[(0, 'Placed'), (1, 'Preparing'), (2, 'Out for delivery'), (3, 'Delivered')])),
+                ('version', models.PositiveIntegerField()),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('courier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='littlelemon.customerorder')),
+            ],
+            options={
+                'verbose_name': 'Order Status Change',
+                'verbose_name_plural': 'Order Status Changes',
+                'ordering': ['order', 'version'],
+            },
+        ),
+        migrations.RunPython(status_from_is_delivered, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+DELIVERED = 3
+
+
+def count_open_orders(apps, schema_editor):
+    CourierLoad = apps.get_model('littlelemon', 'CourierLoad')
+    CustomerOrder = apps.get_model('littlelemon', 'CustomerOrder')
+    CourierLoad.objects.bulk_create(
+        [
+            CourierLoad(**row)
+            for row in CustomerOrder.objects.filter(assigned_delivery_person__isnull=False)
+            .exclude(status=DELIVERED)
+            .values(courier_id=F('assigned_delivery_person_id'))
+            .annotate(open_count=Count('id'))
+            .order_by()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('littlelemon', '0006_order_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourierLoad',
+            fields=[
+                ('courier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='courier_load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Courier Load',
+                'verbose_name_plural': 'Courier Loads',
+            },
+        ),
+        migrations.RunPython(count_open_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+def create_role_groups_version(apps, schema_editor):
+    RoleGroupsVersion = apps.get_model('littlelemon', 'RoleGroupsVersion')
+    RoleGroupsVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0008_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleGroupsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Role Groups Version',
+                'verbose_name_plural': 'Role Groups Version',
+            },
+        ),
+        migrations.RunPython(create_role_groups_version, migrations.RunPython.noop),
+    ]
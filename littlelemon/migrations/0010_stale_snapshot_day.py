@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0009_role_groups_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleSnapshotDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('marked_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Stale Snapshot Day',
+                'verbose_name_plural': 'Stale Snapshot Days',
+            },
+        ),
+    ]
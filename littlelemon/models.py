@@ -9,6 +9,7 @@ class FoodItem(models.Model):
     food_category = models.ForeignKey('littlelemon.FoodCategory', on_delete=models.PROTECT, related_name='items')
 
     class Meta:
+        unique_together = ['name', 'food_category']
         ordering = ['name']
         verbose_name = 'Food Item'
         verbose_name_plural = 'Food Items'
@@ -30,6 +31,18 @@ class FoodCategory(models.Model):
         return self.name
 
 
+class CatalogVersion(models.Model):
+    # a single row, bumped on every menu change and read by every worker through api.catalog
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Catalog Version'
+        verbose_name_plural = 'Catalog Version'
+
+    def __str__(self):
+        return f'Catalog version {self.version}'
+
+
 class CartItem(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
     food_item = models.ForeignKey(FoodItem, on_delete=models.PROTECT, related_name='cart_items')
@@ -50,6 +63,9 @@ class CartItem(models.Model):
 class ShoppingCart(models.Model):
     customer = models.OneToOneField(User, on_delete=models.CASCADE, related_name='shopping_cart')
     cart_items = models.ManyToManyField(CartItem, related_name='carts', blank=True)
+    # sums over cart_items, kept up to date by api.signals
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.IntegerField(default=0)
 
     class Meta:
         verbose_name = 'Shopping Cart'
@@ -59,7 +75,7 @@ class ShoppingCart(models.Model):
         return f'Shopping cart for {self.customer.username}'
 
     def get_total(self):
-        return sum(item.item_total_price for item in self.cart_items.all())
+        return self.total
 
 
 class TransactionItem(models.Model):
@@ -82,6 +98,9 @@ class Transaction(models.Model):
     customer = models.ForeignKey(User, on_delete=models.SET_DEFAULT, default=0, related_name='transactions')
     transaction_items = models.ManyToManyField(TransactionItem, related_name='transactions', blank=True)
     transaction_date = models.DateTimeField(auto_now_add=True)
+    # sums over transaction_items, kept up to date by api.signals
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.IntegerField(default=0)
 
     class Meta:
         ordering = ['-transaction_date']
@@ -92,10 +111,16 @@ class Transaction(models.Model):
         return f'Transaction #{self.id} - {self.customer.username} on {self.transaction_date.strftime("%Y-%m-%d")}'
 
     def get_total(self):
-        return sum(item.item_total_price for item in self.transaction_items.all())
+        return self.total
 
 
 class CustomerOrder(models.Model):
+    class Status(models.IntegerChoices):
+        PLACED = 0, 'Placed'
+        PREPARING = 1, 'Preparing'
+        OUT_FOR_DELIVERY = 2, 'Out for delivery'
+        DELIVERED = 3, 'Delivered'
+
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='customer_orders')
     transaction = models.OneToOneField(Transaction, on_delete=models.PROTECT, related_name='order')
     assigned_delivery_person = models.ForeignKey(
@@ -106,6 +131,10 @@ class CustomerOrder(models.Model):
         blank=True,
     )
     is_delivered = models.BooleanField(db_index=True, default=False)
+    # is_delivered mirrors status == DELIVERED; both are written by api.transitions
+    status = models.PositiveSmallIntegerField(choices=Status.choices, default=Status.PLACED, db_index=True)
+    # bumped by every transition, for optimistic concurrency
+    version = models.PositiveIntegerField(default=0)
     order_total = models.DecimalField(max_digits=6, decimal_places=2)
     order_date = models.DateTimeField(auto_now_add=True, db_index=True)
 
@@ -115,5 +144,141 @@ class CustomerOrder(models.Model):
         verbose_name_plural = 'Customer Orders'
 
     def __str__(self):
-        status = 'Delivered' if self.is_delivered else 'Pending'
-        return f'Order #{self.id} - {self.customer.username} ({status})'
+        return f'Order #{self.id} - {self.customer.username} ({self.get_status_display()})'
+
+
+class OrderStatusChange(models.Model):
+    """
+    Append-only history of an order's transitions, one row per change of
+    status or courier, written by api.transitions.
+    """
+    order = models.ForeignKey(CustomerOrder, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.PositiveSmallIntegerField(choices=CustomerOrder.Status.choices)
+    to_status = models.PositiveSmallIntegerField(choices=CustomerOrder.Status.choices)
+    courier = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    version = models.PositiveIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['order', 'version']
+        verbose_name = 'Order Status Change'
+        verbose_name_plural = 'Order Status Changes'
+
+    def __str__(self):
+        return f'Order #{self.order_id} v{self.version}: {self.get_from_status_display()} -> {self.get_to_status_display()}'
+
+
+class RoleMembership(models.Model):
+    """
+    Materialized effective roles of a user, maintained from auth groups by
+    api.roles. A SysAdmin or Manager holds only that role; other users hold
+    Delivery Crew and/or Customer.
+    """
+    ROLE_CHOICES = [
+        ('SysAdmin', 'SysAdmin'),
+        ('Manager', 'Manager'),
+        ('Delivery Crew', 'Delivery Crew'),
+        ('Customer', 'Customer'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='role_memberships')
+    role = models.CharField(max_length=32, choices=ROLE_CHOICES)
+
+    class Meta:
+        unique_together = ['role', 'user']
+        verbose_name = 'Role Membership'
+        verbose_name_plural = 'Role Memberships'
+
+    def __str__(self):
+        return f'{self.user.username} - {self.role}'
+
+
+class RoleGroupsVersion(models.Model):
+    # a single row, bumped when a group is saved or deleted and checked by every worker through api.roles
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Role Groups Version'
+        verbose_name_plural = 'Role Groups Version'
+
+    def __str__(self):
+        return f'Role groups version {self.version}'
+
+
+class DailySales(models.Model):
+    """
+    Per-day rollup of customer orders, maintained by api.analytics as orders
+    are placed. Rebuild with the rebuild_sales_rollups command.
+    """
+    day = models.DateField(unique=True)
+    order_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['day']
+        verbose_name = 'Daily Sales'
+        verbose_name_plural = 'Daily Sales'
+
+    def __str__(self):
+        return f'{self.day}: {self.order_count} orders, {self.revenue}'
+
+
+class DailyItemSales(models.Model):
+    day = models.DateField()
+    food_item = models.ForeignKey(FoodItem, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['day', 'food_item']
+        ordering = ['day']
+        verbose_name = 'Daily Item Sales'
+        verbose_name_plural = 'Daily Item Sales'
+
+    def __str__(self):
+        return f'{self.day}: {self.food_item.name} x{self.quantity}'
+
+
+class DailyCourierDeliveries(models.Model):
+    day = models.DateField()
+    courier = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_deliveries')
+    delivered_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['day', 'courier']
+        ordering = ['day']
+        verbose_name = 'Daily Courier Deliveries'
+        verbose_name_plural = 'Daily Courier Deliveries'
+
+    def __str__(self):
+        return f'{self.day}: {self.courier.username} delivered {self.delivered_count}'
+
+
+class CourierLoad(models.Model):
+    courier = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='courier_load')
+    # orders assigned to the courier and not delivered yet
+    open_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Courier Load'
+        verbose_name_plural = 'Courier Loads'
+
+    def __str__(self):
+        return f'{self.courier.username}: {self.open_count} open'
+
+
+
+class StaleSnapshotDay(models.Model):
+    # a day of order history changed after it may have been exported to the
+    # columnar snapshot; it is read from the live tables until re-exported
+    day = models.DateField(primary_key=True)
+    marked_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Stale Snapshot Day'
+        verbose_name_plural = 'Stale Snapshot Days'
+
+    def __str__(self):
+        return f'{self.day} (changed {self.marked_at:%Y-%m-%d %H:%M})'